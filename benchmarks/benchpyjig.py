@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`benchpyjig` - pyjig benchmarks
+#######################################
+
+.. module:: benchpyjig
+   :synopsis: Time pyjig operations against local template stand-ins
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Times pyjig's main operations without touching the network: the four
+templates are served from local ``file://`` git repos built from the
+stand-ins in ``tests/templates``. Each benchmark is timed
+
+   cold
+      with an empty template cache and nothing loaded in the process, so the
+      time includes cloning, checking out and parsing the templates, and
+   warm
+      with templates already cached and loaded, as in a long-running process
+      or the second of several calls.
+
+The ``startup_help`` and ``startup_noop`` benchmarks time ``pyjig --help``
+and a run adding a module that already exists (which does no template work)
+in a new interpreter: the startup budget of the command line, to be checked
+with ``--compare`` rather than by the unittests, whose wall clock varies
+with the load on the machine running them.
+
+The ``comp_per_file`` and ``comp_batched`` benchmarks compare ``make comp``
+on a project of 20 modules with one pylint and flake8 per file and with the
+batched recipe of ``pyjig.mk``; they need make, pylint and flake8 and are
+skipped without them.
+
+Usage::
+
+   python benchmarks/benchpyjig.py [-n RUNS] [-o FILE] [--compare BASELINE]
+
+Results are written as JSON (to *FILE* or stdout). With ``--compare``, the
+median of each benchmark is checked against *BASELINE*, a previous output
+file, and any that are more than ``--threshold`` slower are reported as
+regressions, making the exit status 1.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+
+# pylint: disable=wrong-import-position
+from pyjig import engine, metadata, pyjig
+from pyjig.cache import TemplateCache
+from pyjig.toolchain import find
+from tests.standins import template_repos
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('benchpyjig')
+
+# Modules added by the add_pysource_many benchmark
+
+MANY = 20
+
+
+class Bench:
+    r"""Benchmark fixture: template repos and scratch directories in
+    *tmpd*."""
+
+    def __init__(self, tmpd):
+        self.tmpd = tmpd
+        self.urls = template_repos(os.path.join(tmpd, 'repos'))
+        self.count = 0
+
+    def scratch(self):
+        r"""Return a new, empty directory."""
+        self.count += 1
+        sdir = os.path.join(self.tmpd, 'run%d' % self.count)
+        os.makedirs(sdir)
+        return sdir
+
+    def reset(self, cold):
+        r"""Point pyjig at a template cache. If *cold*, the cache is empty and
+        every in-process cache is cleared."""
+
+        if cold:
+            engine.LOADED.clear()
+            engine.USER_CONFIG = None
+            metadata.LOADED.clear()
+            pyjig.CACHE = TemplateCache(self.scratch(), urls=self.urls,
+                                        bundles=())
+        elif pyjig.CACHE is None:
+            pyjig.CACHE = TemplateCache(self.scratch(), urls=self.urls,
+                                        bundles=())
+
+    def project(self):
+        r"""Return the ``src/`` folder of a new package project."""
+
+        sdir = self.scratch()
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'bench'])
+        pyjig.Pyjig(args, cwd=sdir).create_project(no_input=True)
+        return os.path.join(sdir, 'bench', 'src')
+
+    # Benchmarks: each takes a setup() result and performs one operation
+
+    def create_project(self, _):
+        r"""create a package project, without git"""
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'bench'])
+        pyjig.Pyjig(args, cwd=self.scratch()).create_project(no_input=True)
+
+    def add_pysource(self, src):
+        r"""add one source module to a project"""
+        pyjig.add_pysources(['mod'], src, True, {'project_type': 'pkg'})
+
+    def add_pysource_many(self, src):
+        r"""add many source modules to a project"""
+        pyjig.add_pysources(['mod%d' % num for num in range(MANY)], src, True,
+                            {'project_type': 'pkg'})
+
+    def add_pyextension(self, src):
+        r"""add one extension module to a project"""
+        pyjig.add_pyextensions(['ext'], src, True, {'project_type': 'pkg'})
+
+    def git_init(self, src):
+        r"""initialize a project's repository"""
+        pyjig.git_init(os.path.dirname(src))
+
+    # Startup of the command line in a new interpreter
+
+    @staticmethod
+    def command(args, cwd):
+        r"""run ``pyjig`` *args* in a new interpreter in directory *cwd*"""
+        env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, 'src'))
+        subprocess.call([sys.executable, '-m', 'pyjig.pyjig'] + args,
+                        cwd=cwd, env=env, stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+
+    def startup_help(self, _):
+        r"""print the command line help"""
+        self.command(['--help'], self.tmpd)
+
+    def startup_noop(self, src):
+        r"""add a module the project already has, a no-op"""
+        self.command(['-x', '--quiet', 'mod'], src)
+
+    # Static analysis of a project of MANY modules with ``make comp``, for
+    # which a project is set up by comp_project()
+
+    @staticmethod
+    def comp(src, batch):
+        r"""run make comp in the project of *src*"""
+        subprocess.call(['make', '-k', '-j4', 'comp', 'LINT_BATCH=' + batch],
+                        cwd=os.path.dirname(src), stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+
+    def comp_per_file(self, src):
+        r"""make comp with one pylint and flake8 per file"""
+        self.comp(src, 'no')
+
+    def comp_batched(self, src):
+        r"""make comp with one batched pylint and flake8 run"""
+        self.comp(src, 'yes')
+
+    def comp_project(self):
+        r"""Return the ``src/`` folder of a new project of MANY modules."""
+        src = self.project()
+        self.add_pysource_many(src)
+        return src
+
+
+BENCHMARKS = ('create_project', 'add_pysource', 'add_pysource_many',
+              'add_pyextension', 'git_init', 'startup_help', 'startup_noop',
+              'comp_per_file', 'comp_batched')
+
+# Benchmarks that need tools outside pyjig, skipped when missing
+
+TOOLS = {
+    'comp_per_file': ('make', 'pylint', 'flake8'),
+    'comp_batched': ('make', 'pylint', 'flake8'),
+    }
+
+
+def summary(times):
+    r"""Return the statistics of a list of *times* (seconds)."""
+
+    times = sorted(times)
+    return {
+        'runs': len(times),
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'mean': sum(times) / len(times),
+        }
+
+
+def run(bench, name, runs):
+    r"""Run benchmark *name* cold and warm, *runs* times each."""
+
+    result = {}
+    for mode in ('cold', 'warm'):
+        times = []
+        for _ in range(runs):
+            bench.reset(cold=False)
+            if name in ('create_project', 'startup_help'):
+                src = None
+            elif name in TOOLS:
+                src = bench.comp_project()
+            else:
+                src = bench.project()
+                if name == 'startup_noop':
+                    bench.add_pysource(src)
+            bench.reset(cold=mode == 'cold')
+            start = time.time()
+            getattr(bench, name)(src)
+            times.append(time.time() - start)
+        result[mode] = summary(times)
+    return result
+
+
+def compare(results, baseline, threshold):
+    r"""Return a list of ``(benchmark, mode, baseline, current)`` median
+    times at least *threshold* (a fraction) slower than *baseline*."""
+
+    regressions = []
+    for name, modes in sorted(results.items()):
+        for mode, stats in sorted(modes.items()):
+            try:
+                base = baseline[name][mode]['median']
+            except KeyError:
+                continue
+            if stats['median'] > base * (1 + threshold):
+                regressions.append((name, mode, base, stats['median']))
+    return regressions
+
+
+def init_parser():
+    r"""Initialize and return :py:class:ArgumentParser."""
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark pyjig against local template stand-ins.')
+    parser.add_argument(
+        '-n', '--runs',
+        type=int, default=5,
+        help='Time each benchmark N times (default 5).')
+    parser.add_argument(
+        '-o', '--output',
+        help='Write results to FILE (default stdout).')
+    parser.add_argument(
+        '--compare', metavar='BASELINE',
+        help='Report benchmarks slower than those in BASELINE.')
+    parser.add_argument(
+        '--threshold',
+        type=float, default=0.2,
+        help='Fraction slower than baseline that counts as a regression '
+             '(default 0.2).')
+    parser.add_argument(
+        'benchmark',
+        nargs='*',
+        help='Benchmarks to run (default all): %s.' % ', '.join(BENCHMARKS))
+    return parser
+
+
+def main(argv=None):
+    r"""main process driver"""
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.getLogger('pyjig').setLevel(logging.WARNING)
+    parser = init_parser()
+    args = parser.parse_args(argv)
+
+    unknown = set(args.benchmark) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmark %s' % ', '.join(sorted(unknown)))
+
+    # Commits made by git_init need an identity, whatever the user's config
+
+    for var in ('GIT_AUTHOR', 'GIT_COMMITTER'):
+        os.environ.setdefault(var + '_NAME', 'pyjig bench')
+        os.environ.setdefault(var + '_EMAIL', 'bench@localhost')
+
+    # The file store and toolchain cache live in the scratch dir, leaving the
+    # user's ~/.pyjig alone
+
+    tmpd = tempfile.mkdtemp()
+    os.environ['PYJIG_STORE'] = os.path.join(tmpd, 'store')
+    os.environ['PYJIG_TOOLCHAIN'] = os.path.join(tmpd, 'toolchain.json')
+    try:
+        bench = Bench(tmpd)
+        results = {}
+        for name in args.benchmark or BENCHMARKS:
+            missing = [exe for exe, fname in
+                       sorted(find(TOOLS.get(name, ())).items()) if not fname]
+            if missing:
+                LOG.warning('%-20s skipped, needs %s', name,
+                            ', '.join(missing))
+                continue
+            results[name] = run(bench, name, args.runs)
+            LOG.info('%-20s cold %8.4fs  warm %8.4fs', name,
+                     results[name]['cold']['median'],
+                     results[name]['warm']['median'])
+    finally:
+        shutil.rmtree(tmpd, ignore_errors=True)
+
+    output = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': args.runs,
+        'results': results,
+        }
+    text = json.dumps(output, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fout:
+            fout.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as fin:
+            baseline = json.load(fin)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, mode, base, cur in regressions:
+            LOG.error('REGRESSION %-20s %s %8.4fs -> %8.4fs (%+.0f%%)', name,
+                      mode, base, cur, 100.0 * (cur - base) / base)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
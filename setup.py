@@ -4,6 +4,7 @@ r"""Pyjig distutils
 
 Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved"""
 from setuptools import setup, find_packages
+from setuptools.command.sdist import sdist
 
 import os
 import sys
@@ -19,6 +20,31 @@ except ImportError:
 
 long_description = pyjig.pyjig.__doc__
 
+
+class Sdist(sdist):
+    r"""Embed bundles of the pyjig templates in the source distribution,
+    from where they are installed as package data, so pyjig never needs the
+    network or git to render them (see pyjig.bundle) and building pyjig
+    from the sdist needs neither. The bundles are built from the template
+    repos at their latest revision, or at the revisions pinned in $PYJIG_PIN
+    ("NAME=REV ..."), which needs git and pyjig's own requirements. Set
+    PYJIG_EMBED=no to make an sdist that always uses the template repos."""
+
+    def make_release_tree(self, base_dir, files):
+        sdist.make_release_tree(self, base_dir, files)
+        if os.environ.get('PYJIG_EMBED', 'yes') == 'no':
+            return
+
+        from pyjig import bundle, cache
+
+        templates = cache.TemplateCache(
+            bundles=(),
+            pins=cache.parse_pins(os.environ.get('PYJIG_PIN', '').split()))
+        for fname in bundle.embed(
+                os.path.join(base_dir, 'src', 'pyjig', 'templates'), templates):
+            self.announce('embedded %s' % fname, level=2)
+
+
 setup(
     # Project meta-data
 
@@ -26,7 +52,9 @@ setup(
     version = pyjig.pyjig.__version__,
     packages = ['pyjig'],
     package_dir = {'': 'src'},
+    package_data = {'pyjig': ['pyjig.mk', 'templates/*.pjt']},
     entry_points = {'console_scripts': ['pyjig = pyjig.pyjig:main',],},
+    cmdclass = {'sdist': Sdist},
     zip_safe = False,
 
     # Testing (assumes you have nose installed)
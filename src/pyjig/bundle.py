@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`bundle` - Single file template bundles
+###############################################
+
+.. module:: pyjig.bundle
+   :synopsis: Compact, hash verified, memory mapped cookiecutter templates
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+A template bundle (``NAME.pjt``) holds one cookiecutter template at one
+commit in a single file, without the git history of a template checkout::
+
+   +--------------------------------------------------------------+
+   | header: magic, format version, index size, SHA-1 of index    |
+   +--------------------------------------------------------------+
+   | index (JSON): template name and commit, cookiecutter.json    |
+   | variables, and for each file its offset, size, SHA-1, mode,  |
+   | binary flag and newline sequence                             |
+   +--------------------------------------------------------------+
+   | file contents, concatenated                                  |
+   +--------------------------------------------------------------+
+
+Bundles are read through :py:mod:`mmap`, never extracted: loading one costs
+a single open and the parse of its index, as the binary and newline
+detection cookiecutter repeats for every file was done when it was built.
+The index is verified against the header when a bundle is opened, and each
+file against its hash the first time it is read; a bundle that fails either
+check is rejected with :py:exc:`RuntimeError`.
+
+``pyjig bundle`` builds bundles of the four ``cookiecutter-*`` templates from
+the template cache, and ``setup.py sdist`` embeds them in the pyjig package
+(``pyjig/templates``, see :py:func:`embed`). Pyjig renders from the bundles
+in ``$PYJIG_BUNDLES``, then from the embedded ones, rather than from git
+checkouts, see :py:class:`pyjig.cache.TemplateCache`;
+:py:class:`pyjig.engine.Template` loads both the same way.
+
+This module depends only on the standard library, so looking up a bundle
+costs pyjig nothing on the paths that never render a template.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import atexit
+import collections
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+MAGIC = b'PYJIGTPL'
+VERSION = 1
+SUFFIX = '.pjt'
+
+# Magic, format version, reserved, index size, SHA-1 of the index
+
+HEADER = struct.Struct('<8sHHI20s')
+
+# Templates pyjig renders, see pyjig.cache.TEMPLATES
+
+NAMES = ('pyapp', 'pypkg', 'pysource', 'pyext')
+
+# Bundles built into the pyjig package, see embed()
+
+EMBEDDED = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'templates')
+
+# Bundles opened by this process, keyed by absolute path
+
+OPENED = {}
+LOCK = threading.Lock()
+
+
+def default_dirs():
+    r"""Return the directories pyjig renders bundles from, in order:
+    ``$PYJIG_BUNDLES`` if set, then the bundles embedded in the package."""
+
+    dirs = [EMBEDDED]
+    if os.environ.get('PYJIG_BUNDLES'):
+        dirs.insert(0, os.environ['PYJIG_BUNDLES'])
+    return dirs
+
+
+def find(bdirs, name, rev=None):
+    r"""Return the first bundle of template *name* in directories *bdirs*,
+    or ``None``. With *rev* (a commit id, or a prefix of one) the bundle must
+    have been built from that commit. Costs one ``stat()`` per directory
+    when there is no bundle."""
+
+    for bdir in bdirs:
+        path = os.path.join(bdir, name + SUFFIX)
+        if not os.path.isfile(path):
+            continue
+        found = open_bundle(path)
+        if not rev or found.rev.startswith(rev):
+            return found
+    return None
+
+
+def open_bundle(path):
+    r"""Return the :py:class:`Bundle` in file *path*, opening it only the
+    first time it is requested."""
+
+    path = os.path.abspath(path)
+    with LOCK:
+        found = OPENED.get(path)
+        if found is None:
+            found = OPENED[path] = Bundle(path)
+    return found
+
+
+class Bundle:
+    r"""A template bundle, memory mapped from file *path*."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+        with open(self.path, 'rb') as fin:
+            try:
+                self.map = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise RuntimeError('%s is not a template bundle' % self.path)
+
+        if len(self.map) < HEADER.size:
+            raise RuntimeError('%s is not a template bundle' % self.path)
+        magic, version, _, size, sha = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise RuntimeError('%s is not a template bundle' % self.path)
+        if version != VERSION:
+            raise RuntimeError('%s is bundle format %d, expected %d' %
+                               (self.path, version, VERSION))
+
+        data = self.map[HEADER.size:HEADER.size + size]
+        if hashlib.sha1(data).digest() != sha:
+            raise RuntimeError('%s is corrupt (index hash mismatch)' %
+                               self.path)
+        index = json.loads(data.decode('utf-8'),
+                           object_pairs_hook=collections.OrderedDict)
+
+        self.name = index['name']
+        self.rev = index['rev']
+        self.schema = index['schema']
+        self.dirs = index['dirs']
+        self.files = index['files']
+        self.base = HEADER.size + size
+        self.verified = set()
+        self.extracted = None
+        self.lock = threading.Lock()
+
+    def read(self, rel):
+        r"""Return the contents of file *rel* (``/`` separated, relative to
+        the template) as bytes."""
+
+        try:
+            offset, size, sha = self.files[rel][:3]
+        except KeyError:
+            raise RuntimeError('%s has no file %s' % (self.path, rel))
+
+        data = self.map[self.base + offset:self.base + offset + size]
+        if rel not in self.verified:
+            if len(data) != size or hashlib.sha1(data).hexdigest() != sha:
+                raise RuntimeError('%s is corrupt (%s hash mismatch)' %
+                                   (self.path, rel))
+            self.verified.add(rel)
+        return data
+
+    def verify(self):
+        r"""Check every file of the bundle against its hash."""
+
+        for rel in self.files:
+            self.read(rel)
+
+    def listdir(self, rel=''):
+        r"""Return the names of the files and directories in directory *rel*
+        of the template."""
+
+        prefix = rel.rstrip('/') + '/' if rel else ''
+        names = set()
+        for path in list(self.files) + self.dirs:
+            if path.startswith(prefix):
+                names.add(path[len(prefix):].split('/', 1)[0])
+        return sorted(names)
+
+    def extract(self, rel):
+        r"""Return a private directory holding copies of the files under
+        directory *rel* of the template, written on first use and removed
+        when the process exits. Used for hook scripts, which cookiecutter
+        runs from disk."""
+
+        with self.lock:
+            if self.extracted is None:
+                self.extracted = tempfile.mkdtemp(prefix='pyjig-bundle-')
+                atexit.register(shutil.rmtree, self.extracted, True)
+            tgt = os.path.join(self.extracted, rel)
+            if not os.path.isdir(tgt):
+                os.makedirs(tgt)
+                for name in self.listdir(rel):
+                    path = rel + '/' + name
+                    if path in self.files:
+                        fname = os.path.join(tgt, name)
+                        with open(fname, 'wb') as fout:
+                            fout.write(self.read(path))
+                        os.chmod(fname, self.files[path][3] & 0o7777)
+        return tgt
+
+
+def build(tdir, dest, name, rev):
+    r"""Write the bundle of template *name* at commit *rev*, whose files are
+    in directory *tdir*, to file *dest*. The bundle is written to a private
+    file and renamed into place. Returns *dest*."""
+
+    # pylint: disable=too-many-locals
+
+    from binaryornot.check import is_binary  # pylint: disable=import-outside-toplevel
+    from pyjig.engine import newline  # pylint: disable=import-outside-toplevel
+
+    with open(os.path.join(tdir, 'cookiecutter.json')) as fin:
+        schema = json.load(fin, object_pairs_hook=collections.OrderedDict)
+
+    dirs = []
+    files = collections.OrderedDict()
+    chunks = []
+    offset = 0
+    for root, dnames, fnames in os.walk(tdir):
+        dnames[:] = sorted(dname for dname in dnames if dname != '.git')
+        rel = os.path.relpath(root, tdir)
+        for dname in dnames:
+            dirs.append(os.path.normpath(os.path.join(rel, dname))
+                        .replace(os.path.sep, '/'))
+        for fname in sorted(fnames):
+            src = os.path.join(root, fname)
+            with open(src, 'rb') as fin:
+                data = fin.read()
+            path = os.path.normpath(os.path.join(rel, fname)) \
+                .replace(os.path.sep, '/')
+            files[path] = [offset, len(data), hashlib.sha1(data).hexdigest(),
+                           os.stat(src).st_mode, is_binary(src),
+                           newline(src)]
+            chunks.append(data)
+            offset += len(data)
+
+    index = json.dumps({'name': name, 'rev': rev, 'schema': schema,
+                        'dirs': dirs, 'files': files},
+                       separators=(',', ':')).encode('utf-8')
+
+    parent = os.path.dirname(os.path.abspath(dest))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    fdesc, tmpfn = tempfile.mkstemp(dir=parent)
+    try:
+        with os.fdopen(fdesc, 'wb') as fout:
+            fout.write(HEADER.pack(MAGIC, VERSION, 0, len(index),
+                                   hashlib.sha1(index).digest()))
+            fout.write(index)
+            for data in chunks:
+                fout.write(data)
+        os.chmod(tmpfn, 0o644)
+        os.rename(tmpfn, dest)
+    except Exception:
+        os.unlink(tmpfn)
+        raise
+    return dest
+
+
+def embed(dest, templates=None):
+    r"""Build a bundle of each pyjig template, from template cache
+    *templates* (default a :py:class:`pyjig.cache.TemplateCache` that never
+    uses bundles), into directory *dest*. Run by ``setup.py sdist`` to embed
+    the templates in the package. Returns the bundles written."""
+
+    from pyjig import cache  # pylint: disable=import-outside-toplevel
+
+    templates = templates or cache.TemplateCache(bundles=())
+    written = []
+    for name in NAMES:
+        rev = templates.resolve(name)
+        written.append(build(templates.checkout(name, rev),
+                             os.path.join(dest, name + SUFFIX), name, rev))
+    return written
+
+
+def bundle(argv=None):
+    r"""``pyjig bundle``: build bundles of the pyjig templates from the
+    template cache, or verify existing bundles. Returns -1 on error."""
+
+    from pyjig import cache  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig bundle',
+        description='Build single file bundles of the pyjig templates.')
+    parser.add_argument(
+        '-o', '--output',
+        default=os.environ.get('PYJIG_BUNDLES') or os.curdir, metavar='DIR',
+        help='Write the bundles to DIR (default $PYJIG_BUNDLES or the '
+             'current directory).')
+    parser.add_argument(
+        '--pin',
+        action='append', metavar='NAME=REV',
+        help='Bundle template NAME at REV (default latest).')
+    parser.add_argument(
+        '--offline',
+        action='store_true', default=False,
+        help='Use cached templates only, never access the network.')
+    parser.add_argument(
+        '--verify',
+        action='store_true', default=False,
+        help='Verify the bundle files named instead of building bundles.')
+    parser.add_argument(
+        'names',
+        nargs='*',
+        help='Templates to bundle (default %s), or bundle files to verify.'
+        % ', '.join(NAMES))
+    args = parser.parse_args(argv)
+
+    try:
+        if args.verify:
+            for path in args.names:
+                found = Bundle(path)
+                found.verify()
+                LOG.info('>>> %s: %s@%s, %d files, ok', path, found.name,
+                         found.rev[:10], len(found.files))
+            return 0
+
+        templates = cache.TemplateCache(offline=args.offline, bundles=(),
+                                        pins=cache.parse_pins(args.pin))
+        for name in args.names or NAMES:
+            rev = templates.resolve(name)
+            dest = build(templates.checkout(name, rev),
+                         os.path.join(args.output, name + SUFFIX), name, rev)
+            LOG.info('>>> %s: %s@%s', dest, name, rev[:10])
+    except (RuntimeError, ValueError, IOError, OSError,
+            subprocess.CalledProcessError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+    return 0
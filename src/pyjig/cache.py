@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`cache` - Persistent template cache
+###########################################
+
+.. module:: pyjig.cache
+   :synopsis: Persistent, revision pinned cache of cookiecutter templates
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Pyjig templates live in public git repos. Rather than have cookiecutter
+re-clone a template into ``~/.cookiecutters`` for every source file, pyjig
+keeps a managed cache of each template repo under ``~/.pyjig/templates`` (or
+``$PYJIG_CACHE`` if set)::
+
+   ~/.pyjig/templates
+   |   cookiecutter-pysource.git      <-- bare mirror of the template repo
+   |   cookiecutter-pysource.stamp    <-- time of last freshness check
+   |
+   \---cookiecutter-pysource
+       \---3f2a...9c1e                <-- checkout keyed by commit
+
+Checkouts are keyed by commit and are never modified once written, so a
+template pinned to a full commit id is served straight from disk without
+running git at all. Templates that track a branch (the default is ``HEAD``)
+are checked for freshness with a single ``git ls-remote`` at most once every
+:data:`FRESHNESS` seconds; the mirror is only fetched when the remote has
+moved. In *offline* mode the network is never touched and the newest cached
+revision is used.
+
+Templates are served from their bundle (see :py:mod:`pyjig.bundle`), without
+running git, when one is found in ``$PYJIG_BUNDLES`` or embedded in the pyjig
+package, as long as no other revision is asked for. Only then is the template
+repo cloned, or when *remote* templates are asked for.
+
+Mirrors and checkouts are built in private directories and renamed into
+place, so concurrent pyjig processes and threads sharing a cache never see a
+partial template.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from pyjig import bundle, trace
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# Templates used by pyjig, keyed by the short name used for pinning
+
+TEMPLATES = {
+    'pyapp': 'gh:jamercee/cookiecutter-pyapp',
+    'pypkg': 'gh:jamercee/cookiecutter-pypkg',
+    'pysource': 'gh:jamercee/cookiecutter-pysource',
+    'pyext': 'gh:jamercee/cookiecutter-pyext',
+    }
+
+# Repo abbreviations understood by cookiecutter
+
+ABBREVIATIONS = {
+    'gh': 'https://github.com/%s.git',
+    'bb': 'https://bitbucket.org/%s',
+    }
+
+# Seconds between remote freshness checks of a branch tracking template
+
+FRESHNESS = 3600
+
+SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+HEX_RE = re.compile(r'^[0-9a-f]{7,40}$')
+
+
+def default_root():
+    r"""Return the default cache directory, ``$PYJIG_CACHE`` or
+    ``~/.pyjig/templates``."""
+
+    return os.environ.get('PYJIG_CACHE') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'templates')
+
+
+def expand_url(url):
+    r"""Expand cookiecutter style abbreviations (``gh:user/repo``) in *url*
+    into a url git can clone."""
+
+    prefix, sep, rest = url.partition(':')
+    if sep and prefix in ABBREVIATIONS:
+        return ABBREVIATIONS[prefix] % rest
+    return url
+
+
+def parse_pins(pins):
+    r"""Convert a list of ``NAME=REV`` strings (as given on the command line)
+    into a dictionary. Raises :py:exc:`ValueError` on malformed entries."""
+
+    result = {}
+    for pin in pins or ():
+        name, sep, rev = pin.partition('=')
+        if not sep or not name or not rev:
+            raise ValueError("invalid template pin '%s', expected NAME=REV" % pin)
+        result[name] = rev
+    return result
+
+
+class TemplateCache:
+    r"""Local cache of template repos rooted at *root*.
+
+    *offline* prevents any network access, *refresh* forces a freshness check
+    regardless of :data:`FRESHNESS`, *pins* maps template names to the
+    revision (commit, tag or branch) to use, *urls* overrides
+    :data:`TEMPLATES` and *bundles* lists the directories of template bundles
+    to prefer (default :py:func:`pyjig.bundle.default_dirs`). With *remote*
+    no bundle is used, templates always come from their repos."""
+
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, root=None, offline=False, refresh=False, pins=None,
+                 urls=None, bundles=None, remote=False):
+        self.root = root or default_root()
+        if remote:
+            bundles = ()
+        self.bundles = bundle.default_dirs() if bundles is None \
+            else list(bundles)
+        self.offline = offline
+        self.refresh = refresh
+        self.pins = dict(pins or {})
+        self.urls = dict(urls or TEMPLATES)
+        self.lock = threading.RLock()
+
+    def url(self, name):
+        r"""Return the clonable url of template *name*."""
+
+        try:
+            return expand_url(self.urls[name])
+        except KeyError:
+            raise RuntimeError("unknown template '%s'" % name)
+
+    def repo(self, name):
+        r"""Return the cache key (repo basename) of template *name*."""
+
+        base = self.url(name).rstrip('/')
+        base = os.path.basename(base)
+        return base[:-4] if base.endswith('.git') else base
+
+    def git(self, name, *args, **kwargs):
+        r"""Run git *args* against the mirror of template *name* and return
+        its stripped output."""
+
+        mirror = os.path.join(self.root, self.repo(name) + '.git')
+        cmd = ['git', '--git-dir', mirror] + list(args)
+        LOG.debug("run %s", ' '.join(cmd))
+        with trace.span('git', argv=' '.join(args)):
+            out = subprocess.check_output(cmd, stderr=subprocess.PIPE,
+                                          **kwargs)
+        return out.decode('utf-8').strip()
+
+    def mirror(self, name):
+        r"""Return the path of the bare mirror for template *name*, cloning
+        it if it does not already exist."""
+
+        mirror = os.path.join(self.root, self.repo(name) + '.git')
+        if os.path.isdir(mirror):
+            return mirror
+
+        if self.offline:
+            raise RuntimeError("template '%s' is not cached and offline "
+                               "mode is enabled" % name)
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+        LOG.info('>>> Caching template %s', self.url(name))
+        tmpd = tempfile.mkdtemp(dir=self.root)
+        try:
+            with trace.span('clone', url=self.url(name)):
+                try:
+                    subprocess.check_call(
+                        ['git', 'clone', '--quiet', '--mirror', self.url(name),
+                         os.path.join(tmpd, 'mirror.git')])
+                except subprocess.CalledProcessError as exc:
+                    raise RuntimeError('unable to fetch template %s (git '
+                                       'clone exited with %d)' %
+                                       (self.url(name), exc.returncode))
+            try:
+                os.rename(os.path.join(tmpd, 'mirror.git'), mirror)
+            except OSError:
+                if not os.path.isdir(mirror):
+                    raise
+        finally:
+            shutil.rmtree(tmpd, ignore_errors=True)
+
+        self.touch(name)
+        return mirror
+
+    def fetch(self, name):
+        r"""Fetch the mirror of template *name* from its remote."""
+
+        try:
+            self.git(name, 'fetch', '--quiet', '--prune')
+        except subprocess.CalledProcessError as exc:
+            err = exc.stderr.decode('utf-8', 'replace').strip()
+            raise RuntimeError('unable to fetch template %s: %s' %
+                               (self.url(name), err or 'git fetch failed'))
+        self.touch(name)
+
+    def touch(self, name):
+        r"""Record that template *name* was just checked for freshness."""
+
+        with open(os.path.join(self.root, self.repo(name) + '.stamp'), 'w'):
+            pass
+
+    def is_fresh(self, name):
+        r"""Return ``True`` if template *name* was checked for freshness
+        within the last :data:`FRESHNESS` seconds."""
+
+        if self.refresh:
+            return False
+        try:
+            mtime = os.path.getmtime(
+                os.path.join(self.root, self.repo(name) + '.stamp'))
+        except OSError:
+            return False
+        return time.time() - mtime < FRESHNESS
+
+    def update(self, name, rev):
+        r"""Fetch the mirror of template *name* if the remote *rev* has moved
+        since the last fetch."""
+
+        try:
+            with trace.span('ls-remote', url=self.url(name), rev=rev):
+                out = subprocess.check_output(
+                    ['git', 'ls-remote', self.url(name), rev],
+                    stderr=subprocess.PIPE).decode('utf-8')
+        except subprocess.CalledProcessError:
+            LOG.warning('>>> Unable to reach %s, using cached template',
+                        self.url(name))
+            return
+
+        remote = out.split()[0] if out.strip() else None
+        try:
+            local = self.git(name, 'rev-parse', '--verify', '-q', rev)
+        except subprocess.CalledProcessError:
+            local = None
+
+        if remote is None or remote != local:
+            LOG.debug('fetch %s (%s != %s)', name, remote, local)
+            self.fetch(name)
+        else:
+            self.touch(name)
+
+    def is_commit(self, name, rev):
+        r"""Return ``True`` if *rev* is the id (full or abbreviated) of a
+        commit in the mirror of template *name*. A branch or tag that merely
+        looks like one (``deadbeef``) resolves to some other commit, as git
+        prefers refs to abbreviated ids, and is not."""
+
+        if not HEX_RE.match(rev):
+            return False
+        try:
+            sha = self.git(name, 'rev-parse', '--verify', '-q',
+                           rev + '^{commit}')
+        except subprocess.CalledProcessError:
+            return False
+        return sha.startswith(rev)
+
+    def resolve(self, name, rev=None):
+        r"""Return the full commit id of template *name* at revision *rev*
+        (defaults to the pinned revision or ``HEAD``)."""
+
+        rev = rev or self.pins.get(name) or 'HEAD'
+
+        # Full commit ids are immutable, no need to consult the remote
+
+        if SHA_RE.match(rev) and os.path.isdir(self.path(name, rev)):
+            return rev
+
+        fetched = not os.path.isdir(
+            os.path.join(self.root, self.repo(name) + '.git'))
+        self.mirror(name)
+
+        # Commit ids (full or abbreviated) never move, only branches and
+        # tags need a freshness check
+
+        current = self.offline or fetched or self.is_commit(name, rev)
+        if not (current or self.is_fresh(name)):
+            self.update(name, rev)
+
+        try:
+            return self.git(name, 'rev-parse', '--verify', '-q',
+                            rev + '^{commit}')
+        except subprocess.CalledProcessError:
+            if self.offline:
+                raise RuntimeError("revision '%s' of template '%s' is not "
+                                   "cached and offline mode is enabled" %
+                                   (rev, name))
+            self.fetch(name)
+            try:
+                return self.git(name, 'rev-parse', '--verify', '-q',
+                                rev + '^{commit}')
+            except subprocess.CalledProcessError:
+                raise RuntimeError("unknown revision '%s' of template '%s'" %
+                                   (rev, name))
+
+    def path(self, name, sha):
+        r"""Return the checkout directory of template *name* at commit
+        *sha*."""
+
+        return os.path.join(self.root, self.repo(name), sha)
+
+    def checkout(self, name, rev=None):
+        r"""Return a local directory containing template *name* at revision
+        *rev*, populating the cache as required. If a bundle directory has a
+        bundle of the template at that revision (any, if *rev* is not given
+        or pinned), the bundle file is returned instead."""
+
+        found = bundle.find(self.bundles, name, rev or self.pins.get(name))
+        if found is not None:
+            return found.path
+
+        with self.lock:
+            return self._checkout(name, rev)
+
+    def _checkout(self, name, rev):
+        r"""Implementation of :py:meth:`checkout`, called with the lock
+        held."""
+
+        sha = self.resolve(name, rev)
+        tgt = self.path(name, sha)
+        if os.path.isdir(tgt):
+            return tgt
+
+        import tarfile  # pylint: disable=import-outside-toplevel
+
+        # Extract into a private dir, then rename into place so concurrent
+        # pyjig processes never see a partial checkout.
+
+        parent = os.path.dirname(tgt)
+        if not os.path.isdir(parent):
+            os.makedirs(parent)
+
+        tmpd = tempfile.mkdtemp(dir=parent)
+        try:
+            mirror = os.path.join(self.root, self.repo(name) + '.git')
+            with trace.span('archive', template=name, rev=sha):
+                proc = subprocess.Popen(
+                    ['git', '--git-dir', mirror, 'archive', '--format=tar',
+                     sha], stdout=subprocess.PIPE)
+                with tarfile.open(fileobj=proc.stdout, mode='r|') as tar:
+                    if hasattr(tarfile, 'data_filter'):
+                        tar.extractall(tmpd, filter='data')
+                    else:
+                        tar.extractall(tmpd)
+            if proc.wait():
+                raise RuntimeError("unable to extract template '%s' at %s" %
+                                   (name, sha))
+            try:
+                os.rename(tmpd, tgt)
+            except OSError:
+                if not os.path.isdir(tgt):
+                    raise
+        finally:
+            shutil.rmtree(tmpd, ignore_errors=True)
+
+        LOG.debug("template %s@%s -> %s", name, sha[:10], tgt)
+        return tgt
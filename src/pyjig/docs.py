@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`docs` - Incremental documentation builds
+#################################################
+
+.. module:: pyjig.docs
+   :synopsis: Build a project's Sphinx documentation incrementally, in parallel
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+``pyjig docs`` builds the project's documentation (``docs/``) with
+``sphinx-build``, reading and writing in parallel (``--jobs``).
+
+Sphinx only re-reads documents whose source, or a module they document with
+``automodule``, changed since its last build, but keeps what it knows in
+``docs/_build/doctrees`` where ``make clean`` throws it away. Pyjig keeps it
+in a per-project cache instead (``~/.pyjig/docs``, or ``$PYJIG_DOCS_CACHE``),
+so cleaning the project, or deleting the output, costs no re-reading.
+
+Pyjig also records a hash of every file the documentation is built from
+(``docs/*.rst``, ``docs/conf.py`` and ``src/*.py``). The documents a change
+affects are the changed ``*.rst`` and those documenting a changed module
+(all of them if ``conf.py`` changed). When the output exists and no document
+is affected, Sphinx is not started at all; otherwise the affected documents
+are reported before Sphinx rebuilds them.
+
+New projects get a ``make pdocs`` recipe running ``pyjig docs``, see
+:py:func:`pyjig.pyjig.install_fragment`.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import subprocess
+
+from pyjig import metadata
+from pyjig.lint import ResultCache
+from pyjig.toolchain import find, validate
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+SPHINX = 'sphinx-build'
+
+# Files the documentation is built from; a changed configuration affects
+# every document
+
+SOURCES = ('docs/*.rst', 'docs/conf.py', 'src/*.py')
+CONFIG = 'docs/conf.py'
+
+AUTODOC_RE = re.compile(r'^\s*\.\.\s+auto\w+::\s*(\S+)', re.MULTILINE)
+
+
+def default_cachedir():
+    r"""Return the documentation cache directory, ``$PYJIG_DOCS_CACHE`` or
+    ``~/.pyjig/docs``."""
+
+    return os.environ.get('PYJIG_DOCS_CACHE') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'docs')
+
+
+def source_hashes(root):
+    r"""Return ``{file: sha1}`` of the files the documentation of project
+    *root* is built from, relative to *root*."""
+
+    hashes = {}
+    for pattern in SOURCES:
+        for fname in glob.glob(os.path.join(root, pattern)):
+            with open(fname, 'rb') as fin:
+                hashes[os.path.relpath(fname, root).replace(os.sep, '/')] = \
+                    hashlib.sha1(fin.read()).hexdigest()
+    return hashes
+
+
+def module_names(rel, slug):
+    r"""Return the names source file *rel* (``src/*.py``) is documented
+    as."""
+
+    stem = os.path.splitext(os.path.basename(rel))[0]
+    if stem == '__init__':
+        return set([slug]) if slug else set()
+    names = set([stem, 'src.' + stem])
+    if slug:
+        names.add(slug + '.' + stem)
+    return names
+
+
+def affected(root, slug, old, new):
+    r"""Compare the source hashes *old* and *new* (see
+    :py:func:`source_hashes`) of project *root*, whose package is *slug*.
+    Returns the files changed, added or removed, and the documents
+    (``docs/*.rst``) they affect."""
+
+    changed = sorted(fname for fname in set(old) | set(new)
+                     if old.get(fname) != new.get(fname))
+    documents = sorted(fname for fname in new if fname.endswith('.rst'))
+    if CONFIG in changed:
+        return changed, documents
+
+    names = set()
+    for fname in changed:
+        if fname.startswith('src/'):
+            names.update(module_names(fname, slug))
+
+    result = []
+    for fname in documents:
+        if fname in changed:
+            result.append(fname)
+            continue
+        with open(os.path.join(root, fname)) as fin:
+            targets = AUTODOC_RE.findall(fin.read())
+        if any(target == name or target.startswith(name + '.')
+               for target in targets for name in names):
+            result.append(fname)
+    return changed, result
+
+
+def sphinx_command(sphinx, builder, doctrees, outdir, jobs, fresh=False):
+    r"""Return the command building ``docs`` into *outdir* with *builder*,
+    keeping the environment in *doctrees*, in *jobs* processes. With
+    *fresh* the environment is rebuilt from scratch."""
+
+    # pylint: disable=too-many-arguments
+
+    argv = [sphinx, '-q', '-b', builder, '-d', doctrees, '-j', str(jobs)]
+    if fresh:
+        argv.append('-E')
+    return argv + ['docs', outdir]
+
+
+def build_docs(root, slug, builder='html', jobs=None, cache=None,
+               fresh=False):
+    r"""Build the documentation of the project in *root*, whose package is
+    *slug*, with Sphinx *builder* in *jobs* processes, keeping the Sphinx
+    environment and source hashes in *cache* (a
+    :py:class:`pyjig.lint.ResultCache`). Returns the documents the changes
+    affected, or ``None`` if the output was up to date and Sphinx was not
+    run."""
+
+    # pylint: disable=too-many-arguments
+
+    cache = cache or ResultCache(default_cachedir())
+    jobs = jobs or os.cpu_count() or 1
+
+    key = cache.key('docs', root, builder)
+    outdir = os.path.join('docs', '_build', builder)
+    old = {} if fresh else cache.load(key) or {}
+    new = source_hashes(root)
+    built = os.path.isdir(os.path.join(root, outdir)) and \
+        bool(os.listdir(os.path.join(root, outdir)))
+
+    # Changes to modules no document describes need no Sphinx run either,
+    # unless a document was removed
+
+    changed, documents = affected(root, slug, old, new)
+    LOG.debug('changed: %s', ', '.join(changed))
+    if built and old and not documents and \
+            all(fname in new for fname in changed):
+        if changed:
+            cache.save(key, new)
+        return None
+
+    if old and documents:
+        LOG.info('>>> rebuilding %s', ', '.join(documents))
+
+    validate([SPHINX])
+    doctrees = os.path.join(cache.root, 'doctrees',
+                            hashlib.sha1(root.encode('utf-8')).hexdigest())
+    status = subprocess.call(
+        sphinx_command(find([SPHINX])[SPHINX], builder, doctrees, outdir,
+                       jobs, fresh), cwd=root)
+    if status:
+        raise RuntimeError('%s failed with status %d' % (SPHINX, status))
+
+    cache.save(key, new)
+    return documents
+
+
+def docs(argv=None):
+    r"""``pyjig docs``: build the project's documentation, re-reading only
+    the documents changed sources affect. Returns -1 if the build failed."""
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig docs',
+        description='Build the documentation incrementally and in parallel.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=None, metavar='N',
+        help='Build with N processes (default one per CPU).')
+    parser.add_argument(
+        '-b', '--builder',
+        default='html',
+        help='Sphinx builder (default %(default)s).')
+    parser.add_argument(
+        '-E', '--fresh',
+        action='store_true', default=False,
+        help='Discard the saved environment and re-read every document.')
+    args = parser.parse_args(argv)
+
+    root = metadata.find_root()
+    try:
+        slug = metadata.load(root).project_slug if root else None
+        documents = build_docs(root or os.getcwd(), slug, args.builder,
+                               args.jobs, fresh=args.fresh)
+    except (RuntimeError, IOError, OSError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    if documents is None:
+        LOG.info('>>> documentation is up to date')
+    else:
+        LOG.info('>>> built docs/_build/%s, %d documents affected',
+                 args.builder, len(documents))
+    return 0
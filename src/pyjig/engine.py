@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`engine` - Template rendering engine
+############################################
+
+.. module:: pyjig.engine
+   :synopsis: Load a cookiecutter template once, render it many times
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Cookiecutter re-reads, re-parses and re-compiles a template for every project
+it generates. Pyjig adds many source modules from the same template, so this
+module loads a template once -- its ``cookiecutter.json``, file list,
+binary/newline detection and a Jinja environment that keeps each compiled
+file -- and then renders it as many times as needed.
+
+Rendering produces the generated files in memory, leaving pyjig free to route
+them into ``src/``, ``docs/`` and ``tests/`` without a scratch directory.
+Template hooks are not run by :py:meth:`Template.render`;
+:py:meth:`Template.generate` writes a whole project to an explicit output
+directory and runs the template's hooks there.
+
+A template is loaded from a directory (a template checkout) or from a
+single file bundle (see :py:mod:`pyjig.bundle`), whose files are rendered
+straight from memory by :py:class:`BundleLoader`.
+
+Nothing in this module changes the process working directory and loaded
+templates are shared safely between threads, so many generations can run
+concurrently in one interpreter.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import collections
+import copy
+import fnmatch
+import json
+import logging
+import os
+import threading
+
+# ----------------------------------------------------------------------------
+# 3rd party imports
+# ----------------------------------------------------------------------------
+from binaryornot.check import is_binary
+from cookiecutter.config import get_user_config
+from cookiecutter.environment import StrictEnvironment
+from cookiecutter.generate import apply_overwrites_to_context
+from cookiecutter.hooks import run_script_with_context
+from cookiecutter.prompt import prompt_for_config
+from jinja2 import BaseLoader, FileSystemLoader, TemplateNotFound
+
+from pyjig import bundle, trace
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# Templates loaded by this process, keyed by absolute path
+
+LOADED = {}
+LOCK = threading.Lock()
+
+# User's ~/.cookiecutterrc, read on first use
+
+USER_CONFIG = None
+
+
+def load(path):
+    r"""Return the :py:class:`Template` in directory (or bundle file) *path*,
+    loading it only the first time it is requested."""
+
+    path = os.path.abspath(path)
+    with LOCK:
+        template = LOADED.get(path)
+        if template is None:
+            template = LOADED[path] = Template(path)
+    return template
+
+
+def user_config():
+    r"""Return the user's cookiecutter config, read once per process."""
+
+    global USER_CONFIG  # pylint: disable=global-statement
+
+    if USER_CONFIG is None:
+        USER_CONFIG = get_user_config()
+    return USER_CONFIG
+
+
+class Template:
+    r"""A cookiecutter template loaded from directory *path*, or from the
+    template bundle in file *path*. Its ``rev`` is the template commit: the
+    name of a cached checkout (see :py:meth:`pyjig.cache.TemplateCache.path`)
+    or the commit recorded in the bundle."""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+        if os.path.isfile(self.path):
+            self.bundle = bundle.open_bundle(self.path)
+            self.rev = self.bundle.rev
+            self.defaults = self.bundle.schema
+            names = self.bundle.listdir()
+        else:
+            self.bundle = None
+            self.rev = os.path.basename(self.path)
+            with open(os.path.join(self.path, 'cookiecutter.json')) as fin:
+                self.defaults = json.load(
+                    fin, object_pairs_hook=collections.OrderedDict)
+            names = os.listdir(self.path)
+
+        # The project template is the child named {{cookiecutter...}}
+
+        for name in sorted(names):
+            if 'cookiecutter' in name and '{{' in name and '}}' in name:
+                self.project = name
+                break
+        else:
+            raise RuntimeError("no project template found in %s" % self.path)
+
+        self.root = os.path.join(self.path, self.project)
+
+        copy_only = self.defaults.get('_copy_without_render', [])
+
+        if self.bundle is None:
+            self.dirs, self.files = self.scan()
+        else:
+            self.dirs, self.files = self.scan_bundle()
+        self.files = [(rel, binary or any(fnmatch.fnmatch(rel, pat)
+                                          for pat in copy_only), nline, mode)
+                      for rel, binary, nline, mode in self.files]
+
+        self.env = None
+        self.static = None
+        self.names = {}
+        self.lock = threading.Lock()
+
+    def scan(self):
+        r"""Return the directories and files of the project template
+        directory, each file as a ``(path, binary, newline, mode)`` tuple."""
+
+        dirs = []
+        files = []
+        for root, dnames, fnames in os.walk(self.root):
+            dnames.sort()
+            rel = os.path.relpath(root, self.root)
+            for dname in dnames:
+                dirs.append(os.path.normpath(os.path.join(rel, dname)))
+            for fname in sorted(fnames):
+                rel_fname = os.path.normpath(os.path.join(rel, fname))
+                src = os.path.join(self.root, rel_fname)
+                files.append((rel_fname, is_binary(src), newline(src),
+                              os.stat(src).st_mode))
+        return dirs, files
+
+    def scan_bundle(self):
+        r"""Return the directories and files of the project template in the
+        bundle, in the order :py:meth:`scan` does as the bundle was built by
+        the same walk. Binary and newline detection were done when the bundle
+        was built."""
+
+        prefix = self.project + '/'
+        dirs = [path[len(prefix):].replace('/', os.path.sep)
+                for path in self.bundle.dirs if path.startswith(prefix)]
+        files = [(path[len(prefix):].replace('/', os.path.sep), entry[4],
+                  entry[5], entry[3])
+                 for path, entry in self.bundle.files.items()
+                 if path.startswith(prefix)]
+        return dirs, files
+
+    def read(self, rel):
+        r"""Return the contents of source file *rel* of the project template
+        as bytes."""
+
+        if self.bundle is not None:
+            return self.bundle.read(
+                self.project + '/' + rel.replace(os.path.sep, '/'))
+        with open(os.path.join(self.root, rel), 'rb') as fin:
+            return fin.read()
+
+    def context(self, extra=None, no_input=False):
+        r"""Return the render context for this template. *extra* overrides
+        the template defaults; unless *no_input* the user is prompted for each
+        value."""
+
+        defaults = copy.deepcopy(self.defaults)
+
+        default_context = user_config().get('default_context')
+        if default_context:
+            apply_overwrites_to_context(defaults, default_context)
+        if extra:
+            apply_overwrites_to_context(defaults, extra)
+
+        context = {'cookiecutter': defaults}
+        context['cookiecutter'] = prompt_for_config(context, no_input)
+        context['cookiecutter']['_template'] = self.path
+        return context
+
+    def environment(self, context):
+        r"""Return the Jinja environment for this template, created on first
+        use."""
+
+        with self.lock:
+            if self.env is None:
+                if self.bundle is None:
+                    loader = FileSystemLoader(
+                        [self.root, os.path.join(self.path, 'templates')])
+                else:
+                    loader = BundleLoader(self.bundle,
+                                          [self.project, 'templates'])
+                self.env = StrictEnvironment(
+                    context=context,
+                    keep_trailing_newline=True,
+                    auto_reload=False,
+                    loader=loader)
+        return self.env
+
+    def render_name(self, name, context):
+        r"""Render the path *name*, compiling it on first use."""
+
+        tmpl = self.names.get(name)
+        if tmpl is None:
+            tmpl = self.names[name] = self.environment(context).from_string(name)
+        return tmpl.render(**context)
+
+    def outputs(self, context):
+        r"""Return a list of ``(path, source)`` tuples pairing each file the
+        template generates with *context* (relative to the project directory)
+        with its source within the template."""
+
+        outputs = []
+        for rel, _, _, _ in self.files:
+            out = self.render_name(rel, context)
+            if os.path.basename(out):
+                outputs.append((out, rel))
+        return outputs
+
+    def render(self, context, only=None):
+        r"""Render the template with *context*. Returns a tuple of the
+        project directory name and a list of ``(path, data, mode)`` tuples,
+        where *path* is relative to the project directory and *data* is the
+        file's contents as bytes (``None`` for directories). If *only* is
+        given, just the files generated from those template sources are
+        rendered."""
+
+        env = self.environment(context)
+        newlines = context['cookiecutter'].get('_new_lines')
+
+        project = self.render_name(self.project, context)
+
+        entries = []
+        if only is None:
+            for rel in self.dirs:
+                entries.append((self.render_name(rel, context), None, None))
+
+        for rel, raw, nline, mode in self.files:
+            if only is not None and rel not in only:
+                continue
+            out = self.render_name(rel, context)
+            if not os.path.basename(out):
+                continue
+            with trace.span('render', file=rel):
+                if raw:
+                    data = self.read(rel)
+                else:
+                    tmpl = env.get_template(rel.replace(os.path.sep, '/'))
+                    text = tmpl.render(**context)
+                    nline = newlines or nline
+                    if nline != '\n':
+                        text = text.replace('\n', nline)
+                    data = text.encode('utf-8')
+            entries.append((out, data, mode))
+
+        return project, entries
+
+    def static_sources(self):
+        r"""Return the source files of the template that are not rendered
+        (binary or copy-only files) or have no Jinja markup, and so generate
+        the same file for every context. Found on first use."""
+
+        with self.lock:
+            if self.static is None:
+                self.static = set(
+                    rel for rel, raw, _, _ in self.files
+                    if raw or not any(mark in self.read(rel)
+                                      for mark in (b'{{', b'{%', b'{#')))
+        return self.static
+
+    def hooks(self, name):
+        r"""Return the scripts in the template's ``hooks/`` directory for
+        hook *name* (``pre_gen_project`` or ``post_gen_project``)."""
+
+        if self.bundle is not None:
+            if 'hooks' not in self.bundle.dirs:
+                return []
+            hdir = self.bundle.extract('hooks')
+        else:
+            hdir = os.path.join(self.path, 'hooks')
+        if not os.path.isdir(hdir):
+            return []
+        return [os.path.join(hdir, fname) for fname in sorted(os.listdir(hdir))
+                if os.path.splitext(fname)[0] == name
+                if not fname.endswith('~')]
+
+    def generate(self, context, outdir, store=None):
+        r"""Render the template with *context* into a new project directory
+        under *outdir*, running the template's hooks inside it. Files that
+        are the same for every project are materialized through *store* (a
+        :py:class:`pyjig.store.Store`), if given. Returns a tuple of the
+        project directory and the list of files written."""
+
+        project, entries = self.render(context)
+        static = set()
+        if store is not None:
+            static = set(self.render_name(rel, context)
+                         for rel in self.static_sources())
+
+        pdir = os.path.join(os.path.abspath(outdir), project)
+        if os.path.exists(pdir):
+            raise RuntimeError('directory "%s" already exists' % pdir)
+        os.makedirs(pdir)
+
+        for script in self.hooks('pre_gen_project'):
+            with trace.span('hook', script=os.path.basename(script)):
+                run_script_with_context(script, pdir, context)
+
+        written = []
+        with trace.span('write', files=len(entries)):
+            for path, data, mode in entries:
+                tgt = os.path.join(pdir, path)
+                if data is None:
+                    if not os.path.isdir(tgt):
+                        os.makedirs(tgt)
+                    continue
+                parent = os.path.dirname(tgt)
+                if not os.path.isdir(parent):
+                    os.makedirs(parent)
+                if path in static:
+                    store.materialize(data, tgt, mode)
+                else:
+                    with open(tgt, 'wb') as fout:
+                        fout.write(data)
+                    os.chmod(tgt, mode & 0o7777)
+                written.append(tgt)
+
+        for script in self.hooks('post_gen_project'):
+            with trace.span('hook', script=os.path.basename(script)):
+                run_script_with_context(script, pdir, context)
+
+        return pdir, written
+
+
+class BundleLoader(BaseLoader):
+    r"""Jinja loader of the templates in template bundle *source*, searched
+    for under each directory of *prefixes* in turn, like
+    :py:class:`jinja2.FileSystemLoader` searches its paths. Bundles never
+    change, so loaded templates are always up to date."""
+
+    def __init__(self, source, prefixes):
+        self.source = source
+        self.prefixes = prefixes
+
+    def get_source(self, environment, template):
+        for prefix in self.prefixes:
+            path = prefix + '/' + template
+            if path in self.source.files:
+                text = self.source.read(path).decode('utf-8')
+                return text, None, lambda: True
+        raise TemplateNotFound(template)
+
+    def list_templates(self):
+        return sorted(path[len(prefix) + 1:] for path in self.source.files
+                      for prefix in self.prefixes
+                      if path.startswith(prefix + '/'))
+
+
+def newline(fname):
+    r"""Return the newline sequence used by text file *fname*."""
+
+    with open(fname, 'rb') as fin:
+        line = fin.readline()
+    if line.endswith(b'\r\n'):
+        return '\r\n'
+    if line.endswith(b'\r'):
+        return '\r'
+    return '\n'
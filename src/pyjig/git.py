@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`git` - Git helpers
+###########################
+
+.. module:: pyjig.git
+   :synopsis: Fast repository detection, initial commits and staging
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Creating the first commit of a newly generated project used to cost four git
+processes (``status``, ``init``, ``add`` and ``commit``), with ``add`` and
+``commit`` each scanning and hashing the whole tree. Pyjig already knows every
+file it generated, so :py:func:`initial_commit` instead
+
+   * detects an enclosing repository by looking for ``.git`` in each parent
+     directory, without running git,
+   * runs ``git init`` and reads the identity and config git would use from a
+     single ``git var -l``,
+   * asks one ``git check-ignore`` which of the files git would ignore, so
+     every ignore file git reads applies exactly as ``git add`` applies it,
+   * asks one ``git check-attr`` whether any of the files has an attribute
+     that converts its content on ``git add``,
+   * streams every file into one ``git fast-import``, which writes the blobs,
+     tree and commit in a single pack, and
+   * writes the index from the stat data and blob ids already in hand, so the
+     new working tree is clean without ``git add``.
+
+Anything the fast path does not model faithfully -- line ending conversion,
+clean filters, signed commits, commit hooks -- makes it return ``False`` so the caller can
+fall back to ``git add`` and ``git commit``.
+
+Files later added to a project are staged by :py:func:`stage`, which hands
+git exactly the paths pyjig wrote, less those git ignores, instead of
+``git add .``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import hashlib
+import logging
+import os
+import stat
+import struct
+import subprocess
+import time
+
+from pyjig import timings, trace
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# Config settings that change what ``git add`` / ``git commit`` would store
+# (``None`` for any value)
+
+UNSUPPORTED_CONFIG = {
+    'core.autocrlf': ('true', 'input'),
+    'core.safecrlf': ('true',),
+    'core.eol': None,
+    'core.attributesfile': None,
+    'commit.gpgsign': ('true',),
+    }
+
+# Attributes that convert a file's content on ``git add``
+
+CONVERT_ATTRIBUTES = ('text', 'eol', 'crlf', 'ident', 'filter',
+                      'working-tree-encoding')
+
+# Hooks ``git commit`` would run
+
+COMMIT_HOOKS = ('pre-commit', 'prepare-commit-msg', 'commit-msg', 'post-commit')
+
+
+def find_git_dir(path):
+    r"""Return the ``.git`` of the repository containing *path*, or ``None``
+    if *path* is not inside a git work tree. No git process is run."""
+
+    if os.environ.get('GIT_DIR'):
+        return os.environ['GIT_DIR']
+
+    curdir = os.path.abspath(path)
+    while True:
+        gdir = os.path.join(curdir, '.git')
+        if os.path.exists(gdir):
+            return gdir
+        parent = os.path.dirname(curdir)
+        if parent == curdir:
+            return None
+        curdir = parent
+
+
+def git_vars(sdir):
+    r"""Return git's logical variables and config for *sdir* as a
+    dictionary (``git var -l``)."""
+
+    out = subprocess.check_output(['git', 'var', '-l'], cwd=sdir)
+    result = {}
+    for line in out.decode('utf-8', 'replace').splitlines():
+        key, _, val = line.partition('=')
+        result[key.lower() if '.' in key else key] = val
+    return result
+
+
+def hooks(sdir, gdir, gvars):
+    r"""Return the names of the :py:data:`COMMIT_HOOKS` installed in the
+    repository *gdir* (work tree *sdir*), which ``git commit`` would run."""
+
+    hdir = gvars.get('core.hookspath')
+    hdir = os.path.join(sdir, os.path.expanduser(hdir)) if hdir else \
+        os.path.join(gdir, 'hooks')
+    return [name for name in COMMIT_HOOKS
+            if os.access(os.path.join(hdir, name), os.X_OK)]
+
+
+def ignored(sdir, paths):
+    r"""Return the set of *paths* (``/`` separated, relative to *sdir*) git
+    ignores, as one ``git check-ignore`` reports them."""
+
+    proc = subprocess.Popen(['git', 'check-ignore', '--stdin', '-z'],
+                            cwd=sdir, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE)
+    out, _ = proc.communicate(b'\0'.join(path.encode('utf-8')
+                                         for path in paths))
+
+    # check-ignore exits 1 when no path is ignored
+
+    if proc.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(proc.returncode,
+                                            ['git', 'check-ignore'])
+    return set(out.decode('utf-8').split('\0')) - set([''])
+
+
+def attributes(sdir, paths):
+    r"""Return the set of *paths* (``/`` separated, relative to *sdir*) with
+    any of the :py:data:`CONVERT_ATTRIBUTES` set, unset or given a value, as
+    one ``git check-attr`` reports them."""
+
+    cmd = ['git', 'check-attr', '--stdin', '-z']
+    cmd.extend(CONVERT_ATTRIBUTES)
+    proc = subprocess.Popen(cmd, cwd=sdir, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE)
+    out, _ = proc.communicate(b'\0'.join(path.encode('utf-8')
+                                         for path in paths))
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode,
+                                            ['git', 'check-attr'])
+
+    # "path NUL attribute NUL value NUL" for each path and attribute
+
+    fields = out.decode('utf-8').split('\0')
+    return set(path for path, _, value in zip(*[iter(fields)] * 3)
+               if value != 'unspecified')
+
+
+def ident(gvars, who):
+    r"""Return the (name, email) of *who* (``AUTHOR`` or ``COMMITTER``)
+    from *gvars*, without git's timestamp."""
+
+    # "Name <email> 1444000000 +0000"
+
+    text = gvars['GIT_%s_IDENT' % who]
+    return text.rsplit(' ', 2)[0]
+
+
+def blob_id(data):
+    r"""Return the binary git object id of blob *data*."""
+
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).digest()
+
+
+@timings.timed('index')
+def write_index(gdir, entries):
+    r"""Write the index (version 2) of repository *gdir* for *entries*, a
+    list of ``(path, stat, mode, blob_id)`` tuples."""
+
+    body = [struct.pack('>4sLL', b'DIRC', 2, len(entries))]
+    for path, sta, mode, sha in sorted(entries):
+        name = path.encode('utf-8')
+        fields = [int(sta.st_ctime), sta.st_ctime_ns % 1000000000,
+                  int(sta.st_mtime), sta.st_mtime_ns % 1000000000,
+                  sta.st_dev, sta.st_ino, mode, sta.st_uid, sta.st_gid,
+                  sta.st_size]
+        fields = [fld & 0xFFFFFFFF for fld in fields]
+        fields.extend([sha, min(len(name), 0xFFF)])
+        entry = struct.pack('>10L20sH', *fields)
+        entry += name
+        entry += b'\0' * (8 - len(entry) % 8)
+        body.append(entry)
+
+    data = b''.join(body)
+    with open(os.path.join(gdir, 'index'), 'wb') as fout:
+        fout.write(data + hashlib.sha1(data).digest())
+
+
+@timings.timed('fast-import')
+def fast_import(sdir, paths, branch, gvars, message):
+    r"""Stream *paths* (relative to *sdir*) into ``git fast-import`` as a
+    commit on *branch* by the identities in *gvars*. Returns the index
+    entries of the files committed, see :py:func:`write_index`."""
+
+    now = int(time.time())
+    offset = time.localtime(now).tm_gmtoff // 60
+    stamp = '%d %s%02d%02d' % (now, '-' if offset < 0 else '+',
+                               abs(offset) // 60, abs(offset) % 60)
+
+    proc = subprocess.Popen(['git', 'fast-import', '--quiet', '--done'],
+                            cwd=sdir, stdin=subprocess.PIPE)
+    entries = []
+    try:
+        for mark, path in enumerate(paths, 1):
+            fname = os.path.join(sdir, path)
+            sta = os.lstat(fname)
+            if stat.S_ISLNK(sta.st_mode):
+                data = os.readlink(fname).encode('utf-8')
+                mode = 0o120000
+            else:
+                with open(fname, 'rb') as fin:
+                    data = fin.read()
+                mode = 0o100755 if sta.st_mode & 0o100 else 0o100644
+            proc.stdin.write(b'blob\nmark :%d\ndata %d\n' % (mark, len(data)))
+            proc.stdin.write(data + b'\n')
+            entries.append((path, sta, mode, blob_id(data)))
+
+        msg = message.encode('utf-8') + b'\n'
+        cmd = ['commit %s' % branch,
+               'author %s %s' % (ident(gvars, 'AUTHOR'), stamp),
+               'committer %s %s' % (ident(gvars, 'COMMITTER'), stamp),
+               'data %d' % len(msg)]
+        proc.stdin.write('\n'.join(cmd).encode('utf-8') + b'\n' + msg)
+        for mark, (path, _, mode, _) in enumerate(entries, 1):
+            proc.stdin.write(('M %o :%d %s\n' % (mode, mark, path))
+                             .encode('utf-8'))
+        proc.stdin.write(b'\ndone\n')
+    finally:
+        proc.stdin.close()
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode,
+                                                ['git', 'fast-import'])
+
+    return entries
+
+
+def initial_commit(sdir, files=None, message='Initial check in.'):
+    r"""Create a repository in *sdir* whose first commit holds *files* (paths
+    of the generated files, default every file under *sdir*). Returns
+    ``False``, after ``git init``, if the tree needs the regular ``git add``
+    / ``git commit`` path."""
+
+    with timings.phase('init'):
+        subprocess.check_call(['git', 'init', '-q'], cwd=sdir,
+                              stdout=subprocess.DEVNULL)
+    gdir = os.path.join(sdir, '.git')
+
+    with timings.phase('config'):
+        gvars = git_vars(sdir)
+    for key, values in UNSUPPORTED_CONFIG.items():
+        value = gvars.get(key, '').lower()
+        if value and (values is None or value in values):
+            return False
+
+    if hooks(sdir, gdir, gvars):
+        return False
+
+    if files is None:
+        files = []
+        for root, dirs, fnames in os.walk(sdir):
+            dirs[:] = [dname for dname in dirs if dname != '.git']
+            files.extend(os.path.join(root, fname) for fname in fnames)
+
+    paths = sorted(set(os.path.relpath(os.path.join(sdir, fname), sdir)
+                       .replace(os.path.sep, '/') for fname in files))
+
+    with timings.phase('ignore'):
+        skip = ignored(sdir, paths)
+    paths = [path for path in paths if path not in skip]
+    if not paths or any('\n' in path or path.startswith('"')
+                        for path in paths):
+        return False
+
+    with timings.phase('attributes'):
+        if attributes(sdir, paths):
+            return False
+
+    with open(os.path.join(gdir, 'HEAD')) as fin:
+        head = fin.read().strip()
+    if not head.startswith('ref: '):
+        return False
+    branch = head[5:]
+
+    entries = fast_import(sdir, paths, branch, gvars, message)
+    write_index(gdir, entries)
+    LOG.debug('committed %d files to %s', len(entries), branch)
+    return True
+
+
+def stage(sdir, files):
+    r"""Stage *files* in the repository containing *sdir* with a single
+    ``git add``. The paths are passed on stdin, so only they are scanned and
+    hashed however large the work tree is. They are taken literally, never
+    as patterns, and any git ignores are left unstaged."""
+
+    paths = [os.path.relpath(fname, sdir).replace(os.path.sep, '/')
+             for fname in files]
+    if paths:
+        skip = ignored(sdir, paths)
+        paths = [path for path in paths if path not in skip]
+    if not paths:
+        return
+
+    with trace.span('git add', files=len(paths)):
+        proc = subprocess.Popen(['git', '--literal-pathspecs', 'add',
+                                 '--pathspec-from-file=-',
+                                 '--pathspec-file-nul'],
+                                cwd=sdir, stdin=subprocess.PIPE)
+        proc.communicate(b'\0'.join(path.encode('utf-8') for path in paths))
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, ['git', 'add'])
@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`lint` - Cached static analysis
+#######################################
+
+.. module:: pyjig.lint
+   :synopsis: Run pylint and flake8 on changed files only
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+``pyjig lint`` runs the project's static analysis (pylint with the project's
+``pylint.rc``, then flake8) on ``src/*.py`` and ``tests/*.py``, or on the
+files named. Results are kept in a persistent cache (``~/.pyjig/lint``, or
+``$PYJIG_LINT_CACHE``) keyed on
+
+   * the file's path within the project and its content,
+   * the version of the tool, and
+   * the content of the project's configuration (``pylint.rc``,
+     ``setup.cfg``, ``tox.ini`` and ``.flake8``),
+
+so switching branches or making a fresh checkout only re-analyzes files whose
+content is new. The files that are not cached are analyzed in one pylint run
+(``--jobs``) and one flake8 run, both at once, and the messages of every file,
+cached or not, are reported in file order exactly as the tools wrote them.
+
+Pylint's overall score is not reported, as it cannot be assembled from cached
+results. Checks that look across modules (``duplicate-code``, or messages
+about names imported from a module that has since changed) are cached with
+the file they were reported for; use ``--no-cache`` after such changes.
+
+New projects get a ``make lint`` recipe running ``pyjig lint``, see
+:py:func:`pyjig.pyjig.install_fragment`.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import configparser
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from pyjig import metadata
+from pyjig.toolchain import find, validate, version
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+TOOLS = ('pylint', 'flake8')
+
+# Files whose content changes the results of either tool
+
+CONFIGS = ('pylint.rc', 'setup.cfg', 'tox.ini', '.flake8')
+
+# Files analyzed by default, as in the project Makefile
+
+SOURCES = ('src/*.py', 'tests/*.py')
+
+# Pylint's exit status bit for each message category
+
+CATEGORIES = {'F': 1, 'E': 2, 'W': 4, 'R': 8, 'C': 16}
+
+# Pylint's default message template, and the prefix pyjig puts before the
+# project's template to learn the file and category of each message whatever
+# the format; it is removed before messages are reported
+
+MSG_TEMPLATE = '{path}:{line}:{column}: {msg_id}: {msg} ({symbol})'
+MSG_PREFIX = '@pyjig@{path}@{C}@'
+MESSAGE_RE = re.compile(r'@pyjig@(.*?)@([FEWRCI])@')
+
+
+def default_cachedir():
+    r"""Return the lint cache directory, ``$PYJIG_LINT_CACHE`` or
+    ``~/.pyjig/lint``."""
+
+    return os.environ.get('PYJIG_LINT_CACHE') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'lint')
+
+
+def config_digest(root):
+    r"""Return a hash of the configuration files in project *root*."""
+
+    sha = hashlib.sha1()
+    for fname in CONFIGS:
+        try:
+            with open(os.path.join(root, fname), 'rb') as fin:
+                data = fin.read()
+        except IOError:
+            continue
+        sha.update(('%s\0%d\0' % (fname, len(data))).encode('utf-8'))
+        sha.update(data)
+    return sha.hexdigest()
+
+
+class ResultCache:
+    r"""Persistent results in directory *cachedir* (default the lint cache),
+    one file per result, keyed by everything the result depends on. Also
+    used for test results by :py:mod:`pyjig.testrun`."""
+
+    def __init__(self, cachedir=None):
+        self.root = cachedir or default_cachedir()
+
+    def tool_version(self, fname):
+        r"""Return the version of tool *fname*, asking the tool only when it
+        was installed or changed since last asked."""
+
+        versions = self.load('tools') or {}
+        stat = os.stat(fname)
+        stamp = [stat.st_mtime, stat.st_size]
+        recorded = versions.get(fname)
+        if recorded and recorded[0] == stamp:
+            return recorded[1]
+
+        versions[fname] = [stamp, version(fname)]
+        self.save('tools', versions)
+        return versions[fname][1]
+
+    @staticmethod
+    def key(*parts):
+        r"""Return the cache key of *parts* (strings or bytes)."""
+
+        sha = hashlib.sha1()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = part.encode('utf-8')
+            sha.update(b'%d\0' % len(part))
+            sha.update(part)
+        return sha.hexdigest()
+
+    def path(self, key):
+        r"""Return the file holding the result keyed *key*."""
+
+        return os.path.join(self.root, key[:2], key + '.json')
+
+    def load(self, key):
+        r"""Return the result keyed *key*, or ``None``."""
+
+        try:
+            with open(self.path(key)) as fin:
+                return json.load(fin)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def save(self, key, result):
+        r"""Record *result* under *key*. Results are written to a private
+        file and renamed into place, so concurrent runs never see partial
+        results."""
+
+        fname = self.path(key)
+        try:
+            if not os.path.isdir(os.path.dirname(fname)):
+                os.makedirs(os.path.dirname(fname))
+            fdesc, tmpfn = tempfile.mkstemp(dir=os.path.dirname(fname))
+            with os.fdopen(fdesc, 'w') as fout:
+                json.dump(result, fout)
+            os.rename(tmpfn, fname)
+        except (IOError, OSError) as exc:
+            LOG.debug('unable to save result: %s', exc)
+
+
+def msg_template(root):
+    r"""Return the ``msg-template`` of the ``pylint.rc`` in project *root*,
+    or pylint's default."""
+
+    config = configparser.RawConfigParser(strict=False)
+    try:
+        config.read(os.path.join(root, 'pylint.rc'))
+    except configparser.Error:
+        return MSG_TEMPLATE
+    for section in config.sections():
+        template = config.get(section, 'msg-template', fallback='').strip()
+        if template:
+            return template
+    return MSG_TEMPLATE
+
+
+def split_pylint(out, files):
+    r"""Split the output *out* of pylint, run with :py:data:`MSG_PREFIX`
+    before its message template, into ``{file: [status, text]}`` for each of
+    *files*, with the prefixes removed. Each file's status is the pylint
+    exit status its messages alone would give."""
+
+    results = dict((fname, [0, '']) for fname in files)
+
+    # Each module's block of lines goes to the file of its first message
+
+    blocks = []
+    for line in out.splitlines(True):
+        if line.startswith('*************'):
+            blocks.append([None, [line]])
+            continue
+        match = MESSAGE_RE.match(line)
+        if match:
+            fname = os.path.normpath(match.group(1))
+            if blocks and blocks[-1][0] is None:
+                blocks[-1][0] = fname
+            if fname in results:
+                results[fname][0] |= CATEGORIES.get(match.group(2), 0)
+            line = line[match.end():]
+        if blocks:
+            blocks[-1][1].append(line)
+
+    for fname, lines in blocks:
+        if fname in results:
+            results[fname][1] += ''.join(lines)
+    return results
+
+
+def split_flake8(out, files):
+    r"""Split flake8 output *out* into ``{file: [status, text]}`` for each of
+    *files*."""
+
+    results = dict((fname, [0, '']) for fname in files)
+    for line in out.splitlines(True):
+        fname = os.path.normpath(line.split(':', 1)[0])
+        if fname in results:
+            results[fname][0] = 1
+            results[fname][1] += line
+    return results
+
+
+def run_tool(argv, root):
+    r"""Run *argv* in directory *root* and return its exit status and
+    output."""
+
+    proc = subprocess.Popen(argv, cwd=root, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    out = proc.communicate()[0]
+    return proc.returncode, out.decode('utf-8', 'replace')
+
+
+def analyze(tools, root, todo, jobs):
+    r"""Run each of *tools* (``{name: executable}``) at the same time, each
+    on its list of files in *todo* (``{name: [file, ...]}``, relative to
+    project *root*). Returns ``{name: {file: [status, text]}}``."""
+
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    argvs = {
+        'pylint': [tools.get('pylint'), '-rn', '--score=n', '--rcfile',
+                   'pylint.rc', '--jobs', str(jobs), '--msg-template',
+                   MSG_PREFIX + msg_template(root)],
+        'flake8': [tools.get('flake8'), '--jobs', str(jobs)],
+        }
+
+    with concurrent.futures.ThreadPoolExecutor(len(todo)) as pool:
+        futures = dict((name, pool.submit(run_tool, argvs[name] + files, root))
+                       for name, files in todo.items())
+        outputs = dict((name, future.result())
+                       for name, future in futures.items())
+
+    results = {}
+    for name, (status, out) in outputs.items():
+        if name == 'pylint':
+            if status & 32 or status < 0:
+                raise RuntimeError('pylint failed:\n%s' % out)
+            results[name] = split_pylint(out, todo[name])
+        else:
+            if status not in (0, 1):
+                raise RuntimeError('flake8 failed:\n%s' % out)
+            results[name] = split_flake8(out, todo[name])
+    return results
+
+
+def project_files(root, names=None):
+    r"""Return *names* (default ``src/*.py`` and ``tests/*.py``) relative to
+    project *root*."""
+
+    if names:
+        return [os.path.normpath(os.path.relpath(os.path.abspath(name), root))
+                for name in names]
+
+    files = []
+    for pattern in SOURCES:
+        files.extend(sorted(os.path.relpath(fname, root) for fname in
+                            glob.glob(os.path.join(root, pattern))))
+    return files
+
+
+def lint_files(root, files, cache=None, jobs=None, use_cache=True):
+    r"""Analyze *files* (relative to project *root*) with pylint and flake8,
+    using results from *cache* (a :py:class:`ResultCache`) where possible.
+    Returns a list of ``(file, status, text)`` tuples, one per file and tool
+    in file order, and the number of files analyzed."""
+
+    # pylint: disable=too-many-locals
+
+    cache = cache or ResultCache()
+    jobs = jobs or os.cpu_count() or 1
+
+    validate(TOOLS)
+    tools = find(TOOLS)
+    config = config_digest(root)
+    versions = dict((name, cache.tool_version(tools[name])) for name in TOOLS)
+
+    keys = {}
+    cached = {}
+    todo = dict((name, []) for name in TOOLS)
+    for fname in files:
+        with open(os.path.join(root, fname), 'rb') as fin:
+            data = fin.read()
+        for name in TOOLS:
+            key = keys[name, fname] = cache.key(
+                name, versions[name], config, fname.replace(os.sep, '/'),
+                data)
+            result = cache.load(key) if use_cache else None
+            if result is None:
+                todo[name].append(fname)
+            else:
+                cached[name, fname] = result
+
+    todo = dict((name, todo[name]) for name in TOOLS if todo[name])
+    if todo:
+        for name, results in analyze(tools, root, todo, jobs).items():
+            for fname, result in results.items():
+                cache.save(keys[name, fname], result)
+                cached[name, fname] = result
+
+    report = [(fname,) + tuple(cached[name, fname])
+              for fname in files for name in TOOLS]
+    analyzed = len(set(fname for names in todo.values() for fname in names))
+    return report, analyzed
+
+
+def lint(argv=None):
+    r"""``pyjig lint``: analyze the project's sources with pylint and
+    flake8, re-analyzing only files whose results are not cached. Returns -1
+    if any file has messages."""
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig lint',
+        description='Run pylint and flake8 on the files changed since they '
+                    'were last analyzed.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=None, metavar='N',
+        help='Analyze with N processes (default one per CPU).')
+    parser.add_argument(
+        '--no-cache',
+        dest='cache', action='store_false', default=True,
+        help='Analyze every file, refreshing the cache.')
+    parser.add_argument(
+        'files',
+        nargs='*',
+        help='Files to analyze (default src/*.py and tests/*.py).')
+    args = parser.parse_args(argv)
+
+    root = metadata.find_root() or os.getcwd()
+    try:
+        files = project_files(root, args.files)
+        report, analyzed = lint_files(root, files, jobs=args.jobs,
+                                      use_cache=args.cache)
+    except (RuntimeError, IOError, OSError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    failed = set()
+    for fname, status, text in report:
+        sys.stdout.write(text)
+        if status:
+            failed.add(fname)
+    sys.stdout.flush()
+
+    LOG.info('>>> %d files, %d analyzed, %d cached, %d with messages',
+             len(files), analyzed, len(files) - analyzed, len(failed))
+    return -1 if failed else 0
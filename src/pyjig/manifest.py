@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`manifest` - Bulk project creation
+##########################################
+
+.. module:: pyjig.manifest
+   :synopsis: Create many projects from one manifest file
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+``pyjig apply MANIFEST`` creates every project described in a YAML (or JSON)
+manifest in a single process. Templates are checked out and loaded once and
+shared by every project, and projects are built concurrently by a pool of
+threads. A manifest looks like::
+
+   directory: build            # optional, relative to the manifest
+   excludegit: false           # optional default for every project
+   projects:
+     - pkg: fixtures
+       sources: [models, views]
+     - app: service
+       sources: [main]
+       extensions: [speedups]
+       excludegit: true
+
+Each project needs either a ``pkg`` or an ``app`` name; ``sources`` and
+``extensions`` are lists of module names. A manifest with mistakes is
+rejected before any project is created, with every mistake listed. When
+every project has run, a summary lists how long each one took and why any failed.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import json
+import logging
+import os
+import subprocess
+import time
+
+from pyjig import pyjig
+from pyjig.cache import TemplateCache
+from pyjig.toolchain import required, validate
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+PROJECT_KEYS = ('pkg', 'app', 'sources', 'extensions', 'excludegit')
+
+# Project keys holding a name and those holding a list of module names
+
+NAME_KEYS = ('pkg', 'app')
+LIST_KEYS = ('sources', 'extensions')
+
+
+def parse(text, fname='manifest'):
+    r"""Parse manifest *text*. YAML is read with ``ruamel.yaml`` (imported on
+    first use); without it only JSON manifests can be read."""
+
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    try:
+        import ruamel.yaml  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        raise RuntimeError('%s is not JSON and ruamel.yaml is not installed'
+                           % fname)
+
+    try:
+        if hasattr(ruamel.yaml, 'YAML'):
+            return ruamel.yaml.YAML(typ='safe').load(text)
+        return ruamel.yaml.safe_load(text)
+    except ruamel.yaml.YAMLError as exc:
+        raise RuntimeError('unable to parse %s: %s' % (fname, exc))
+
+
+def check_project(item):
+    r"""Return the list of problems with project *item*, empty if it is
+    valid."""
+
+    if not isinstance(item, dict):
+        return ['is not a mapping']
+
+    errors = []
+    if len([key for key in NAME_KEYS if item.get(key)]) != 1:
+        errors.append('needs one of pkg or app')
+    unknown = set(item) - set(PROJECT_KEYS)
+    if unknown:
+        errors.append('has unknown keys %s' % ', '.join(sorted(unknown)))
+
+    for key in NAME_KEYS:
+        if key in item and not isinstance(item[key], str):
+            errors.append('%s must be a name' % key)
+    for key in LIST_KEYS:
+        if key in item and (not isinstance(item[key], list) or not all(
+                isinstance(name, str) and name for name in item[key])):
+            errors.append('%s must be a list of module names' % key)
+    if 'excludegit' in item and not isinstance(item['excludegit'], bool):
+        errors.append('excludegit must be true or false')
+    return errors
+
+
+def load(fname):
+    r"""Read manifest *fname* and return a tuple of the output directory and
+    the list of project dictionaries, with defaults applied. Raises
+    RuntimeError listing every invalid project."""
+
+    with open(fname) as fin:
+        manifest = parse(fin.read(), fname)
+
+    if not isinstance(manifest, dict) or \
+            not isinstance(manifest.get('projects'), list):
+        raise RuntimeError('%s has no list of projects' % fname)
+
+    errors = []
+    if not isinstance(manifest.get('directory', '.'), str):
+        errors.append('%s: directory must be a path' % fname)
+    if not isinstance(manifest.get('excludegit', False), bool):
+        errors.append('%s: excludegit must be true or false' % fname)
+
+    projects = []
+    for num, item in enumerate(manifest['projects'], 1):
+        problems = check_project(item)
+        errors.extend('%s: project %d %s' % (fname, num, problem)
+                      for problem in problems)
+        if problems:
+            continue
+
+        project = {'excludegit': manifest.get('excludegit', False),
+                   'sources': [], 'extensions': []}
+        project.update(item)
+        projects.append(project)
+
+    if errors:
+        raise RuntimeError('\n'.join(errors))
+
+    outdir = os.path.join(os.path.dirname(os.path.abspath(fname)),
+                          manifest.get('directory', '.'))
+    return outdir, projects
+
+
+def project_args(project):
+    r"""Return the pyjig command lines (without sources) for *project*: one
+    to create it and one to add modules to it."""
+
+    common = ['-q'] + (['-x'] if project['excludegit'] else [])
+    if project.get('pkg'):
+        create = common + ['--pkg', project['pkg']]
+    else:
+        create = common + ['--app', project['app']]
+    return create, common
+
+
+def build(project, outdir):
+    r"""Create *project* in *outdir*, then add its sources and extensions.
+    Returns the project's root directory."""
+
+    parser = pyjig.init_parser()
+    create, common = project_args(project)
+
+    proj = pyjig.Pyjig(parser.parse_args(create), cwd=outdir)
+    proj.create_project(no_input=True)
+    pdir = proj.pdir
+
+    if project['sources']:
+        proj = pyjig.Pyjig(parser.parse_args(common + project['sources']),
+                           cwd=pdir)
+        proj.add_project_sourcefile(no_input=True)
+    if project['extensions']:
+        proj = pyjig.Pyjig(parser.parse_args(
+            common + ['--ext'] + project['extensions']), cwd=pdir)
+        proj.add_project_extension(no_input=True)
+
+    return pdir
+
+
+def timed(project, outdir):
+    r"""Run :py:func:`build` for *project*, returning a tuple of its name,
+    the seconds taken and the error message (``None`` on success)."""
+
+    name = project.get('pkg') or project.get('app')
+    start = time.time()
+    try:
+        build(project, outdir)
+        error = None
+    except (RuntimeError, OSError, subprocess.CalledProcessError) as exc:
+        error = str(exc)
+    return name, time.time() - start, error
+
+
+def build_all(outdir, projects, jobs=4):
+    r"""Create *projects* (see :py:func:`load`) in *outdir* using *jobs*
+    threads. Returns the list of :py:func:`timed` results, in order."""
+
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    if not projects:
+        return []
+
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    with concurrent.futures.ThreadPoolExecutor(max(1, jobs)) as pool:
+        return list(pool.map(lambda proj: timed(proj, outdir), projects))
+
+
+def apply_manifest(fname, jobs=4):
+    r"""Create every project in manifest *fname* using *jobs* threads, see
+    :py:func:`build_all`."""
+
+    outdir, projects = load(fname)
+    return build_all(outdir, projects, jobs)
+
+
+def apply(argv=None):
+    r"""``pyjig apply``: create every project described in a manifest and
+    report the time taken by each. Returns -1 if any project failed."""
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig apply',
+        description='Create the projects described in a YAML or JSON '
+                    'manifest.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=4, metavar='N',
+        help='Build N projects at a time (default 4).')
+    parser.add_argument(
+        '--offline',
+        action='store_true', default=False,
+        help='Use cached templates only, never access the network.')
+    parser.add_argument(
+        '--remote',
+        action='store_true', default=False,
+        help='Use the template repos (gh:...) rather than the templates '
+             'embedded in pyjig.')
+    parser.add_argument(
+        'manifest',
+        help='Manifest describing the projects to create.')
+    args = parser.parse_args(argv)
+
+    if args.jobs < 1:
+        LOG.error('--jobs must be at least 1')
+        return -1
+
+    if pyjig.CACHE is None:
+        pyjig.CACHE = TemplateCache(offline=args.offline, remote=args.remote)
+
+    start = time.time()
+    try:
+        outdir, projects = load(args.manifest)
+        validate(required(create=True, git=not all(
+            proj['excludegit'] for proj in projects)))
+        results = build_all(outdir, projects, args.jobs)
+    except (RuntimeError, IOError, OSError) as exc:
+        LOG.error(exc)
+        return -1
+
+    for name, elapsed, error in results:
+        LOG.info('%-30s %8.2fs  %s', name, elapsed,
+                 'FAILED: %s' % error if error else 'ok')
+
+    failed = len([result for result in results if result[2]])
+    LOG.info('>>> %d projects, %d failed, in %.2fs', len(results), failed,
+             time.time() - start)
+
+    return -1 if failed else 0
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`metadata` - Project metadata
+#####################################
+
+.. module:: pyjig.metadata
+   :synopsis: Typed, cached access to a project's id.txt
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Every pyjig project carries an ``id.txt`` in its root folder, holding the
+cookiecutter settings the project was created with. This module loads it into
+a :py:class:`ProjectMeta` record once per process; later loads are served
+from memory for as long as the file's size and modification time are
+unchanged.
+
+Projects created by older templates store ``id.txt`` as a Python literal,
+which can only be parsed with :py:func:`ast.literal_eval`. Pyjig now stores
+it as JSON, which is both faster to read and (for plain string and number
+settings) still a valid Python literal, so older pyjig releases keep working.
+Both formats are read transparently and :py:func:`migrate` rewrites a legacy
+file as JSON, which ``pyjig upgrade`` does.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import ast
+import collections
+import json
+import logging
+import os
+import tempfile
+import threading
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+IDFILE = 'id.txt'
+
+ProjectMeta = collections.namedtuple(
+    'ProjectMeta',
+    'root project_type project_name project_slug context format')
+ProjectMeta.__doc__ = r"""Project metadata loaded from ``id.txt`` in *root*.
+*context* is the full dictionary of settings and *format* is either ``json``
+or ``literal``."""
+
+# Loaded metadata keyed by id.txt path
+
+LOADED = {}
+LOCK = threading.Lock()
+
+
+def find_root(start=None):
+    r"""Find the project's root folder by scanning up from directory *start*
+    (default the current working directory) for the ``id.txt`` file. Returns
+    the directory of the project's root, or None if not match was found.
+    Roots are not remembered: a project created under a directory already
+    searched from (by a long running ``pyjig serve``) must be found, and the
+    scan costs one ``stat()`` per directory level."""
+
+    curdir = os.path.abspath(start or os.getcwd())
+    while not os.path.isfile(os.path.join(curdir, IDFILE)):
+        parent = os.path.dirname(curdir)
+
+        # Reached top of filesystem?
+
+        if curdir == parent:
+            return None
+        curdir = parent
+
+    return curdir
+
+
+def parse(text):
+    r"""Parse the contents of an ``id.txt``. Returns a tuple of the settings
+    dictionary and its format (``json`` or ``literal``)."""
+
+    try:
+        context, fmt = json.loads(text), 'json'
+    except ValueError:
+        try:
+            context, fmt = ast.literal_eval(text), 'literal'
+        except (SyntaxError, ValueError):
+            raise RuntimeError('unable to parse %s' % IDFILE)
+
+    if not isinstance(context, dict):
+        raise RuntimeError('%s is not a dictionary' % IDFILE)
+    return context, fmt
+
+
+def load(root):
+    r"""Return the :py:class:`ProjectMeta` of the project in *root*."""
+
+    idfn = os.path.join(root, IDFILE)
+    stat = os.stat(idfn)
+    stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    with LOCK:
+        cached = LOADED.get(idfn)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with open(idfn) as fin:
+        context, fmt = parse(fin.read())
+
+    try:
+        meta = ProjectMeta(os.path.abspath(root), context['project_type'],
+                           context['project_name'], context['project_slug'],
+                           context, fmt)
+    except KeyError as exc:
+        raise RuntimeError('%s is missing %s' % (idfn, exc))
+
+    with LOCK:
+        LOADED[idfn] = (stamp, meta)
+    return meta
+
+
+def save(root, context):
+    r"""Write *context* as the JSON ``id.txt`` of the project in *root*."""
+
+    idfn = os.path.join(root, IDFILE)
+    try:
+        mode = os.stat(idfn).st_mode & 0o7777
+    except OSError:
+        mode = 0o644
+
+    fdesc, tmpfn = tempfile.mkstemp(dir=root)
+    try:
+        os.chmod(tmpfn, mode)
+        with os.fdopen(fdesc, 'w') as fout:
+            json.dump(context, fout, indent=1, sort_keys=True)
+            fout.write('\n')
+        os.rename(tmpfn, idfn)
+    except BaseException:
+        os.unlink(tmpfn)
+        raise
+
+
+def migrate(root):
+    r"""Rewrite a legacy Python-literal ``id.txt`` in *root* as JSON. Files
+    holding values JSON would spell differently from Python (``true``,
+    ``null``) are left alone so older pyjig releases can still read them.
+    Returns ``True`` if the file was rewritten."""
+
+    meta = load(root)
+    if meta.format != 'literal':
+        return False
+
+    values = list(meta.context.values())
+    if not all(isinstance(val, (str, int)) and not isinstance(val, bool)
+               for val in values):
+        return False
+
+    save(root, meta.context)
+    LOG.info('>>> Migrated %s to JSON', os.path.join(root, IDFILE))
+    return True
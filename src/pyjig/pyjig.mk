@@ -0,0 +1,73 @@
+# ----------------------------------------------------------------------------
+# pyjig.mk - recipes provided by pyjig, included from the project Makefile.
+# Pyjig rewrites this file on ``pyjig upgrade``; do not edit it.
+# ----------------------------------------------------------------------------
+PYJIG ?= pyjig
+
+# Pylint processes for batched analysis, 0 is one per CPU
+LINT_JOBS ?= 0
+
+# Set LINT_BATCH=no to analyze each file with its own pylint and flake8
+LINT_BATCH ?= yes
+
+LINT_SOURCE = $(wildcard src/*.py) $(wildcard tests/*.py)
+LINT_CONFIG = $(wildcard pylint.rc setup.cfg)
+
+# Named *.pylint so ``make clean`` removes it
+LINT_STAMP = .comp.pylint
+
+# Test worker processes for ``make ptests``, 0 is one per CPU
+TEST_JOBS ?= 0
+
+# Sphinx processes for ``make pdocs``, 0 is one per CPU
+DOCS_JOBS ?= 0
+
+# Extensions compiled at once by setup.py builds, 0 is one per CPU, see
+# pyjig_build.py
+BUILD_JOBS ?= 0
+export PYJIG_BUILD_JOBS = $(BUILD_JOBS)
+
+.PHONY: lint pbuild pdocs ptests
+
+# Extension modules built in place, in parallel and through ccache
+pbuild:
+	@$(PYTHON) setup.py build_ext --inplace
+
+# Static analysis of the files changed since they were last analyzed
+lint:
+	@$(PYJIG) lint
+
+# Tests in parallel, skipping modules unchanged since they last passed
+ptests: comp
+	@$(PYJIG) test --python $(PYTHON) --jobs $(TEST_JOBS)
+
+# Documentation rebuilt in parallel, for the documents changes affect only
+pdocs:
+	@$(PYJIG) docs --jobs $(DOCS_JOBS)
+	@$(PYTHON) setup.py --long-description > README.rst
+
+# ----------------------------------------------------------------------------
+# Batched static analysis for ``make comp``: the files changed since the last
+# clean pass (all of them if the configuration changed) are analyzed by one
+# pylint and one flake8 run, then every *.pylint target is touched. A single
+# stamp file does the work, so ``make -j`` runs it exactly once.
+# ----------------------------------------------------------------------------
+ifneq ($(LINT_BATCH),no)
+
+# Cancel the per-file rule of the project Makefile
+%.pylint: %.py
+
+%.pylint: %.py $(LINT_STAMP)
+	@touch $@
+
+$(LINT_STAMP): $(LINT_SOURCE) $(LINT_CONFIG)
+	@stale="$(filter %.py,$?)"; \
+	if [ -n "$(filter-out %.py,$?)" ]; then stale="$(LINT_SOURCE)"; fi; \
+	if [ -n "$$stale" ]; then \
+		echo Check $$stale; \
+		$(PYLINT) -rn --rcfile pylint.rc --jobs $(LINT_JOBS) $$stale && \
+		$(FLAKE) $$stale; \
+	fi
+	@touch $@
+
+endif
@@ -72,6 +72,8 @@ Each new project will create the following directories and files::
    |   .gitignore
    |   id.txt
    |   Makefile
+   |   pyjig.json       <-- Generated files, for pyjig upgrade
+   |   pyjig.mk         <-- Recipes provided by pyjig
    |   pylint.rc
    |   setup.cfg
    |   setup.py
@@ -94,7 +96,8 @@ Each new project will create the following directories and files::
 Each project root folder includes a copy of ``id.txt``. This file is a copy of
 the cookiecutter settings that were in effect when the project was created. It
 acts as sentinel for project root identification and should not be removed or
-renamed.
+renamed. Older projects store ``id.txt`` as a python literal; ``pyjig upgrade``
+rewrites it as JSON (which older pyjig releases can still read).
 
 
 Makefile generation
@@ -132,6 +135,27 @@ root directory. It's syntax is written to support `GNU Make
 | help        | Display Makefile help                                                 |
 +-------------+-----------------------------------------------------------------------+
 
+Pyjig adds its own recipes in ``pyjig.mk``, included from the end of the
+``Makefile`` and kept up to date by ``pyjig upgrade``:
+
++-------------+-----------------------------------------------------------------------+
+| Recipe      | Description                                                           |
++=============+=======================================================================+
+| lint        | Static analysis of changed files only, see ``pyjig lint``             |
++-------------+-----------------------------------------------------------------------+
+| pdocs       | Rebuild documentation affected by changes in parallel, ``pyjig docs`` |
++-------------+-----------------------------------------------------------------------+
+| ptests      | Run tests in parallel, skipping unchanged modules, see ``pyjig test`` |
++-------------+-----------------------------------------------------------------------+
+| pbuild      | Build extension modules in place, in parallel and through ccache      |
++-------------+-----------------------------------------------------------------------+
+
+``pyjig.mk`` also makes ``make comp`` analyze every stale file in one pylint
+run (``LINT_JOBS`` processes, default one per CPU) and one flake8 run, rather
+than starting both tools for each file. The batch is driven by a single stamp
+file, so it runs once under ``make -j``. Set ``LINT_BATCH=no`` for the
+original per-file recipe.
+
 Static Analysis
 ===============
 
@@ -190,12 +214,17 @@ Pyjig will initialize a git repository for each new project it creates using
 your local sytem defaults (see `git config ...
 <http://git-scm.com/book/en/v2/Customizing-Git-Git-Configuration>`_.). And each
 time you use Pyjig to add to an existing project, pyjig will add the source to
-the repo.
+the repo. Only the files pyjig writes are staged; other changes in your work
+tree are left alone.
 
 Pyjig will not create the repo if invoked with ``--excludegit`` or if the
 dirctory is a subdirectory of an existing git repository. It detects
-repository membership by invoking `git status
-<http://git-scm.com/docs/git-status>`_.
+repository membership by looking for a ``.git`` folder in the project's parent
+directories. The initial check in is streamed straight from the generated
+files through `git fast-import <http://git-scm.com/docs/git-fast-import>`_;
+projects with ``.gitignore`` rules it cannot evaluate (negated or ``**``
+patterns), line ending conversion or commit signing enabled are committed
+with ``git add`` and ``git commit`` as before.
 
 ***********
 Pyjig Usage
@@ -219,7 +248,7 @@ Pyjig can also be installed with pip::
 Command line options
 ====================
 
-*usage:* ``pyjig  [-?] [-d] [--pkg PKG] [--app APP] [--ext EXT [EXT ...]] [-x] [source [source ..]]``
+*usage:* ``pyjig  [-?] [-d] [--pkg PKG] [--app APP] [--ext EXT [EXT ...]] [-x] [-j N] [--offline] [--refresh] [--remote] [--pin NAME=REV] [--timings] [--timings-file FILE] [--trace FILE] [--plan] [--plan-file FILE] [source [source ..]]``
 
 Positional arguments
 --------------------
@@ -245,6 +274,131 @@ Optional argument:
 
 -x, --exludegit       Do not initialize git repo and do not add new source to git repo.
 
+-j N, --jobs N        Render source and extension modules using N worker processes. Output
+                      is identical to a serial run and existing files are never overwritten.
+                      Modules whose files already exist are skipped before any template is
+                      loaded, so re-running a command is close to free.
+
+--offline             Use cached templates only, never access the network.
+
+--refresh             Check cached templates for updates now, rather than waiting for the
+                      hourly freshness check.
+
+--remote              Render from the template repos (``gh:jamercee/cookiecutter-*``)
+                      rather than the templates embedded in pyjig.
+
+--pin NAME=REV        Pin template NAME (``pyapp``, ``pypkg``, ``pysource`` or ``pyext``) to
+                      revision REV (commit, tag or branch). May be repeated.
+
+--timings             Report the wall time, CPU time and subprocesses of each phase of
+                      the run (template checkout and parsing, prompting, rendering,
+                      git, toolchain checks) as a table.
+
+--timings-file FILE   As ``--timings``, writing the report as JSON to FILE.
+
+--trace FILE          Write nested trace spans of the run (clones, prompting, rendering of
+                      each file, writes, git commands) to FILE in Chrome trace-event JSON,
+                      for ``chrome://tracing``, Perfetto or merging into other traces.
+
+--plan                List every file the run would create, skip (the module already exists)
+                      or leave conflicting (a file of a new module already exists and will
+                      not be written) under ``src/``, ``docs/`` and ``tests/``, and the
+                      ``setup.py`` and ``pyjig_build.py`` it would modify or create to
+                      build new extensions, without rendering or writing anything.
+
+--plan-file FILE      As ``--plan``, writing the list as JSON to FILE.
+
+
+Commands
+--------
+
+A few maintenance tasks are run as ``pyjig COMMAND``. Because command names
+take the place of a source file, add a source module sharing a command's name
+with its extension (``pyjig doctor.py``).
+
+apply MANIFEST
+
+   Create every project described in a YAML (or JSON) manifest in one process,
+   sharing the loaded templates and building several projects at a time
+   (``--jobs``). A summary reports how long each project took and why any
+   failed. For example::
+
+      directory: fixtures
+      projects:
+        - pkg: models
+          sources: [orders, customers]
+        - app: loader
+          sources: [main]
+          extensions: [speedups]
+          excludegit: true
+
+bundle [NAME ...]
+
+   Build single file bundles of the templates (default all four) from the
+   template cache into ``--output`` (default ``$PYJIG_BUNDLES``), see
+   `Template bundles`_. ``--verify FILE ...`` checks existing bundles.
+
+docs
+
+   Build the project's documentation with ``sphinx-build``, reading and
+   writing in parallel (``--jobs``, default one per CPU). The Sphinx
+   environment is kept in ``~/.pyjig/docs`` rather than ``docs/_build``, so
+   it survives ``make clean`` and only documents whose ``*.rst`` or
+   documented module changed are read again. When the output exists and no
+   document is affected by the changes, Sphinx is not run at all.
+   ``--fresh`` re-reads everything. ``make pdocs`` runs ``pyjig docs``.
+
+doctor
+
+   Report the location and version of every tool used by pyjig projects.
+   Pyjig itself only checks for the tools an operation needs, and caches where
+   they were found in ``~/.pyjig/toolchain.json``.
+
+lint [FILE ...]
+
+   Run pylint and flake8 on the project's ``src/*.py`` and ``tests/*.py`` (or
+   the files named), re-analyzing only files whose results are not in the
+   cache (``~/.pyjig/lint``). Results are keyed on file content, tool version
+   and the project's configuration (``pylint.rc``, ``setup.cfg``), so branch
+   switches and fresh checkouts are cheap. Files not cached are analyzed in
+   one pylint run (``--jobs``) and one flake8 run, side by side, and the
+   messages of every file are reported as the tools wrote them; pylint's
+   overall score is left out. ``--no-cache`` re-analyzes everything.
+
+serve
+
+   Run a resident pyjig server on a Unix socket (``--socket``, default
+   ``$PYJIG_SOCKET`` or ``~/.pyjig/pyjig.sock``) that keeps templates,
+   project metadata and toolchain checks loaded between requests. With
+   ``PYJIG_SOCKET`` set, ``pyjig --quiet ...`` is forwarded to the server and
+   completes in milliseconds, using the caller's ``PATH``, ``HOME`` and git
+   identity; it runs locally if no server answers. Template options
+   (``--offline``, ``--refresh``, ``--remote``, ``--pin``) are given to
+   ``pyjig serve`` itself, and runs with ``--debug``, ``--timings`` or
+   ``--trace`` are never forwarded. Stop the server with
+   ``pyjig serve --stop``.
+
+test [MODULE ...]
+
+   Run the project's ``tests/test_*.py`` modules (or those named) in parallel
+   worker processes (``--jobs``, default one per CPU) using ``--python``. The
+   modules are split so each worker gets about the same amount of work, going
+   by how long each module took last time. A module that passed is skipped
+   until it, a project module it imports (directly or not), ``setup.py`` or
+   the Python version changes; results are cached in ``~/.pyjig/test``.
+   ``--no-cache`` runs everything. ``make ptests`` runs ``pyjig test``
+   after ``make comp``; ``make tests`` still runs ``setup.py test``.
+
+upgrade
+
+   Bring the project containing the current directory up to date with the
+   latest (or ``--rev``) revision of its template. Pyjig records the template
+   revision, answers and a hash of every generated file in ``pyjig.json``
+   when it creates a project; only files whose template changed since are
+   re-rendered. Unmodified files are replaced, modified ones are three-way
+   merged (conflicts are marked in the file) and files the template did not
+   change are never touched. Use ``--dry-run`` to see what would change, and
+   ``--base REV`` for projects created before ``pyjig.json`` existed.
 
 Example Usage
 =============
@@ -316,30 +470,32 @@ extensions. To create a new C++ Extension you would typically do::
    $ pyjig --quiet --ext e1
 
    $ git status --short
+   M  setup.py
    A  docs/e1.rst
+   A  pyjig_build.py
    A  src/e1_module.cpp
    A  tests/teste1.py
 
-Pyjig will not add the new module to the ``setup.py`` file. This is an
-important step that needs to be done by the developer to cause the
-module to be rebuilt. The instructions for how todo this are included as a
-comment at the top of the newly created module file::
-
-   $ head -n 15 src/e1_module.cpp
-   /*
-   This module needs to be manually added to your setup.py. Consider
-   adding the following lines:
-
-       from setuptools import Extension
-
-       module = Extension('mymod.e1',
-                   sources = ['src/e1_module.cpp'],
-                   )
-
-       setup(...
-           ext_modules = [ module ],
-           )
-   */
+Pyjig adds the new module to the ``ext_modules`` of ``setup.py``, and makes
+``pyjig_build.py`` the project's ``build_ext`` command (the comment the
+template puts at the top of the module file, asking for this to be done by
+hand, can be removed)::
+
+   setup(
+       cmdclass = {'build_ext': BuildExt},
+       ext_modules = [
+           Extension('mymod.e1', sources = ['src/e1_module.cpp']),
+           ],
+       ...
+
+Extensions are then compiled in parallel, one per CPU (``BUILD_JOBS=N`` for
+``make``, ``$PYJIG_BUILD_JOBS`` otherwise), and only when their sources
+changed. Compilers run through ``ccache`` when it is installed, so a clean
+build recompiles nothing compiled before (``PYJIG_CCACHE=no`` turns it off).
+``make pbuild`` builds the extensions in place. A ``setup.py`` without a
+``setup(`` line of its own, or whose ``ext_modules`` is not a list opened on
+a line of its own (``ext_modules = [``), is left alone, and pyjig says what
+to add.
 
 Defining New Types with C++ Extension
 -------------------------------------
@@ -379,9 +535,66 @@ In the example above, the fifth question allows the developer to give their new
 type a name. Any non-default answer will cause additional code to be included
 in the project to create new custom types.
 
-.. note::
-   Remember to add the new module to ``setup.py``
 
+Template cache
+--------------
+
+Pyjig ships with its templates embedded (see `Template bundles`_): by default
+projects and modules are rendered from them, with no network access and no
+git clone, at the template revisions pyjig was built with. Pinning a
+template to another revision (``--pin``), or ``--remote``, renders from the
+template repos instead.
+
+Template repos are cloned once into a local cache (``~/.pyjig/templates``, or
+``$PYJIG_CACHE``) and re-used for every project and source file. The cache
+checks for template updates at most once an hour. To build against a known
+template revision, pin it; a pinned commit is used straight from the cache
+without touching the network::
+
+   $ pyjig --quiet --pin pysource=3f2a9c1 s1 s2 s3
+
+Build machines without network access can use ``--offline`` once the cache
+has been populated::
+
+   $ pyjig --quiet --offline --pkg mypkg
+
+Template bundles
+----------------
+
+``pyjig bundle`` packs each template, at its latest (or ``--pin``\ ned)
+revision, into a single file bundle (``pyapp.pjt``, ``pypkg.pjt``,
+``pysource.pjt``, ``pyext.pjt``) holding the template files, the
+``cookiecutter.json`` variables and a hash of every file, without the git
+history. Pyjig renders projects and modules straight from the bundles,
+read through ``mmap`` and checked against their hashes, and never runs git
+for those templates unless another revision is pinned.
+
+``setup.py sdist`` embeds bundles of the latest templates in the pyjig
+source distribution (``PYJIG_PIN="NAME=REV ..."`` picks other revisions,
+``PYJIG_EMBED=no`` leaves them out), and packages built from it install
+them, with no network access or git needed to build. Packages built straight
+from a checkout embed the bundles found in ``src/pyjig/templates``, see
+``pyjig bundle -o``. Bundles in ``$PYJIG_BUNDLES`` take
+precedence over the embedded ones, for example to follow newer templates
+without upgrading pyjig::
+
+   $ pyjig bundle -o ~/.pyjig/bundles
+   $ export PYJIG_BUNDLES=~/.pyjig/bundles
+   $ pyjig --quiet --pkg mypkg
+
+``pyjig bundle --verify FILE ...`` checks bundles against their hashes.
+
+Static files
+------------
+
+Template files without Jinja markup (``pylint.rc``, ``.gitignore``,
+``docs/Makefile``, ``docs/make.bat``) are the same in every project. Pyjig
+keeps one copy of each in a content-addressed store (``~/.pyjig/store``, or
+``$PYJIG_STORE``) and materializes it in new projects by reflink or
+``copy_file_range()`` where the filesystem allows, writing it otherwise. Each
+project still gets a file of its own. ``PYJIG_STORE_HARDLINK=yes`` hard links
+them instead (read-only, shared by every project: for throwaway projects
+only), ``PYJIG_STORE=none`` writes every file directly.
 
 Override cookiecutter defaults
 ------------------------------
@@ -409,19 +622,24 @@ settings to your ``.cookiecutterrc`` file to create overrides::
 # Standard library imports
 # ----------------------------------------------------------------------------
 import argparse
-import ast
 import datetime
+import errno
+import importlib
+import json
 import logging
 import os
-import shutil
+import re
 import subprocess
 import sys
-import tempfile
 
 # ----------------------------------------------------------------------------
-# 3rd party imports
+# Pyjig imports
 # ----------------------------------------------------------------------------
-from cookiecutter.main import cookiecutter
+from pyjig import git
+from pyjig import metadata, timings, trace
+from pyjig.cache import TemplateCache, parse_pins
+from pyjig.toolchain import required, validate
+from pyjig.toolchain import inpath  # pylint: disable=unused-import
 
 # ----------------------------------------------------------------------------
 # Module level initializations
@@ -433,10 +651,46 @@ __copyright__ = 'Copyright(c) 2015, Carroll-Net, Inc, All Rights Reserved.'
 
 LOG = logging.getLogger('pyjig')
 
-# Convenience handle to open instance of null device, used to
-# discard stdout
+# Template cache shared by every generation in this process, see
+# :py:func:`template_dir`
+
+CACHE = None
+
+# Makefile fragment pyjig installs in new projects
+
+MAKE_FRAGMENT = 'pyjig.mk'
+
+# Extension build command pyjig installs in projects with extension modules
+# (see register_extensions), and the imports wiring it into ``setup.py``,
+# falling back to the setuptools command where it is missing
 
-DNULL = open(os.devnull, 'wb')
+BUILD_FRAGMENT = 'pyjig_build.py'
+BUILD_IMPORTS = (
+    'try:',
+    '    from pyjig_build import BuildExt',
+    'except ImportError:',
+    '    from setuptools.command.build_ext import build_ext as BuildExt',
+    )
+
+# File names (``%s`` standing for the module name) a source or extension
+# module is installed as, the first one its template generates
+
+SOURCE_FILES = ('%s.py',)
+EXTENSION_FILES = ('%s_module.cpp', '%s.c')
+
+# Sub-commands, run as ``pyjig COMMAND [options]``. Each maps to the
+# ``module:function`` implementing it, imported only when the command is used.
+
+COMMANDS = {
+    'apply': 'pyjig.manifest:apply',
+    'bundle': 'pyjig.bundle:bundle',
+    'docs': 'pyjig.docs:docs',
+    'doctor': 'pyjig.toolchain:doctor',
+    'lint': 'pyjig.lint:lint',
+    'serve': 'pyjig.server:serve',
+    'test': 'pyjig.testrun:test',
+    'upgrade': 'pyjig.upgrade:upgrade',
+    }
 
 
 # pylint: disable=too-many-branches
@@ -449,7 +703,9 @@ def init_parser():
 
     parser = argparse.ArgumentParser(
         add_help=False,
-        description='Template driven new project creation.')
+        description='Template driven new project creation.',
+        epilog='commands: %s (see pyjig COMMAND --help)' %
+        ', '.join(sorted(COMMANDS)))
 
     parser.add_argument(
         '-?', '-h', '--help', dest='help',
@@ -479,6 +735,48 @@ def init_parser():
         '-q', '--quiet',
         action='store_true', default=False,
         help='Quiet, do not prompt, accept defaults.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=1, metavar='N',
+        help='Generate source/extension modules with N worker processes.')
+    parser.add_argument(
+        '--offline',
+        action='store_true', default=False,
+        help='Use cached templates only, never access the network.')
+    parser.add_argument(
+        '--refresh',
+        action='store_true', default=False,
+        help='Check cached templates for updates now.')
+    parser.add_argument(
+        '--remote',
+        action='store_true', default=False,
+        help='Use the template repos (gh:...) rather than the templates '
+             'embedded in pyjig.')
+    parser.add_argument(
+        '--pin',
+        action='append', metavar='NAME=REV',
+        help='Pin template NAME (pyapp, pypkg, pysource, pyext) to REV')
+    parser.add_argument(
+        '--timings',
+        action='store_true', default=False,
+        help='Report the time taken by each phase.')
+    parser.add_argument(
+        '--timings-file',
+        metavar='FILE',
+        help='Report the time taken by each phase as JSON written to FILE.')
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help='Write a Chrome trace-event JSON trace of the run to FILE.')
+    parser.add_argument(
+        '--plan',
+        action='store_true', default=False,
+        help='List the files that would be created, modified, skipped or '
+             'conflict, without writing anything.')
+    parser.add_argument(
+        '--plan-file',
+        metavar='FILE',
+        help='As --plan, listing the files as JSON written to FILE.')
     parser.add_argument(
         'source',
         nargs='*',
@@ -487,66 +785,496 @@ def init_parser():
     return parser
 
 
-def inpath(exe):
-    r"""Search path for executable *exe* and return fully qualified pathname of
-    first matching executable or None of no match was found."""
+def template_dir(name, rev=None):
+    r"""Return the local directory of template *name* (one of ``pyapp``,
+    ``pypkg``, ``pysource`` or ``pyext``) at revision *rev* (default pinned
+    or latest) from the shared template cache."""
 
-    sep = ':'
+    global CACHE  # pylint: disable=global-statement
 
-    if os.name == 'nt':
-        exe = exe + '.exe' if not exe.endswith('.exe') else exe
-        sep = ';'
+    if CACHE is None:
+        CACHE = TemplateCache()
+    with timings.phase('checkout'):
+        return CACHE.checkout(name, rev)
 
-    for pth in os.environ['PATH'].split(sep):
-        fname = os.path.join(pth, exe)
-        if os.path.isfile(fname):
-            return fname
 
-    return None
+@timings.timed('load_template')
+def load_template(name, rev=None):
+    r"""Return template *name* (see :py:func:`template_dir`) loaded by
+    :py:mod:`pyjig.engine`. The engine, and with it cookiecutter and Jinja, is
+    imported on first use so that ``pyjig --help`` and argument errors never
+    pay for it."""
+
+    with timings.phase('import'):
+        from pyjig import engine  # pylint: disable=import-outside-toplevel
+
+    path = template_dir(name, rev)
+    with timings.phase('parse'):
+        return engine.load(path)
+
+
+@timings.timed('git_init')
+def git_init(sdir, files=None):
+    r"""Initialize git repository in directory *sdir* and commit *files* (the
+    files generated, default everything in *sdir*) as the initial check in.
+    The commit is normally streamed through :py:func:`pyjig.git.initial_commit`;
+    trees it cannot handle are committed with ``git add`` and ``git commit``."""
+
+    if git.find_git_dir(sdir):
+        LOG.info('>>> Git already initialized, step skipped.')
+        return
+
+    if git.initial_commit(sdir, files):
+        return
+
+    run = subprocess.check_call
+    run(['git', 'add', '.'], cwd=sdir, stdout=subprocess.DEVNULL)
+    run(['git', 'commit', '-m', 'Initial check in.'], cwd=sdir, stdout=subprocess.DEVNULL)
+
+
+def install_fragment(pdir):
+    r"""Install :data:`MAKE_FRAGMENT`, the Makefile recipes pyjig provides,
+    in project *pdir* and include it from the project's ``Makefile``.
+    Returns the list of files written."""
+
+    fname = os.path.join(pdir, MAKE_FRAGMENT)
+    makefile = os.path.join(pdir, 'Makefile')
+    if not os.path.isfile(makefile):
+        return []
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           MAKE_FRAGMENT), 'rb') as fin:
+        written = [fname] if write_changed(fname, fin.read()) else []
+
+    include = '-include %s' % MAKE_FRAGMENT
+    with open(makefile) as fin:
+        text = fin.read()
+    if include not in text.splitlines():
+        with open(makefile, 'a') as fout:
+            fout.write('%s\n# Recipes provided by pyjig (make lint, ...)\n%s\n' %
+                       ('' if text.endswith('\n') else '\n', include))
+        written.append(makefile)
+
+    return written
+
+
+def install_build(pdir, create=True):
+    r"""Install :data:`BUILD_FRAGMENT`, the parallel ``build_ext`` command
+    pyjig provides (see :py:mod:`pyjig.pyjig_build`), in project *pdir*.
+    Unless *create* it is only brought up to date where it exists. Returns
+    the list of files written."""
+
+    fname = os.path.join(pdir, BUILD_FRAGMENT)
+    if not create and not os.path.isfile(fname):
+        return []
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           BUILD_FRAGMENT), 'rb') as fin:
+        return [fname] if write_changed(fname, fin.read()) else []
+
+
+def extension_sources(modules, tgtdir, paths):
+    r"""Return the extension *modules* added to the project's ``src``
+    directory *tgtdir* whose files are among *paths*, as a list of ``(module,
+    source)`` tuples for :py:func:`register_extensions`. Module names are
+    taken as for :py:func:`plan_modules`, each one listed once."""
+
+    sources = []
+    seen = set()
+    for module in modules:
+        module = os.path.splitext(module)[0]
+        if module in seen:
+            continue
+        seen.add(module)
+        for pattern in EXTENSION_FILES:
+            if os.path.join(tgtdir, pattern % module) in paths:
+                sources.append((module, 'src/' + pattern % module))
+    return sources
+
+
+def extend_setup(text, package, modules):
+    r"""Return the ``(text, wired)`` of ``setup.py`` *text* with extension
+    *modules* added, see :py:func:`register_extensions`. *wired* is
+    ``False`` if :data:`BUILD_FRAGMENT` could not be made its ``build_ext``
+    command. *text* is returned unchanged if it already names every module,
+    and ``None`` if its ``ext_modules`` cannot be extended."""
+
+    modules = [(module, src) for module, src in modules
+               if not any(quote % name in text for quote in ("'%s'", '"%s"')
+                          for name in (src, '%s.%s' % (package, module)))]
+    if not modules:
+        return text, True
+
+    lines = text.splitlines()
+
+    def match(pattern, start=0):
+        r"""Return the index of the first line from *start* matching
+        *pattern*, or ``None``."""
+        for idx in range(start, len(lines)):
+            if re.match(pattern, lines[idx]):
+                return idx
+        return None
+
+    # Extensions go at the start of an existing ext_modules list, or a new
+    # one at the start of the setup() arguments
+
+    call = match(r'setup\(\s*$')
+    keyword = found = None
+    if call is not None:
+        keyword = match(r'.*\bext_modules\s*=', call)
+        found = match(r'\s*ext_modules\s*=\s*\[\s*$', call)
+    if call is None or keyword != found:
+        return None, False
+    indent = re.match(r'\s*', lines[call + 1] if call + 1 < len(lines)
+                      else '').group() or '    '
+
+    entries = ["Extension('%s.%s', sources = ['%s'])," % (package, module, src)
+               for module, src in modules]
+    if found is None:
+        lines[call + 1:call + 1] = [indent + 'ext_modules = ['] + \
+            [indent * 2 + entry for entry in entries] + [indent * 2 + '],']
+    else:
+        ext_indent = re.match(r'\s*', lines[found]).group()
+        lines[found + 1:found + 1] = [ext_indent + indent + entry
+                                      for entry in entries]
+
+    # BuildExt joins a cmdclass dictionary opened on the keyword's line,
+    # unless it already names a build_ext command
+
+    imports = []
+    if match(r'from setuptools import .*\bExtension\b') is None:
+        imports.append('from setuptools import Extension')
+    wired = 'BuildExt' in text
+    cmdclass = match(r'\s*cmdclass\s*=', call)
+    if not wired and cmdclass is None:
+        lines.insert(call + 1, indent + "cmdclass = {'build_ext': BuildExt},")
+        wired = True
+    elif not wired and 'build_ext' not in text:
+        head = re.match(r'\s*cmdclass\s*=\s*\{', lines[cmdclass])
+        if head:
+            rest = lines[cmdclass][head.end():].strip()
+            lines[cmdclass] = head.group() + "'build_ext': BuildExt," + \
+                (' ' + rest if rest else '')
+            wired = True
+    if wired and 'BuildExt' not in text:
+        imports.extend(BUILD_IMPORTS)
+
+    # Imports follow the last setuptools import before setup()
+
+    at = call
+    for idx in range(call):
+        if re.match(r'(from|import) setuptools\b', lines[idx]):
+            at = idx + 1
+    lines[at:at] = imports
+
+    return '\n'.join(lines) + '\n', wired
+
+
+def plan_extensions(pdir, package, modules):
+    r"""Return the plan for registering extension *modules* with project
+    *pdir*, see :py:func:`register_extensions`, as ``(package, path,
+    action)`` tuples: ``setup.py`` is to be modified, or left conflicting
+    if it cannot be extended, and :data:`BUILD_FRAGMENT` created or
+    modified to match pyjig's."""
+
+    setup = os.path.join(pdir, 'setup.py')
+    if not modules or not os.path.isfile(setup):
+        return []
+    with open(setup) as fin:
+        text = fin.read()
+
+    new, _ = extend_setup(text, package, modules)
+    if new is None:
+        return [(package, setup, 'conflict')]
+    if new == text:
+        return []
+
+    entries = [(package, setup, 'modify')]
+    fname = os.path.join(pdir, BUILD_FRAGMENT)
+    if not os.path.isfile(fname):
+        entries.append((package, fname, 'create'))
+    else:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               BUILD_FRAGMENT), 'rb') as fin:
+            data = fin.read()
+        with open(fname, 'rb') as fin:
+            if fin.read() != data:
+                entries.append((package, fname, 'modify'))
+    return entries
+
+
+def register_extensions(pdir, package, modules):
+    r"""Add the extension *modules* of project *pdir*, a list of ``(module,
+    source)`` tuples with *source* relative to *pdir*, to the
+    ``ext_modules`` of the project's ``setup.py`` as modules of *package*,
+    and make :data:`BUILD_FRAGMENT` its ``build_ext`` command. Modules
+    ``setup.py`` already names, by source or module name, are left alone.
+    If ``setup.py`` has no ``setup(`` line, or its ``ext_modules`` is not a
+    list opened on a line of its own (``ext_modules = [``), ``setup.py`` is
+    left alone and the developer is asked to add them. Likewise if its
+    ``cmdclass`` is not a dictionary opened on the keyword's line or already
+    has a ``build_ext``. Returns the list of files written."""
+
+    setup = os.path.join(pdir, 'setup.py')
+    if not os.path.isfile(setup):
+        return []
+    with open(setup) as fin:
+        text = fin.read()
+
+    new, wired = extend_setup(text, package, modules)
+    if new is None:
+        LOG.warning('>>> Add %s to the ext_modules of %s',
+                    ', '.join(src for _, src in modules), setup)
+        return []
+    if new == text:
+        return []
+    if not wired:
+        LOG.warning(">>> Add 'build_ext': BuildExt (from %s) to the cmdclass "
+                    "of %s", os.path.splitext(BUILD_FRAGMENT)[0], setup)
+
+    with open(setup, 'w') as fout:
+        fout.write(new)
+    return [setup] + install_build(pdir)
+
+
+def find_project_root(start=None):
+    r"""Find the project's root folder by scanning up from directory *start*
+    (default the current working directory) for the ``id.txt`` file. Returns
+    the directory of the project's root, or None if not match was found."""
+
+    return metadata.find_root(start)
+
+
+def render_files(path, context):
+    r"""Render the template in directory *path* with *context* and return a
+    dictionary of the generated files, keyed by their path within the
+    rendered module directory. Runs in :py:func:`render_modules` worker
+    processes, each of which loads the template once."""
+
+    from pyjig import engine  # pylint: disable=import-outside-toplevel
+
+    _, entries = engine.load(path).render(context)
+    return dict((fname, data) for fname, data, _ in entries if data is not None)
+
+
+def plan_modules(modules, tgtdir, patterns):
+    r"""Return the modules in *modules* still to be added to *tgtdir*, with
+    duplicates removed. A module is installed as the first of *patterns*
+    (file names, ``%s`` standing for the module name) its template generates;
+    if any of them already exists the module is skipped before any template
+    work, so re-running a command costs a few ``stat()`` calls."""
+
+    pending = []
+    seen = set()
+    for module in modules:
+        module = os.path.splitext(module)[0]
+        if module in seen:
+            continue
+        seen.add(module)
+        for pattern in patterns:
+            tgt = os.path.join(tgtdir, pattern % module)
+            if os.path.exists(tgt):
+                LOG.info(">>> Skipped overwritting target %s", tgt)
+                break
+        else:
+            pending.append(module)
+    return pending
+
+
+def render_modules(template, modules, no_input=False, extra=None, jobs=1):
+    r"""Render the loaded *template* for each of *modules*. *no_input* and
+    *extra* are as for :py:func:`add_pysource`. Returns a list of ``(module,
+    files)`` tuples (see :py:func:`render_files`) in the order of *modules*,
+    with duplicates removed.
+
+    The user is prompted for each module in turn, then rendering is spread
+    across *jobs* worker processes."""
+
+    names = []
+    for module in modules:
+        module = os.path.splitext(module)[0]
+        if module not in names:
+            names.append(module)
+
+    contexts = []
+    with timings.phase('prompt'):
+        for module in names:
+            ctx = dict(extra or {})
+            ctx['module'] = module
+            ctx['year'] = datetime.date.today().year
+            contexts.append(template.context(ctx, no_input))
+
+    paths = [template.path] * len(names)
+    with timings.phase('render'):
+        if jobs > 1 and len(names) > 1:
+            import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+            with concurrent.futures.ProcessPoolExecutor(
+                    min(jobs, len(names))) as pool:
+                results = list(pool.map(render_files, paths, contexts))
+        else:
+            results = [render_files(path, ctx)
+                       for path, ctx in zip(paths, contexts)]
+
+    return list(zip(names, results))
 
 
-def git_init(sdir):
-    r"""Initialize git repository in directory *sdir*"""
+def write_new(tgt, data):
+    r"""Write *data* to *tgt* only if *tgt* does not exist. The check and
+    create are atomic, so concurrent pyjig runs never overwrite each other.
+    Returns ``True`` if the file was written."""
 
-    cwd = os.getcwd()
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+    flags |= getattr(os, 'O_BINARY', 0)
     try:
-        run = subprocess.check_call
+        fdesc = os.open(tgt, flags, 0o666)
+    except OSError as exc:
+        if exc.errno == errno.EEXIST:
+            return False
+        raise
 
-        os.chdir(sdir)
-        try:
-            run(['git', 'status'], stderr=DNULL)
-            LOG.info('>>> Git already initialized, step skipped.')
-            return
-        except subprocess.CalledProcessError:
-            pass
-
-        run(['git', 'init'], stdout=DNULL)
-        run(['git', 'add', '.'], stdout=DNULL)
-        run(['git', 'commit', '-m', 'Initial check in.'], stdout=DNULL)
-    finally:
-        os.chdir(cwd)
+    LOG.debug("write %s", tgt)
+    with os.fdopen(fdesc, 'wb') as fout:
+        fout.write(data)
+    return True
 
 
-def find_project_root():
-    r"""Find the project's root folder by scanning up from the current working
-    directory for the ``id.txt`` file. Returns the directory of the project's
-    root, or None if not match was found."""
+def write_changed(tgt, data):
+    r"""Write *data* to *tgt* unless *tgt* already holds exactly *data*, so an
+    unchanged file keeps its modification time and make, editors and git see
+    nothing new. Returns ``True`` if the file was written."""
 
-    idpth = os.path.join(os.getcwd(), 'id.txt')
+    try:
+        if os.path.getsize(tgt) == len(data):
+            with open(tgt, 'rb') as fin:
+                if fin.read() == data:
+                    return False
+    except OSError:
+        pass
+
+    LOG.debug("write %s", tgt)
+    with open(tgt, 'wb') as fout:
+        fout.write(data)
+    return True
+
+
+def module_targets(names, module, tgtdir, patterns, project=False, dirs=()):
+    r"""Return where the files *names* generated for *module* are installed,
+    as a list of ``(name, path)`` tuples. The module itself comes first: the
+    first of *patterns* (see :data:`SOURCE_FILES`) found in *names*, in
+    *tgtdir*. If *project* is ``True``, the module's ``*.rst`` follows in
+    ``tgtdir/../docs`` and its ``test_*.py`` in ``tgtdir/../tests``, if those
+    directories exist (or are among *dirs*, about to be created)."""
+
+    for pattern in patterns:
+        name = pattern % module
+        if name in names:
+            break
+    else:
+        raise RuntimeError("template did not generate %s" % ' or '.join(
+            pattern % module for pattern in patterns))
+    targets = [(name, os.path.join(tgtdir, name))]
+
+    # Is this a project?
+
+    if project:
+        LOG.debug("Recognized as a project_type")
+        for subdir, name in (('docs', module + '.rst'),
+                             ('tests', 'test_' + module + '.py')):
+            pdir = os.path.abspath(os.path.join(tgtdir, '..', subdir))
+            if name in names and (os.path.isdir(pdir) or pdir in dirs):
+                targets.append((name, os.path.join(pdir, name)))
+
+    return targets
+
+
+def install_module(files, module, tgtdir, patterns, project=False):
+    r"""Install the rendered *files* of *module* (see
+    :py:func:`render_files`) where :py:func:`module_targets` places them.
+    Nothing is installed if the module itself already exists. Returns the
+    list of files written."""
+
+    targets = module_targets(files, module, tgtdir, patterns, project)
+
+    name, tgt = targets[0]
+    if not write_new(tgt, files[name]):
+        LOG.info(">>> Skipped overwritting target %s", tgt)
+        return []
+    written = [tgt]
+
+    for name, tgt in targets[1:]:
+        if write_new(tgt, files[name]):
+            written.append(tgt)
+
+    return written
+
+
+def plan_module_files(template, modules, tgtdir, patterns, extra=None,
+                      dirs=()):
+    r"""Return the plan for adding *modules* to *tgtdir* from the loaded
+    *template*, worked out from the names of the files it generates without
+    rendering any of them. *patterns* and *dirs* are as for
+    :py:func:`module_targets`, *extra* as for :py:func:`add_pysource`.
+    Returns a list of ``(module, path, action)`` tuples, where *action* is
+    ``create``, ``skip`` (the module exists and is left alone) or
+    ``conflict`` (a file of the new module exists and will not be
+    written)."""
+
+    project = 'project_type' in (extra or {})
+
+    entries = []
+    done = set()
+    for module in modules:
+        module = os.path.splitext(module)[0]
+        if module in done:
+            continue
+        done.add(module)
+
+        ctx = dict(extra or {})
+        ctx['module'] = module
+        ctx['year'] = datetime.date.today().year
+        context = template.context(ctx, no_input=True)
+        names = set(out for out, _ in template.outputs(context))
+
+        targets = module_targets(names, module, tgtdir, patterns, project,
+                                 dirs)
+        if os.path.exists(targets[0][1]):
+            entries.append((module, targets[0][1], 'skip'))
+            continue
+        for _, tgt in targets:
+            entries.append((module, tgt,
+                            'conflict' if os.path.exists(tgt) else 'create'))
+
+    return entries
+
+
+@timings.timed('add_pyextensions')
+def add_pyextensions(modules, tgtdir, no_input=False, extra=None, jobs=1):
+    r"""Add each extension module in *modules* to *tgtdir*, see
+    :py:func:`add_pyextension`. The ``pyext`` template is loaded once and
+    rendered for every module, using up to *jobs* worker processes. Returns
+    the list of files written."""
 
-    while not os.path.isfile(idpth):
+    with timings.phase('plan'):
+        modules = plan_modules(modules, tgtdir, EXTENSION_FILES)
+    if not modules:
+        return []
+
+    template = load_template('pyext')
+    project = 'project_type' in (extra or {})
 
-        curdir = os.path.dirname(idpth)
-        parent = os.path.dirname(curdir)
+    rendered = render_modules(template, modules, no_input, extra, jobs)
 
-        # Reached top of filesystem?
+    written = []
+    with timings.phase('install'):
+        for module, files in rendered:
 
-        if curdir == parent:
-            return None
+            # Look for C++ first, then fallback to .C
 
-        idpth = os.path.join(parent, 'id.txt')
+            written.extend(install_module(files, module, tgtdir,
+                                          EXTENSION_FILES, project))
 
-    return os.path.dirname(idpth)
+    return written
 
 
 def add_pyextension(module, tgtdir, no_input=False, extra=None):
@@ -557,58 +1285,33 @@ def add_pyextension(module, tgtdir, no_input=False, extra=None):
     in ``tgtdir/../docs`` and any ``test*.py`` will be installed in
     ``tgtdir/../tests``."""
 
-    extra = extra or {}
+    return add_pyextensions([module], tgtdir, no_input, extra)
 
-    module = os.path.splitext(module)[0]
 
-    extra['module'] = module
-    extra['year'] = datetime.date.today().year
+@timings.timed('add_pysources')
+def add_pysources(modules, tgtdir, no_input=False, extra=None, jobs=1):
+    r"""Add each source module in *modules* to *tgtdir*, see
+    :py:func:`add_pysource`. The ``pysource`` template is loaded once and
+    rendered for every module, using up to *jobs* worker processes. Returns
+    the list of files written."""
 
-    cwd = os.getcwd()
-    tmpd = tempfile.mkdtemp()
-    try:
-        os.chdir(tmpd)
-        cookiecutter('gh:jamercee/cookiecutter-pyext',
-                     extra_context=extra, no_input=no_input)
-
-        # Look for C++ first, then fallback to .C
-
-        src = os.path.join(module, module + '_module.cpp')
-        tgt = os.path.join(tgtdir, module + '_module.cpp')
-        if not os.path.exists(src):
-            src = os.path.join(module, module + '.c')
-            tgt = os.path.join(tgtdir, module + '.c')
-
-        if os.path.exists(tgt):
-            LOG.info(">>> Skipped overwritting target %s", tgt)
-            return
-
-        LOG.debug("copy %s -> %s", src, tgt)
-        shutil.copyfile(src, tgt)
-
-        # Is this a project?
-
-        if 'project_type' in extra:
-            # Copy doc *.rst
-            docdir = os.path.abspath(os.path.join(tgtdir, '../docs'))
-            if os.path.isdir(docdir):
-                src = os.path.join(module, module + '.rst')
-                tgt = os.path.join(docdir, module + '.rst')
-                if os.path.isfile(src) and not os.path.exists(tgt):
-                    LOG.debug("copy %s -> %s", src, tgt)
-                    shutil.copyfile(src, tgt)
-            # Copy unittest
-            tstdir = os.path.abspath(os.path.join(tgtdir, '../tests'))
-            if os.path.isdir(tstdir):
-                src = os.path.join(module, 'test_' + module + '.py')
-                tgt = os.path.join(tstdir, 'test_' + module + '.py')
-                if os.path.isfile(src) and not os.path.exists(tgt):
-                    LOG.debug("copy %s -> %s", src, tgt)
-                    shutil.copyfile(src, tgt)
+    with timings.phase('plan'):
+        modules = plan_modules(modules, tgtdir, SOURCE_FILES)
+    if not modules:
+        return []
 
-    finally:
-        os.chdir(cwd)
-        shutil.rmtree(tmpd, ignore_errors=True)
+    template = load_template('pysource')
+    project = 'project_type' in (extra or {})
+
+    rendered = render_modules(template, modules, no_input, extra, jobs)
+
+    written = []
+    with timings.phase('install'):
+        for module, files in rendered:
+            written.extend(install_module(files, module, tgtdir,
+                                          SOURCE_FILES, project))
+
+    return written
 
 
 def add_pysource(module, tgtdir, no_input=False, extra=None):
@@ -619,58 +1322,18 @@ def add_pysource(module, tgtdir, no_input=False, extra=None):
     in ``tgtdir/../docs`` and any ``test*.py`` will be installed in
     ``tgtdir/../tests``."""
 
-    extra = extra or {}
-
-    module = os.path.splitext(module)[0]
-    extra['module'] = module
-    extra['year'] = datetime.date.today().year
-
-    cwd = os.getcwd()
-    tmpd = tempfile.mkdtemp()
-    try:
-        os.chdir(tmpd)
-        cookiecutter('gh:jamercee/cookiecutter-pysource',
-                     extra_context=extra, no_input=no_input)
-        src = os.path.join(module, module + '.py')
-        tgt = os.path.join(tgtdir, module + '.py')
-
-        if os.path.exists(tgt):
-            LOG.info(">>> Skipped overwritting target %s", tgt)
-            return
-
-        LOG.debug("copy %s -> %s", src, tgt)
-        shutil.copyfile(src, tgt)
-
-        # Is this a project?
-
-        if 'project_type' in extra:
-            LOG.debug("Recognized as a project_type")
-            # Copy doc *.rst
-            docdir = os.path.abspath(os.path.join(tgtdir, '../docs'))
-            if os.path.isdir(docdir):
-                src = os.path.join(module, module + '.rst')
-                tgt = os.path.join(docdir, module + '.rst')
-                if os.path.isfile(src) and not os.path.exists(tgt):
-                    LOG.debug("copy %s -> %s", src, tgt)
-                    shutil.copyfile(src, tgt)
-            # Copy unittest
-            tstdir = os.path.abspath(os.path.join(tgtdir, '../tests'))
-            if os.path.isdir(tstdir):
-                src = os.path.join(module, 'test_' + module + '.py')
-                tgt = os.path.join(tstdir, 'test_' + module + '.py')
-                if os.path.isfile(src) and not os.path.exists(tgt):
-                    LOG.debug("copy %s -> %s", src, tgt)
-                    shutil.copyfile(src, tgt)
-    finally:
-        os.chdir(cwd)
-        shutil.rmtree(tmpd, ignore_errors=True)
+    return add_pysources([module], tgtdir, no_input, extra)
 
 
 class Pyjig:
-    r"""Template driven project creation."""
+    r"""Template driven project creation. Projects are created in, and
+    existing projects found from, directory *cwd* (default the current
+    working directory). Pyjig never changes the process working directory,
+    so instances may be used concurrently from several threads."""
 
-    def __init__(self, args):
+    def __init__(self, args, cwd=None):
         self.args = args
+        self.cwd = os.path.abspath(cwd or os.getcwd())
         self.ptype = None
         self.project_name = None
         self.project_slug = None
@@ -679,24 +1342,31 @@ class Pyjig:
             self.ptype = 'app'
             self.project_name = self.args.app[0]
             self.project_slug = self.project_name.replace(' ', '_')
-            self.pdir = os.path.realpath(self.project_slug)
+            self.pdir = os.path.realpath(
+                os.path.join(self.cwd, self.project_slug))
         elif self.args.pkg:
             self.ptype = 'pkg'
             self.project_name = self.args.pkg[0]
             self.project_slug = self.project_name.replace(' ', '_')
-            self.pdir = os.path.realpath(self.project_slug)
+            self.pdir = os.path.realpath(
+                os.path.join(self.cwd, self.project_slug))
         else:
-            self.pdir = find_project_root()
+            self.pdir = find_project_root(self.cwd)
             if self.pdir:
-                idfn = os.path.join(self.pdir, 'id.txt')
-                if os.path.isfile(idfn):
-                    extra = ast.literal_eval(open(idfn).read())
-                    self.ptype = extra['project_type']
-                    self.project_name = extra['project_name']
-                    self.project_slug = extra['project_slug']
-                else:
-                    self.pdir = None
+                meta = metadata.load(self.pdir)
+                self.ptype = meta.project_type
+                self.project_name = meta.project_name
+                self.project_slug = meta.project_slug
+
+    def project_context(self):
+        r"""Return the settings of the existing project (its ``id.txt``) as
+        a dictionary of cookiecutter overrides."""
+
+        extra = dict(metadata.load(self.pdir).context)
+        extra['project'] = self.project_slug
+        return extra
 
+    @timings.timed('create_project')
     def create_project(self, no_input=False):
         r"""Create a new project of either 'app' or 'pkg' type"""
 
@@ -709,17 +1379,37 @@ class Pyjig:
             }
 
         if self.args.app:
-            cookiecutter('gh:jamercee/cookiecutter-pyapp',
-                         extra_context=extra, no_input=no_input)
+            name = 'pyapp'
         elif self.args.pkg:
-            cookiecutter('gh:jamercee/cookiecutter-pypkg',
-                         extra_context=extra, no_input=no_input)
-
+            name = 'pypkg'
         else:
             raise RuntimeError('unknown project type')
 
+        # Fail a re-run before any template work
+
+        if os.path.exists(self.pdir):
+            raise RuntimeError('directory "%s" already exists' % self.pdir)
+        template = load_template(name)
+
+        with timings.phase('prompt'):
+            context = template.context(extra, no_input)
+        from pyjig import store  # pylint: disable=import-outside-toplevel
+
+        with timings.phase('generate'):
+            _, written = template.generate(context, self.cwd,
+                                           store.default_store())
+            written.extend(fname for fname in install_fragment(self.pdir)
+                           if fname not in written)
+
+        # Record what was generated, for pyjig upgrade
+
+        from pyjig import upgrade  # pylint: disable=import-outside-toplevel
+
+        with timings.phase('manifest'):
+            written.append(upgrade.record(self.pdir, name, template, context))
+
         if not self.args.excludegit:
-            git_init(self.pdir)
+            git_init(self.pdir, written)
 
     def add_project_extension(self, no_input=False):
         r"""Add one or more extension modules to a project's ``~/src/``
@@ -730,21 +1420,26 @@ class Pyjig:
         no_input = no_input or self.args.quiet
 
         if self.pdir:
-            idfn = os.path.join(self.pdir, 'id.txt')
-            extra = ast.literal_eval(open(idfn).read())
+            extra = self.project_context()
             tgtdir = os.path.join(self.pdir, 'src')
-            extra['project'] = self.project_slug
         else:
             extra = {}
-            tgtdir = os.getcwd()
+            tgtdir = self.cwd
 
         extra['year'] = datetime.date.today().year
 
-        for ext in self.args.ext:
-            add_pyextension(ext, tgtdir, no_input, extra)
+        written = add_pyextensions(self.args.ext, tgtdir, no_input, extra,
+                                   self.args.jobs)
+
+        # Build the new extensions with the project
 
         if self.pdir:
-            subprocess.check_call(['git', 'add', '.'])
+            modules = extension_sources(self.args.ext, tgtdir, written)
+            written.extend(register_extensions(self.pdir, self.project_slug,
+                                               modules))
+
+        if self.pdir and not self.args.excludegit:
+            self.stage(written)
 
     def add_project_sourcefile(self, no_input=False):
         r"""Add one or more sourcefiles to a project's ``~/src/``
@@ -755,30 +1450,195 @@ class Pyjig:
         no_input = no_input or self.args.quiet
 
         if self.pdir:
-            idfn = os.path.join(self.pdir, 'id.txt')
-            extra = ast.literal_eval(open(idfn).read())
+            extra = self.project_context()
             tgtdir = os.path.join(self.pdir, 'src')
-            extra['project'] = self.project_slug
         else:
             extra = {}
-            tgtdir = os.getcwd()
+            tgtdir = self.cwd
 
         extra['year'] = datetime.date.today().year
 
-        for source in self.args.source:
-            add_pysource(source, tgtdir, no_input, extra)
+        written = add_pysources(self.args.source, tgtdir, no_input, extra,
+                                self.args.jobs)
+
+        if self.pdir and not self.args.excludegit:
+            self.stage(written)
+
+    @timings.timed('plan')
+    def plan(self):
+        r"""Return the plan of the files this run would write, as a list of
+        ``(module, path, action)`` tuples (see :py:func:`plan_module_files`
+        and :py:func:`plan_extensions`, whose ``modify`` marks an existing
+        file that would be changed). Templates are loaded but nothing is
+        rendered or written."""
+
+        entries = []
+        dirs = set()
+        extra = {}
+
+        if self.args.app or self.args.pkg:
+            if os.path.exists(self.pdir):
+                return [(self.project_slug, self.pdir, 'conflict')]
+
+            template = load_template('pyapp' if self.args.app else 'pypkg')
+            context = template.context({
+                'project_type': self.ptype,
+                'project_name': self.project_name,
+                'year': datetime.date.today().year,
+                }, no_input=True)
+            from pyjig import upgrade  # pylint: disable=import-outside-toplevel
+
+            outputs = [out for out, _ in template.outputs(context)]
+            if 'Makefile' in outputs:
+                outputs.append(MAKE_FRAGMENT)
+            if 'setup.py' in outputs and self.args.ext:
+                outputs.append(BUILD_FRAGMENT)
+            for out in outputs + [upgrade.MANIFEST]:
+                path = os.path.join(self.pdir, out)
+                entries.append((self.project_slug, path, 'create'))
+                dirs.add(os.path.dirname(path))
+            extra = dict((key, val) for key, val in
+                         context['cookiecutter'].items() if key != '_template')
+        elif self.pdir:
+            extra = dict(metadata.load(self.pdir).context)
 
         if self.pdir:
-            subprocess.check_call(['git', 'add', '.'])
+            extra['project'] = self.project_slug
+            tgtdir = os.path.join(self.pdir, 'src')
+        else:
+            tgtdir = self.cwd
+
+        if self.args.ext:
+            planned = plan_module_files(load_template('pyext'), self.args.ext,
+                                        tgtdir, EXTENSION_FILES, extra, dirs)
+            entries.extend(planned)
+            if self.pdir:
+                created = [path for _, path, action in planned
+                           if action == 'create']
+                entries.extend(plan_extensions(
+                    self.pdir, self.project_slug,
+                    extension_sources(self.args.ext, tgtdir, created)))
+        elif self.args.source:
+            entries.extend(plan_module_files(
+                load_template('pysource'), self.args.source, tgtdir,
+                SOURCE_FILES, extra, dirs))
+
+        return entries
+
+    @timings.timed('stage')
+    def stage(self, files):
+        r"""Stage *files* written to the project in one ``git add``.
+        Unrelated changes in the work tree are left unstaged."""
+
+        git.stage(self.pdir, files)
+
+
+def report_plan(entries, dest='-', cwd=None):
+    r"""Report plan *entries* (see :py:meth:`Pyjig.plan`), as a table on the
+    log if *dest* is ``-`` or else as JSON written to file *dest*. Paths in
+    the table are relative to directory *cwd* (default the current working
+    directory)."""
+
+    counts = dict((action, 0) for action in ('create', 'modify', 'skip',
+                                             'conflict'))
+    for _, _, action in entries:
+        counts[action] += 1
+
+    if dest != '-':
+        with open(dest, 'w') as fout:
+            json.dump({'files': [{'module': module, 'path': path,
+                                  'action': action}
+                                 for module, path, action in entries],
+                       'counts': counts}, fout, indent=1)
+        return
+
+    cwd = cwd or os.getcwd()
+    for module, path, action in entries:
+        LOG.info('%-8s %-20s %s', action, module, os.path.relpath(path, cwd))
+    LOG.info('>>> %d to create, %d to modify, %d skipped, %d conflicting',
+             counts['create'], counts['modify'], counts['skip'],
+             counts['conflict'])
+
+
+def run_command(argv):
+    r"""Run sub-command ``argv[0]`` (see :data:`COMMANDS`) with arguments
+    ``argv[1:]`` and return its exit status."""
+
+    modname, funcname = COMMANDS[argv[0]].split(':')
+    return getattr(importlib.import_module(modname), funcname)(argv[1:])
 
 
-def main():
+def check_args(args):
+    r"""Return an error message if parsed *args* are inconsistent, else
+    ``None``."""
+
+    if not any((args.app, args.pkg, args.ext, args.source)):
+        return 'Must either create app/mod or add source.'
+    if args.app and args.pkg:
+        return 'Cannot select both --app and --pkg'
+    if args.jobs < 1:
+        return '--jobs must be at least 1'
+    return None
+
+
+def execute(args, cwd=None):
+    r"""Validate the toolchain and carry out the operations requested by
+    parsed *args*, relative to directory *cwd* (default the current working
+    directory). Returns the exit status."""
+
+    with timings.phase('find_project'):
+        proj = Pyjig(args, cwd)
+
+    if args.plan or args.plan_file:
+        try:
+            entries = proj.plan()
+        except RuntimeError as exc:
+            LOG.error('>>> %s', exc)
+            return -1
+        dest = '-'
+        if args.plan_file:
+            dest = os.path.join(proj.cwd, args.plan_file)
+        report_plan(entries, dest, proj.cwd)
+        return 0
+
+    # Validate environment, only for the tools this run needs
+
+    create = bool(args.app or args.pkg)
+    stage = bool(create or proj.pdir)
+    try:
+        with timings.phase('toolchain'):
+            validate(required(create=create,
+                              git=stage and not args.excludegit))
+    except RuntimeError as exc:
+        LOG.error(exc)
+        return -1
+
+    try:
+        if args.app or args.pkg:
+            proj.create_project()
+
+        if args.ext:
+            proj.add_project_extension()
+        elif args.source:
+            proj.add_project_sourcefile()
+    except RuntimeError as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    return 0
+
+
+def main(argv=None):
     r"""main process driver"""
 
     logging.basicConfig(level=logging.INFO, format='%(message)s')
 
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        return run_command(argv)
+
     parser = init_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.help:
         parser.print_help()
@@ -800,39 +1660,56 @@ def main():
     if args.source:
         LOG.info(">>> Option: Add new sourcefile(s) '%s'.",
                  ','.join(args.source))
+    if args.offline:
+        LOG.info('>>> Option: Offline, use cached templates only.')
+    if args.jobs > 1:
+        LOG.info('>>> Option: Use %d worker processes.', args.jobs)
+    if args.timings or args.timings_file:
+        LOG.info('>>> Option: Report phase timings.')
+    if args.trace:
+        LOG.info(">>> Option: Write trace to '%s'.", args.trace)
+    if args.plan or args.plan_file:
+        LOG.info('>>> Option: Plan only, write nothing.')
 
     # Validate arguments
 
-    if not any((args.app, args.pkg, args.ext, args.source)):
-        LOG.error('>>> Must either create app/mod or add source.')
-        parser.print_help()
+    error = check_args(args)
+    if error:
+        LOG.error('>>> %s', error)
+        if not any((args.app, args.pkg, args.ext, args.source)):
+            parser.print_help()
         return -1
-    if args.app and args.pkg:
-        LOG.error('>>> Cannot select both --app and --pkg')
-        return -1
-
-    # Validate environment
 
-    try:
-        for exe in ('cookiecutter', 'flake8', 'git', 'make', 'nosetests',
-                    'pylint', 'sphinx-build'):
-            if not inpath(exe):
-                raise RuntimeError("missing required componet %s" % exe)
-    except RuntimeError as exc:
-        LOG.error(exc)
-        return -1
+    # Hand quiet runs to a running pyjig server, see pyjig.server
 
-    proj = Pyjig(args)
+    if args.quiet and os.environ.get('PYJIG_SOCKET'):
+        from pyjig import server  # pylint: disable=import-outside-toplevel
+        if not server.unsupported(args):
+            status = server.forward(argv, os.environ['PYJIG_SOCKET'])
+            if status is not None:
+                return status
 
-    if args.app or args.pkg:
-        proj.create_project()
+    global CACHE  # pylint: disable=global-statement
 
-    if args.ext:
-        proj.add_project_extension()
-    elif args.source:
-        proj.add_project_sourcefile()
+    try:
+        CACHE = TemplateCache(offline=args.offline, refresh=args.refresh,
+                              pins=parse_pins(args.pin), remote=args.remote)
+    except ValueError as exc:
+        LOG.error('>>> %s', exc)
+        return -1
 
-    return 0
+    if args.timings or args.timings_file:
+        timings.enable()
+    if args.trace:
+        trace.enable()
+    try:
+        with trace.span('pyjig', argv=' '.join(argv)):
+            return execute(args)
+    finally:
+        if args.timings or args.timings_file:
+            timings.report(args.timings_file or '-')
+        if args.trace:
+            trace.write(args.trace)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`pyjig_build` - Parallel, cached extension builds
+########################################################
+
+.. module:: pyjig.pyjig_build
+   :synopsis: setup.py build_ext command compiling extensions in parallel through ccache
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Pyjig installs this module as ``pyjig_build.py`` in a project's root the
+first time it adds an extension module (``pyjig --ext``), and wires it into
+the project's ``setup.py`` as the ``build_ext`` command (see
+:py:func:`pyjig.pyjig.register_extensions`). ``pyjig upgrade`` keeps it up to
+date. It depends only on the standard library and setuptools: it runs in
+the project's builds, where pyjig need not be installed.
+
+:py:class:`BuildExt` differs from the setuptools command in two ways:
+
+   1. extensions are compiled in parallel, one per CPU unless
+      ``$PYJIG_BUILD_JOBS`` (``make pbuild BUILD_JOBS=N``) or
+      ``setup.py build_ext --parallel N`` says otherwise. Extensions whose
+      sources did not change are not compiled at all, as before;
+   2. compilers are run through ``ccache`` when it is installed, so a
+      ``make clean`` or a fresh checkout recompiles nothing that was
+      compiled before. ``$PYJIG_CCACHE`` names another launcher
+      (``sccache``), ``PYJIG_CCACHE=no`` turns it off.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import os
+import shutil
+
+from setuptools.command.build_ext import build_ext
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+
+# Compiler commands run through the launcher; linkers are left alone, as
+# ccache does not cache links
+
+COMPILERS = ('compiler_so', 'compiler_so_cxx')
+
+
+def jobs():
+    r"""Return the number of extensions to compile at once,
+    ``$PYJIG_BUILD_JOBS`` or one per CPU."""
+
+    return int(os.environ.get('PYJIG_BUILD_JOBS') or 0) or \
+        os.cpu_count() or 1
+
+
+def launcher():
+    r"""Return the path of the compiler launcher, ``$PYJIG_CCACHE`` or
+    ``ccache``, or ``None`` if it is disabled or not installed."""
+
+    name = os.environ.get('PYJIG_CCACHE') or 'ccache'
+    if name == 'no':
+        return None
+    return shutil.which(name)
+
+
+class BuildExt(build_ext):
+    r"""``build_ext`` compiling extensions in parallel, through ccache."""
+
+    def finalize_options(self):
+        build_ext.finalize_options(self)
+        if not self.parallel:
+            self.parallel = jobs()
+
+    def build_extensions(self):
+        exe = launcher()
+        if exe and self.compiler.compiler_type == 'unix':
+            for attr in COMPILERS:
+                cmd = getattr(self.compiler, attr, None)
+                if cmd and os.path.basename(cmd[0]) != os.path.basename(exe):
+                    setattr(self.compiler, attr, [exe] + list(cmd))
+        build_ext.build_extensions(self)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`server` - Resident pyjig server
+########################################
+
+.. module:: pyjig.server
+   :synopsis: Serve pyjig requests from a warm process over a Unix socket
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Every ``pyjig`` invocation pays for interpreter startup, importing
+cookiecutter and Jinja, and checking out and parsing its templates. ``pyjig
+serve`` pays for them once: it loads every template up front and then runs
+pyjig command lines sent to it over a Unix socket, keeping templates, project
+metadata and toolchain checks warm between requests. Requests are served
+concurrently, each in its own thread.
+
+The protocol is one JSON object per line. A client connects, sends a single
+request and reads a single reply:
+
+   ``{"op": "run", "argv": [...], "cwd": "/path", "env": {...}}``
+      Run pyjig command line *argv* from directory *cwd*, with the client's
+      :py:data:`CLIENT_ENV` variables *env* (``null`` for those the client
+      does not have). Variables missing from *env*, or the whole of *env*,
+      keep the server's values. The reply is
+      ``{"status": N, "log": [[level, message], ...]}``.
+   ``{"op": "ping"}``
+      Reply ``{"status": 0}``.
+   ``{"op": "stop"}``
+      Reply ``{"status": 0}`` and shut the server down.
+
+The server cannot prompt, so every request runs as if ``--quiet`` was given.
+Template options (``--offline``, ``--refresh``, ``--pin`` and ``--remote``)
+are fixed when the server starts, and ``--debug``, ``--timings`` and
+``--trace`` would report on the server's process rather than the request;
+requests carrying them are rejected. Requests run with the client's ``PATH``,
+``HOME`` and git identity, so they find the same tools and commit as the
+same user as a local run. Requests with the same environment run
+concurrently, others wait their turn.
+
+When ``PYJIG_SOCKET`` is set, ``pyjig --quiet ...`` forwards itself to the
+server listening there (see :py:func:`forward`), and runs locally if no
+server answers or the command line carries options the server rejects.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+
+from pyjig import pyjig
+from pyjig.cache import TEMPLATES, TemplateCache, parse_pins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# Environment variables sent with each request: where tools are found, where
+# user configuration is read from, and who commits
+
+CLIENT_ENV = ('PATH', 'HOME', 'XDG_CONFIG_HOME', 'GIT_AUTHOR_NAME',
+              'GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_NAME', 'GIT_COMMITTER_EMAIL')
+
+
+def default_socket():
+    r"""Return the server's socket, ``$PYJIG_SOCKET`` or
+    ``~/.pyjig/pyjig.sock``."""
+
+    return os.environ.get('PYJIG_SOCKET') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'pyjig.sock')
+
+
+def request(req, path=None, timeout=None):
+    r"""Send *req* to the server listening on socket *path* and return its
+    reply. Raises :py:exc:`socket.error` if no server answers."""
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path or default_socket())
+        sock.sendall(json.dumps(req).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as fin:
+            line = fin.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        raise socket.error('no reply from pyjig server')
+    return json.loads(line.decode('utf-8'))
+
+
+def unsupported(args):
+    r"""Return the options in parsed *args* a request cannot carry (see
+    above), an empty list if the server can run it."""
+
+    options = (('--offline', args.offline), ('--refresh', args.refresh),
+               ('--pin', args.pin), ('--remote', args.remote),
+               ('--debug', args.debug), ('--timings', args.timings),
+               ('--timings-file', args.timings_file), ('--trace', args.trace))
+    return [name for name, value in options if value]
+
+
+def forward(argv, path=None):
+    r"""Run pyjig command line *argv* in the server on socket *path*, logging
+    its output here. Returns the exit status, or ``None`` if no server is
+    listening."""
+
+    env = dict((key, os.environ.get(key)) for key in CLIENT_ENV)
+    try:
+        reply = request({'op': 'run', 'argv': argv, 'cwd': os.getcwd(),
+                         'env': env}, path)
+    except (socket.error, ValueError) as exc:
+        LOG.debug('pyjig server unavailable: %s', exc)
+        return None
+
+    for level, msg in reply.get('log', []):
+        LOG.log(level, '%s', msg)
+    return reply.get('status', -1)
+
+
+class Capture(logging.Handler):
+    r"""Logging handler that collects the records of threads serving a
+    request, so each reply carries only its own output."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.setFormatter(logging.Formatter('%(message)s'))
+        self.buffers = {}
+
+    def emit(self, record):
+        lines = self.buffers.get(record.thread)
+        if lines is not None:
+            lines.append((record.levelno, self.format(record)))
+
+    def start(self):
+        r"""Begin collecting records for the current thread."""
+        self.buffers[threading.get_ident()] = []
+
+    def stop(self):
+        r"""Return and discard the current thread's records."""
+        return self.buffers.pop(threading.get_ident(), [])
+
+
+def run(argv, cwd):
+    r"""Run pyjig command line *argv* from directory *cwd* inside the server.
+    Returns the exit status."""
+
+    parser = pyjig.init_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:
+        LOG.error('>>> invalid arguments: %s', ' '.join(argv))
+        return -1
+
+    rejected = unsupported(args)
+    if rejected:
+        LOG.error('>>> %s not supported by the pyjig server',
+                  ', '.join(rejected))
+        return -1
+
+    error = pyjig.check_args(args)
+    if error:
+        LOG.error('>>> %s', error)
+        return -1
+    if not os.path.isdir(cwd):
+        LOG.error('>>> no such directory %s', cwd)
+        return -1
+
+    args.quiet = True
+    return pyjig.execute(args, cwd)
+
+
+class Environ:
+    r"""Set the :py:data:`CLIENT_ENV` variables of the requests being served
+    in ``os.environ``, which every thread shares: requests with the same
+    environment run together, a request with another one waits until they
+    finish. The server's own values are restored when the server is idle."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.current = None
+        self.running = 0
+        self.saved = None
+
+    @contextlib.contextmanager
+    def applied(self, env):
+        r"""Context manager running the enclosed block with client
+        environment *env*."""
+
+        with self.cond:
+            while self.running and env != self.current:
+                self.cond.wait()
+            if not self.running:
+                self.saved = dict((key, os.environ.get(key))
+                                  for key in CLIENT_ENV if key in env)
+                self.update(env)
+                self.current = env
+            self.running += 1
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.running -= 1
+                if not self.running:
+                    self.update(self.saved)
+                    self.current = None
+                    self.cond.notify_all()
+
+    @staticmethod
+    def update(env):
+        r"""Set the :py:data:`CLIENT_ENV` variables in *env* to their values
+        there, removing those whose value is ``None``. Variables not in *env*
+        are left alone."""
+
+        for key in CLIENT_ENV:
+            if key not in env:
+                continue
+            if env[key] is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = env[key]
+
+
+class Server:
+    r"""Serve pyjig requests on Unix socket *path*."""
+
+    def __init__(self, path=None):
+        self.path = path or default_socket()
+        self.capture = Capture()
+        self.environ = Environ()
+        self.sock = None
+        self.stopping = threading.Event()
+
+    def bind(self):
+        r"""Create the listening socket, readable only by this user. A stale
+        socket left by a dead server is replaced."""
+
+        try:
+            request({'op': 'ping'}, self.path, timeout=1)
+            raise RuntimeError('pyjig server already listening on %s'
+                               % self.path)
+        except (socket.error, ValueError):
+            pass
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        sdir = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(sdir):
+            os.makedirs(sdir)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(umask)
+        self.sock.listen(16)
+
+    def handle(self, conn):
+        r"""Serve the single request on connection *conn*."""
+
+        try:
+            with conn.makefile('rb') as fin:
+                line = fin.readline()
+            try:
+                req = json.loads(line.decode('utf-8'))
+                oper = req.get('op')
+            except (ValueError, AttributeError):
+                req, oper = {}, None
+
+            if oper == 'run':
+                self.capture.start()
+                try:
+                    with self.environ.applied(dict(req.get('env') or {})):
+                        status = run(list(req.get('argv', [])),
+                                     req.get('cwd') or os.getcwd())
+                except Exception:  # pylint: disable=broad-except
+                    LOG.exception('>>> request failed')
+                    status = -1
+                reply = {'status': status, 'log': self.capture.stop()}
+            elif oper in ('ping', 'stop'):
+                reply = {'status': 0}
+            else:
+                reply = {'status': -1,
+                         'log': [(logging.ERROR, 'unknown request')]}
+
+            conn.sendall(json.dumps(reply).encode('utf-8') + b'\n')
+            if oper == 'stop':
+                self.stop()
+        except socket.error as exc:
+            LOG.debug('client went away: %s', exc)
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        r"""Accept and serve requests, each in its own thread, until
+        :py:meth:`stop` is called."""
+
+        LOG.addHandler(self.capture)
+        LOG.info('>>> pyjig server listening on %s', self.path)
+        try:
+            while not self.stopping.is_set():
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.error:
+                    if self.stopping.is_set():
+                        break
+                    raise
+                thread = threading.Thread(target=self.handle, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        finally:
+            LOG.removeHandler(self.capture)
+            self.close()
+
+    def stop(self):
+        r"""Stop accepting requests."""
+
+        self.stopping.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except (socket.error, AttributeError):
+            pass
+
+    def close(self):
+        r"""Close and remove the listening socket."""
+
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def warm():
+    r"""Check out and load every template, so the first request served does
+    not pay for it."""
+
+    for name in sorted(TEMPLATES):
+        try:
+            pyjig.load_template(name)
+        except RuntimeError as exc:
+            LOG.warning('>>> unable to load template %s: %s', name, exc)
+
+
+def serve(argv=None):
+    r"""``pyjig serve``: run a resident pyjig server, or stop one. Returns
+    the exit status."""
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig serve',
+        description='Serve pyjig requests from a warm process over a Unix '
+                    'socket.')
+    parser.add_argument(
+        '--socket',
+        default=None, metavar='PATH',
+        help='Listen on PATH (default $PYJIG_SOCKET or ~/.pyjig/pyjig.sock).')
+    parser.add_argument(
+        '--stop',
+        action='store_true', default=False,
+        help='Stop the server listening on the socket.')
+    parser.add_argument(
+        '--offline',
+        action='store_true', default=False,
+        help='Use cached templates only, never access the network.')
+    parser.add_argument(
+        '--remote',
+        action='store_true', default=False,
+        help='Use the template repos (gh:...) rather than the templates '
+             'embedded in pyjig.')
+    parser.add_argument(
+        '--refresh',
+        action='store_true', default=False,
+        help='Check cached templates for updates now.')
+    parser.add_argument(
+        '--pin',
+        action='append', metavar='NAME=REV',
+        help='Pin template NAME (pyapp, pypkg, pysource, pyext) to REV')
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        try:
+            request({'op': 'stop'}, args.socket)
+        except (socket.error, ValueError) as exc:
+            LOG.error('>>> no pyjig server: %s', exc)
+            return -1
+        return 0
+
+    try:
+        pyjig.CACHE = TemplateCache(offline=args.offline,
+                                    refresh=args.refresh,
+                                    pins=parse_pins(args.pin),
+                                    remote=args.remote)
+    except ValueError as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    server = Server(args.socket)
+    try:
+        server.bind()
+    except (RuntimeError, socket.error, OSError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    warm()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+    return 0
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`store` - Content-addressed store of static template files
+##################################################################
+
+.. module:: pyjig.store
+   :synopsis: Materialize identical template files by reflink or in-kernel copy
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Most files of a new project are rendered from its template, but some (the
+``pylint.rc``, ``.gitignore``, ``docs/Makefile`` and ``docs/make.bat`` of the
+pyjig templates) are the same byte for byte in every project. Pyjig keeps one
+copy of each such file in a content-addressed store (``~/.pyjig/store``, or
+``$PYJIG_STORE``), named by the SHA-1 of its contents, and materializes it in
+each new project by the cheapest means the filesystems allow:
+
+   1. a reflink (``FICLONE``), sharing the data blocks copy-on-write, on
+      filesystems that support it (btrfs, XFS, ...);
+   2. ``copy_file_range()``, copying inside the kernel (which itself shares
+      blocks, or copies server side, where it can);
+   3. a plain write of the file.
+
+A method that fails between two filesystems is not tried again between
+them. Either way the project gets a file of its own: editing it never
+affects the store or another project.
+
+Hard links are cheaper still, but are not copy-on-write: every project would
+share one file, and writing to it in place would change them all. With
+``$PYJIG_STORE_HARDLINK=yes`` pyjig hard links static files, for throwaway
+projects (test fixtures) only. Store files are read-only, so linked files are
+too.
+
+Set ``$PYJIG_STORE=none`` to write every file directly.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import collections
+import errno
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# ioctl of linux/fs.h cloning a whole file
+
+FICLONE = 0x40049409
+
+# Errors meaning a method is not available between two filesystems
+
+UNSUPPORTED = set(getattr(errno, name) for name in (
+    'EOPNOTSUPP', 'ENOTSUP', 'EXDEV', 'EINVAL', 'ENOSYS', 'ENOTTY', 'EPERM',
+    'EMLINK') if hasattr(errno, name))
+
+
+def default_root():
+    r"""Return the store directory, ``$PYJIG_STORE`` or ``~/.pyjig/store``,
+    or ``None`` if the store is disabled."""
+
+    root = os.environ.get('PYJIG_STORE')
+    if root == 'none':
+        return None
+    return root or os.path.join(os.path.expanduser('~'), '.pyjig', 'store')
+
+
+def default_store():
+    r"""Return the :py:class:`Store` configured by the environment, or
+    ``None``."""
+
+    root = default_root()
+    if root is None:
+        return None
+    return Store(root, os.environ.get('PYJIG_STORE_HARDLINK') == 'yes')
+
+
+def reflink(src, dst):
+    r"""Clone the contents of open file *src* into open file *dst*."""
+
+    import fcntl  # pylint: disable=import-outside-toplevel
+
+    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def copy_range(src, dst):
+    r"""Copy open file *src* to open file *dst* with
+    ``copy_file_range()``."""
+
+    size = os.fstat(src.fileno()).st_size
+    while size > 0:
+        copied = os.copy_file_range(src.fileno(), dst.fileno(), size)
+        if copied == 0:
+            break
+        size -= copied
+
+
+class Store:
+    r"""Content-addressed store of files in directory *root*. With
+    *hardlink* files are materialized by hard link when possible."""
+
+    def __init__(self, root, hardlink=False):
+        self.root = root
+        self.hardlink = hardlink
+        self.failed = set()
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+
+        self.methods = []
+        if sys.platform.startswith('linux'):
+            self.methods.append(('reflink', reflink))
+        if hasattr(os, 'copy_file_range'):
+            self.methods.append(('copy_file_range', copy_range))
+
+    def put(self, data, mode):
+        r"""Return the store file holding *data*, with the permissions of
+        *mode* less write access, adding it on first use. Returns ``None``
+        if the store cannot be written."""
+
+        sha = hashlib.sha1(data).hexdigest()
+        mode = mode & 0o555
+        fname = os.path.join(self.root, sha[:2], '%s-%o' % (sha, mode))
+        if os.path.isfile(fname):
+            return fname
+
+        try:
+            if not os.path.isdir(os.path.dirname(fname)):
+                os.makedirs(os.path.dirname(fname))
+            fdesc, tmpfn = tempfile.mkstemp(dir=os.path.dirname(fname))
+            with os.fdopen(fdesc, 'wb') as fout:
+                fout.write(data)
+            os.chmod(tmpfn, mode)
+            os.rename(tmpfn, fname)
+        except (IOError, OSError) as exc:
+            LOG.debug('unable to store %s: %s', sha, exc)
+            return None
+        return fname
+
+    def supported(self, method, key):
+        r"""Return ``True`` unless *method* failed for filesystems *key*."""
+
+        with self.lock:
+            return (method, key) not in self.failed
+
+    def unsupported(self, method, key, exc):
+        r"""Record that *method* does not work between filesystems *key*,
+        if *exc* says so; otherwise re-raise it."""
+
+        if exc.errno not in UNSUPPORTED:
+            raise exc
+        LOG.debug('%s unsupported for %s: %s', method, key, exc)
+        with self.lock:
+            self.failed.add((method, key))
+
+    def materialize(self, data, tgt, mode):
+        r"""Write *data* to new file *tgt* with permissions *mode*, through
+        the store. Returns the method used: ``hardlink``, ``reflink``,
+        ``copy_file_range`` or ``copy``."""
+
+        method = self.link(data, tgt, mode)
+        if method is None:
+            method = self.copy(data, tgt, mode)
+        with self.lock:
+            self.counts[method] += 1
+        return method
+
+    def link(self, data, tgt, mode):
+        r"""Hard link *tgt* to the store file of *data*, if enabled and
+        possible. Returns ``hardlink`` or ``None``."""
+
+        if not self.hardlink:
+            return None
+        src = self.put(data, mode)
+        if src is None:
+            return None
+        key = (os.stat(src).st_dev, os.stat(os.path.dirname(tgt)).st_dev)
+        if not self.supported('hardlink', key):
+            return None
+        try:
+            os.link(src, tgt)
+        except OSError as exc:
+            self.unsupported('hardlink', key, exc)
+            return None
+        return 'hardlink'
+
+    def copy(self, data, tgt, mode):
+        r"""Write *data* to new file *tgt*, cloning the store file of *data*
+        if possible (see :py:meth:`clone`), else writing it. Returns the
+        method used."""
+
+        src = self.put(data, mode) if self.methods else None
+        with open(tgt, 'wb') as fout:
+            method = self.clone(src, fout) if src else None
+            if method is None:
+                method = 'copy'
+                fout.write(data)
+        os.chmod(tgt, mode & 0o7777)
+        return method
+
+    def clone(self, src, fout):
+        r"""Copy store file *src* into open file *fout* by the first method,
+        reflink or ``copy_file_range()``, that works between their
+        filesystems. Returns the method used, or ``None``."""
+
+        with open(src, 'rb') as fin:
+            key = (os.fstat(fin.fileno()).st_dev,
+                   os.fstat(fout.fileno()).st_dev)
+            for method, func in self.methods:
+                if not self.supported(method, key):
+                    continue
+                try:
+                    func(fin, fout)
+                    return method
+                except (IOError, OSError) as exc:
+                    self.unsupported(method, key, exc)
+                    fout.seek(0)
+                    fout.truncate()
+        return None
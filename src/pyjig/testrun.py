@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testrun` - Parallel test runner
+########################################
+
+.. module:: pyjig.testrun
+   :synopsis: Run a project's test modules in parallel, skipping unchanged ones
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+``pyjig test`` runs the project's ``tests/test_*.py`` modules (or those named)
+with :py:mod:`unittest`, split across worker processes
+(:py:mod:`pyjig.testworker`) run by the project's interpreter.
+
+The split is balanced on the duration each module took last time it ran: the
+longest modules are dealt out first, each to the worker with the least work
+so far. Modules never timed count as the average.
+
+A module that passes is cached (in ``~/.pyjig/test``, or
+``$PYJIG_TEST_CACHE``) under a hash of the interpreter's version, the module
+and every project module it imports, directly or not, found by scanning their
+``import`` statements, plus ``setup.py``, ``setup.cfg`` and any extension
+sources. It is not run again until one of those changes. Failing modules are
+always re-run.
+
+So that tests can import the project by package name (``import
+myproj.module``) as they do under ``setup.py test``, the project's ``src``
+directory is made importable under the project's name through a symlink in
+the cache.
+
+New projects get a ``make ptests`` recipe running ``pyjig test``, see
+:py:func:`pyjig.pyjig.install_fragment`.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pyjig import metadata
+from pyjig.lint import ResultCache
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'testworker.py')
+
+# Files every test result depends on, and extension sources
+
+COMMON = ('setup.py', 'setup.cfg', 'src/__init__.py', 'tests/__init__.py')
+EXTENSIONS = ('*.c', '*.cpp', '*.h', '*.hpp')
+
+
+def default_cachedir():
+    r"""Return the test cache directory, ``$PYJIG_TEST_CACHE`` or
+    ``~/.pyjig/test``."""
+
+    return os.environ.get('PYJIG_TEST_CACHE') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'test')
+
+
+def root_key(root):
+    r"""Return the part of cache keys naming project *root*."""
+
+    return hashlib.sha1(root.encode('utf-8')).hexdigest()
+
+
+def local_modules(root, slug):
+    r"""Return the project's importable modules, mapping each name they can
+    be imported as to their file (relative to project *root*)."""
+
+    names = {}
+    for fname in glob.glob(os.path.join(root, 'src', '*.py')):
+        rel = os.path.relpath(fname, root)
+        stem = os.path.splitext(os.path.basename(fname))[0]
+        for prefix in ('', 'src.', slug + '.' if slug else None):
+            if prefix is not None:
+                names[prefix + stem] = rel
+    if slug:
+        names[slug] = os.path.join('src', '__init__.py')
+    for fname in glob.glob(os.path.join(root, 'tests', '*.py')):
+        stem = os.path.splitext(os.path.basename(fname))[0]
+        names['tests.' + stem] = os.path.relpath(fname, root)
+    return names
+
+
+def imports(fname):
+    r"""Return the names imported by python file *fname*: every module, and
+    every ``module.name`` of ``from module import name``."""
+
+    try:
+        with open(fname, 'rb') as fin:
+            tree = ast.parse(fin.read(), fname)
+    except (IOError, SyntaxError, ValueError):
+        return set()
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ''
+            names.add(module)
+            names.update((module + '.' if module else '') + alias.name
+                         for alias in node.names)
+    return names
+
+
+def dependencies(root, rel, modules):
+    r"""Return the project files test module *rel* depends on: itself and
+    every local module (see :py:func:`local_modules`) it imports, directly or
+    through other local modules."""
+
+    found = set([rel])
+    todo = [rel]
+    while todo:
+        for name in imports(os.path.join(root, todo.pop())):
+            dep = modules.get(name)
+            if dep and dep not in found:
+                found.add(dep)
+                todo.append(dep)
+    return found
+
+
+def test_key(cache, python, root, rel, modules):
+    r"""Return the cache key of the result of test module *rel* run by
+    interpreter *python*."""
+
+    deps = dependencies(root, rel, modules)
+    deps.update(pattern for pattern in COMMON)
+    for pattern in EXTENSIONS:
+        deps.update(os.path.relpath(fname, root) for fname in
+                    glob.glob(os.path.join(root, 'src', pattern)))
+
+    parts = [cache.tool_version(python), rel]
+    for dep in sorted(deps):
+        try:
+            with open(os.path.join(root, dep), 'rb') as fin:
+                parts.extend([dep, fin.read()])
+        except IOError:
+            continue
+    return cache.key(*parts)
+
+
+def balance(modules, durations, jobs):
+    r"""Split *modules* into at most *jobs* lists of about equal total
+    duration, using the recorded *durations* (seconds, keyed by module)."""
+
+    known = [durations[name] for name in modules if name in durations]
+    default = sum(known) / len(known) if known else 1.0
+
+    bins = [[0.0, []] for _ in range(min(jobs, len(modules)))]
+    for name in sorted(modules, key=lambda name: (
+            -durations.get(name, default), name)):
+        least = min(bins, key=lambda item: item[0])
+        least[0] += durations.get(name, default)
+        least[1].append(name)
+    return [names for _, names in bins if names]
+
+
+def import_path(root, slug, cachedir):
+    r"""Return the directories test workers need on ``sys.path``: the
+    project *root*, its ``src`` and a directory in which ``src`` can be
+    imported as package *slug*."""
+
+    paths = [root, os.path.join(root, 'src')]
+    if slug:
+        link = os.path.join(cachedir, 'path', root_key(root), slug)
+        try:
+            if os.path.realpath(link) != os.path.realpath(paths[1]):
+                if not os.path.isdir(os.path.dirname(link)):
+                    os.makedirs(os.path.dirname(link))
+                if os.path.lexists(link):
+                    os.unlink(link)
+                os.symlink(paths[1], link)
+            paths.append(os.path.dirname(link))
+        except (OSError, NotImplementedError) as exc:
+            LOG.debug('unable to link %s: %s', link, exc)
+    return paths
+
+
+def run_worker(python, root, paths, modules):
+    r"""Run *modules* in one worker process and return their results. A
+    worker that dies reports an error for each of its modules."""
+
+    fdesc, results = tempfile.mkstemp(suffix='.json')
+    os.close(fdesc)
+    try:
+        proc = subprocess.Popen(
+            [python, WORKER, results, os.pathsep.join(paths)] + modules,
+            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        out = proc.communicate()[0].decode('utf-8', 'replace')
+        try:
+            with open(results) as fin:
+                return json.load(fin)
+        except (IOError, ValueError):
+            return [{'module': name, 'tests': 0, 'failures': 0, 'errors': 1,
+                     'skipped': 0, 'ok': False, 'duration': 0.0,
+                     'output': 'worker exited with status %d\n%s' %
+                               (proc.returncode, out)}
+                    for name in modules]
+    finally:
+        os.unlink(results)
+
+
+def test_modules(root, names=None):
+    r"""Return the test modules *names* (module names or files, default
+    ``tests/test_*.py``) as a dictionary mapping each module name to its file
+    relative to project *root*."""
+
+    if not names:
+        names = sorted(glob.glob(os.path.join(root, 'tests', 'test_*.py')))
+
+    modules = {}
+    for name in names:
+        if name.endswith('.py') or os.path.sep in name:
+            rel = os.path.relpath(os.path.abspath(name), root)
+            name = os.path.splitext(rel)[0].replace(os.path.sep, '.')
+        else:
+            rel = name.replace('.', os.path.sep) + '.py'
+        modules[name] = rel
+    return modules
+
+
+def interpreter(python):
+    r"""Return the full path of interpreter *python*, a path or a name
+    looked up in ``PATH`` (``python``, as ``make ptests`` passes it)."""
+
+    fname = shutil.which(python)
+    if fname is None:
+        raise RuntimeError('no interpreter %s' % python)
+    return os.path.abspath(fname)
+
+
+def run_tests(root, slug, names=None, python=None, jobs=None, cache=None,
+              use_cache=True):
+    r"""Run the test modules *names* (see :py:func:`test_modules`) of the
+    project in *root*, whose package is *slug*, with interpreter *python*
+    in up to *jobs* worker processes, skipping modules whose passing result
+    is in *cache* (a :py:class:`pyjig.lint.ResultCache`). Returns the list
+    of module results, in module order, each with ``cached`` set if it was
+    not run."""
+
+    # pylint: disable=too-many-arguments,too-many-locals
+
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    cache = cache or ResultCache(default_cachedir())
+    python = interpreter(python or sys.executable)
+    jobs = jobs or os.cpu_count() or 1
+
+    tests = test_modules(root, names)
+    local = local_modules(root, slug)
+    keys = dict((name, test_key(cache, python, root, rel, local))
+                for name, rel in tests.items())
+
+    results = {}
+    for name in tests:
+        result = cache.load(keys[name]) if use_cache else None
+        if result is not None:
+            result['cached'] = True
+            results[name] = result
+
+    todo = sorted(name for name in tests if name not in results)
+    if todo:
+        durations = cache.load('durations-' + root_key(root)) or {}
+        paths = import_path(root, slug, cache.root)
+        bins = balance(todo, durations, jobs)
+        with concurrent.futures.ThreadPoolExecutor(len(bins)) as pool:
+            for batch in pool.map(lambda names: run_worker(
+                    python, root, paths, names), bins):
+                for result in batch:
+                    result['cached'] = False
+                    results[result['module']] = result
+                    durations[result['module']] = result['duration']
+                    if result['ok']:
+                        cache.save(keys[result['module']], result)
+        cache.save('durations-' + root_key(root), durations)
+
+    return [results[name] for name in sorted(tests)]
+
+
+def test(argv=None):
+    r"""``pyjig test``: run the project's test modules in parallel,
+    skipping those unchanged since they last passed. Returns -1 if any test
+    failed."""
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig test',
+        description='Run test modules in parallel, skipping those unchanged '
+                    'since they last passed.')
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=None, metavar='N',
+        help='Run N worker processes (default one per CPU).')
+    parser.add_argument(
+        '--python',
+        default=sys.executable, metavar='EXE',
+        help='Interpreter to run the tests with (default %(default)s).')
+    parser.add_argument(
+        '--no-cache',
+        dest='cache', action='store_false', default=True,
+        help='Run every module, refreshing the cache.')
+    parser.add_argument(
+        'modules',
+        nargs='*',
+        help='Test modules or files to run (default tests/test_*.py).')
+    args = parser.parse_args(argv)
+
+    root = metadata.find_root()
+    start = time.time()
+    try:
+        slug = metadata.load(root).project_slug if root else None
+        results = run_tests(root or os.getcwd(), slug, args.modules,
+                            args.python, args.jobs, use_cache=args.cache)
+    except (RuntimeError, IOError, OSError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    for result in results:
+        status = 'cached' if result['cached'] else \
+            'ok' if result['ok'] else 'FAILED'
+        LOG.info('%-40s %-7s %4d tests %8.2fs', result['module'], status,
+                 result['tests'], result['duration'])
+    failed = [result for result in results if not result['ok']]
+    for result in failed:
+        sys.stdout.write('\n%s\n%s\n%s' % ('=' * 70, result['module'],
+                                           result['output']))
+    sys.stdout.flush()
+
+    LOG.info('>>> %d modules, %d tests, %d cached, %d failed, in %.2fs',
+             len(results), sum(result['tests'] for result in results),
+             len([result for result in results if result['cached']]),
+             len(failed), time.time() - start)
+    return -1 if failed else 0
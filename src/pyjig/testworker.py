@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testworker` - Test runner worker
+#########################################
+
+.. module:: pyjig.testworker
+   :synopsis: Run test modules in a worker process for pyjig test
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Worker process of :py:mod:`pyjig.testrun`. It is run by path with the
+project's interpreter, so it depends on nothing but the standard library::
+
+   python testworker.py RESULTS PATH MODULE [MODULE ...]
+
+Each test *MODULE* is loaded with :py:mod:`unittest` and run in turn, with
+the directories in *PATH* (``os.pathsep`` separated) first on ``sys.path``.
+A JSON list with the counts, duration and output of each module is written to
+file *RESULTS*.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import io
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+
+def run_module(name):
+    r"""Run the tests of module *name* and return a dictionary of the
+    results."""
+
+    stream = io.StringIO()
+    start = time.time()
+    try:
+        suite = unittest.defaultTestLoader.loadTestsFromName(name)
+        result = unittest.TextTestRunner(stream=stream, verbosity=1).run(suite)
+        counts = {
+            'tests': result.testsRun,
+            'failures': len(result.failures),
+            'errors': len(result.errors),
+            'skipped': len(result.skipped),
+            'ok': result.wasSuccessful(),
+            }
+    except Exception:  # pylint: disable=broad-except
+        stream.write(traceback.format_exc())
+        counts = {'tests': 0, 'failures': 0, 'errors': 1, 'skipped': 0,
+                  'ok': False}
+
+    counts.update({'module': name, 'duration': time.time() - start,
+                   'output': stream.getvalue()})
+    return counts
+
+
+def main(argv=None):
+    r"""main process driver"""
+
+    argv = sys.argv[1:] if argv is None else argv
+    results, paths, modules = argv[0], argv[1], argv[2:]
+    sys.path[:0] = [pth for pth in paths.split(os.pathsep) if pth]
+
+    with open(results, 'w') as fout:
+        json.dump([run_module(name) for name in modules], fout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
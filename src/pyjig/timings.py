@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`timings` - Phase timers
+###############################
+
+.. module:: pyjig.timings
+   :synopsis: Per-phase wall time, CPU time and subprocess counts
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Pyjig's work is divided into named phases (template checkout and parsing,
+prompting, rendering, writing, git and toolchain checks). Each phase is
+wrapped with :py:func:`phase` or :py:func:`timed`; while timing is enabled
+(``pyjig --timings``) every phase records
+
+   * the number of times it ran,
+   * wall time,
+   * CPU time of the pyjig process and of the subprocesses it waited for, and
+   * the number of subprocesses it started.
+
+Phases nest, and each is reported under its parent (``create_project/
+git_init``), with the times of a phase including those of its children.
+:py:func:`report` prints the totals as a table or writes them as JSON.
+
+While timing is disabled a phase costs a single flag test.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import collections
+import contextlib
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from pyjig import trace
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+ENABLED = False
+
+# Totals keyed by phase path: [calls, wall, cpu, child cpu, subprocesses]
+
+PHASES = collections.OrderedDict()
+LOCK = threading.Lock()
+LOCAL = threading.local()
+
+# Subprocesses started since timing was enabled, and when that was
+
+SPAWNED = [0]
+STARTED = [None]
+
+
+def audit(event, _):
+    r"""Audit hook counting the subprocesses started while timing is
+    enabled."""
+
+    if event == 'subprocess.Popen' and ENABLED:
+        with LOCK:
+            SPAWNED[0] += 1
+
+
+def enable():
+    r"""Start timing phases."""
+
+    global ENABLED  # pylint: disable=global-statement
+
+    if STARTED[0] is None and hasattr(sys, 'addaudithook'):
+        sys.addaudithook(audit)
+    STARTED[0] = time.time()
+    ENABLED = True
+
+
+def reset():
+    r"""Stop timing and discard the totals recorded."""
+
+    global ENABLED  # pylint: disable=global-statement
+
+    ENABLED = False
+    with LOCK:
+        PHASES.clear()
+        SPAWNED[0] = 0
+
+
+def snapshot():
+    r"""Return the current (wall, cpu, child cpu, subprocesses) counters."""
+
+    times = os.times()
+    return (time.time(), time.process_time(),
+            times.children_user + times.children_system, SPAWNED[0])
+
+
+@contextlib.contextmanager
+def phase(name):
+    r"""Context manager timing the enclosed block as phase *name*, which is
+    also recorded as a :py:mod:`pyjig.trace` span."""
+
+    with trace.span(name):
+        if not ENABLED:
+            yield
+            return
+
+        stack = LOCAL.__dict__.setdefault('stack', [])
+        stack.append(name)
+        path = '/'.join(stack)
+        with LOCK:
+            totals = PHASES.setdefault(path, [0, 0.0, 0.0, 0.0, 0])
+
+        start = snapshot()
+        try:
+            yield
+        finally:
+            stack.pop()
+            end = snapshot()
+            with LOCK:
+                totals[0] += 1
+                for num in range(4):
+                    totals[num + 1] += end[num] - start[num]
+
+
+def timed(name):
+    r"""Decorator timing every call of the decorated function as phase
+    *name*."""
+
+    def decorator(func):
+        r"""Wrap *func*."""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            r"""Call *func* inside :py:func:`phase`."""
+            if not (ENABLED or trace.ENABLED):
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def results():
+    r"""Return the recorded phases as a list of dictionaries, each followed
+    by its children."""
+
+    with LOCK:
+        items = [(path, list(totals)) for path, totals in PHASES.items()]
+
+    # Order children after their parents, keeping the order phases first
+    # started in
+
+    order = dict((path, num) for num, (path, _) in enumerate(items))
+
+    def key(item):
+        r"""Sort key: first-seen order of the phase and its ancestors."""
+        parts = item[0].split('/')
+        return [order.get('/'.join(parts[:num + 1]), 0)
+                for num in range(len(parts))]
+
+    return [{'phase': path, 'calls': totals[0], 'wall': totals[1],
+             'cpu': totals[2], 'child_cpu': totals[3],
+             'subprocesses': totals[4]}
+            for path, totals in sorted(items, key=key)]
+
+
+def report(dest='-'):
+    r"""Report the recorded phases, as a table on the log if *dest* is
+    ``-`` or else as JSON written to file *dest*."""
+
+    phases = results()
+    total = time.time() - STARTED[0] if STARTED[0] else 0.0
+
+    if dest != '-':
+        with open(dest, 'w') as fout:
+            json.dump({'wall': total, 'subprocesses': SPAWNED[0],
+                       'phases': phases}, fout, indent=1)
+        return
+
+    LOG.info('%-36s %5s %9s %9s %9s %5s', 'phase', 'calls', 'wall', 'cpu',
+             'children', 'procs')
+    for item in phases:
+        depth = item['phase'].count('/')
+        name = '  ' * depth + item['phase'].rsplit('/', 1)[-1]
+        LOG.info('%-36s %5d %8.3fs %8.3fs %8.3fs %5d', name, item['calls'],
+                 item['wall'], item['cpu'], item['child_cpu'],
+                 item['subprocesses'])
+    LOG.info('%-36s %5s %8.3fs %9s %9s %5d', 'total', '', total, '', '',
+             SPAWNED[0])
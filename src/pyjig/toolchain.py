@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`toolchain` - Toolchain validation
+##########################################
+
+.. module:: pyjig.toolchain
+   :synopsis: Locate the executables pyjig projects depend on
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+Pyjig projects depend on an ecosystem of tools (git, make, pylint, flake8,
+nose and sphinx). Each pyjig operation only checks for the tools it actually
+needs (see :py:func:`required`), and the locations found are remembered in
+``~/.pyjig/toolchain.json`` (or ``$PYJIG_TOOLCHAIN``).
+
+The cache is keyed on the value of ``PATH``. It remains valid while the
+modification time of every ``PATH`` directory (which changes whenever an
+executable is added or removed) and of every tool found is unchanged, so a
+warm check costs one ``stat()`` per ``PATH`` entry rather than one per entry
+per tool.
+
+``pyjig doctor`` reports the location and version of every tool, probing the
+versions in parallel.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+# Tools needed by the projects pyjig creates
+
+PROJECT_TOOLS = ('flake8', 'make', 'nosetests', 'pylint', 'sphinx-build')
+
+
+def default_cachefile():
+    r"""Return the toolchain cache file, ``$PYJIG_TOOLCHAIN`` or
+    ``~/.pyjig/toolchain.json``."""
+
+    return os.environ.get('PYJIG_TOOLCHAIN') or \
+        os.path.join(os.path.expanduser('~'), '.pyjig', 'toolchain.json')
+
+
+def inpath(exe):
+    r"""Search path for executable *exe* and return fully qualified pathname of
+    first matching executable or None of no match was found."""
+
+    sep = ':'
+
+    if os.name == 'nt':
+        exe = exe + '.exe' if not exe.endswith('.exe') else exe
+        sep = ';'
+
+    for pth in os.environ['PATH'].split(sep):
+        fname = os.path.join(pth, exe)
+        if os.path.isfile(fname):
+            return fname
+
+    return None
+
+
+def required(create=False, git=True):
+    r"""Return the tools needed by an operation. *create* is ``True`` when a
+    new project is being created, *git* when new files will be committed or
+    staged."""
+
+    tools = []
+    if git:
+        tools.append('git')
+    if create:
+        tools.extend(PROJECT_TOOLS)
+    return tuple(tools)
+
+
+def mtime(path):
+    r"""Return the modification time of *path*, or ``None`` if missing."""
+
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def path_state():
+    r"""Return the current ``PATH`` and the mtime of each of its
+    directories."""
+
+    path = os.environ.get('PATH', '')
+    return path, dict((pth, mtime(pth)) for pth in path.split(os.pathsep) if pth)
+
+
+def load_cache(cachefile):
+    r"""Return the tools recorded in *cachefile* if the cache is still valid
+    for the current ``PATH``, otherwise an empty dictionary."""
+
+    try:
+        with open(cachefile) as fin:
+            cache = json.load(fin)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    path, dirs = path_state()
+    if cache.get('path') != path or cache.get('dirs') != dirs:
+        return {}
+
+    tools = {}
+    for exe, (fname, when) in cache.get('tools', {}).items():
+        if mtime(fname) == when:
+            tools[exe] = fname
+    return tools
+
+
+def save_cache(cachefile, tools):
+    r"""Record the *tools* found (``{exe: path}``) in *cachefile*."""
+
+    path, dirs = path_state()
+    cache = {
+        'path': path,
+        'dirs': dirs,
+        'tools': dict((exe, (fname, mtime(fname)))
+                      for exe, fname in tools.items()),
+        }
+
+    cdir = os.path.dirname(cachefile)
+    try:
+        if not os.path.isdir(cdir):
+            os.makedirs(cdir)
+        fdesc, tmpfn = tempfile.mkstemp(dir=cdir)
+        with os.fdopen(fdesc, 'w') as fout:
+            json.dump(cache, fout)
+        os.rename(tmpfn, cachefile)
+    except (IOError, OSError) as exc:
+        LOG.debug('unable to save toolchain cache: %s', exc)
+
+
+def find(tools, cachefile=None):
+    r"""Return a dictionary mapping each executable in *tools* to its full
+    path, or ``None`` if it is not in ``PATH``. Results are cached in
+    *cachefile* (see :py:func:`default_cachefile`)."""
+
+    cachefile = cachefile or default_cachefile()
+
+    cached = load_cache(cachefile)
+    found = dict((exe, cached.get(exe)) for exe in tools)
+
+    missing = [exe for exe, fname in found.items() if not fname]
+    if missing:
+        for exe in missing:
+            found[exe] = inpath(exe)
+        cached.update((exe, fname) for exe, fname in found.items() if fname)
+        save_cache(cachefile, cached)
+
+    return found
+
+
+def validate(tools, cachefile=None):
+    r"""Raise :py:exc:`RuntimeError` if any executable in *tools* is
+    missing."""
+
+    for exe, fname in sorted(find(tools, cachefile).items()):
+        if not fname:
+            raise RuntimeError("missing required componet %s" % exe)
+
+
+def version(fname):
+    r"""Return the first line of ``fname --version``."""
+
+    try:
+        out = subprocess.check_output([fname, '--version'],
+                                      stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        return 'error: %s' % exc
+    lines = out.decode('utf-8', 'replace').strip().splitlines()
+    return lines[0] if lines else ''
+
+
+def doctor(argv=None):
+    r"""``pyjig doctor``: report the location and version of every tool
+    pyjig and its projects use. Returns -1 if any tool is missing."""
+
+    import concurrent.futures  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig doctor',
+        description='Report the toolchain used by pyjig projects.')
+    parser.parse_args(argv)
+
+    tools = required(create=True)
+    found = find(tools)
+
+    with concurrent.futures.ThreadPoolExecutor(len(tools)) as pool:
+        versions = dict(zip(tools, pool.map(
+            lambda exe: version(found[exe]) if found[exe] else None, tools)))
+
+    for exe in sorted(tools):
+        LOG.info('%-14s %-40s %s', exe, found[exe] or 'MISSING',
+                 versions[exe] or '')
+
+    return -1 if not all(found.values()) else 0
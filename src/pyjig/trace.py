@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`trace` - Trace spans
+#############################
+
+.. module:: pyjig.trace
+   :synopsis: Record nested trace spans as Chrome trace-event JSON
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+While tracing is enabled (``pyjig --trace FILE``, or :py:func:`enable` when
+pyjig is used as a library) every operation and sub-step is recorded as a
+span: each :py:mod:`pyjig.timings` phase, template clones, fetches and
+checkouts, prompting, rendering of each file, writing, template hooks and git
+commands. Every subprocess started is recorded as an instant event carrying
+its command line.
+
+Spans are written in the `Chrome trace-event format
+<https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAIpU>`_
+(complete ``X`` events, timestamps in microseconds since the epoch), which
+``chrome://tracing``, Perfetto and most trace tools load directly, and which
+is simple to merge into other traces. Nothing leaves the machine; the trace
+is only written to a local file.
+
+While tracing is disabled :py:func:`span` returns a shared do-nothing
+context manager, so instrumented code pays for one flag test.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+ENABLED = False
+
+# Events recorded since tracing was enabled
+
+EVENTS = []
+LOCK = threading.Lock()
+HOOKED = [False]
+
+NULL = contextlib.nullcontext()
+
+
+def now():
+    r"""Return the current time in microseconds since the epoch."""
+
+    return time.time_ns() // 1000
+
+
+def audit(event, args):
+    r"""Audit hook recording each subprocess started while tracing."""
+
+    if event == 'subprocess.Popen' and ENABLED:
+        argv = args[1]
+        if isinstance(argv, (list, tuple)):
+            argv = ' '.join(str(arg) for arg in argv)
+        instant('subprocess', argv=str(argv))
+
+
+def enable():
+    r"""Start recording spans."""
+
+    global ENABLED  # pylint: disable=global-statement
+
+    if not HOOKED[0] and hasattr(sys, 'addaudithook'):
+        sys.addaudithook(audit)
+        HOOKED[0] = True
+    ENABLED = True
+
+
+def reset():
+    r"""Stop recording and discard the events recorded."""
+
+    global ENABLED  # pylint: disable=global-statement
+
+    ENABLED = False
+    with LOCK:
+        del EVENTS[:]
+
+
+class Span:
+    r"""Context manager recording the enclosed block as span *name* with
+    arguments *args*."""
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, exc_type, exc, _):
+        event = {'name': self.name, 'cat': 'pyjig', 'ph': 'X',
+                 'ts': self.start, 'dur': now() - self.start,
+                 'pid': os.getpid(), 'tid': threading.get_ident()}
+        if exc_type is not None:
+            self.args['error'] = '%s: %s' % (exc_type.__name__, exc)
+        if self.args:
+            event['args'] = self.args
+        with LOCK:
+            EVENTS.append(event)
+        return False
+
+
+def span(name, **args):
+    r"""Return a context manager recording the enclosed block as span
+    *name*, with keyword *args* attached to it."""
+
+    if not ENABLED:
+        return NULL
+    return Span(name, args)
+
+
+def instant(name, **args):
+    r"""Record instant event *name* with keyword *args*."""
+
+    if not ENABLED:
+        return
+    event = {'name': name, 'cat': 'pyjig', 'ph': 'i', 's': 't', 'ts': now(),
+             'pid': os.getpid(), 'tid': threading.get_ident()}
+    if args:
+        event['args'] = args
+    with LOCK:
+        EVENTS.append(event)
+
+
+def events():
+    r"""Return the events recorded, with a process name record first."""
+
+    with LOCK:
+        recorded = list(EVENTS)
+    return [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+             'args': {'name': 'pyjig'}}] + recorded
+
+
+def write(fname):
+    r"""Write the events recorded to *fname* as a Chrome trace-event JSON
+    object."""
+
+    with open(fname, 'w') as fout:
+        json.dump({'traceEvents': events(), 'displayTimeUnit': 'ms'}, fout)
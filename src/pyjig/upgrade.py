@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`upgrade` - Template upgrades
+#####################################
+
+.. module:: pyjig.upgrade
+   :synopsis: Bring existing projects up to date with their template
+.. moduleauthor:: Jim Carroll <jim@carroll.net>
+
+When pyjig creates a project it records, in ``pyjig.json`` next to
+``id.txt``, the template and commit it was generated from, the answers used
+to render it, and for every generated file a hash of its template source and
+a hash of the content generated.
+
+``pyjig upgrade`` compares that manifest with the current template. Only the
+files whose template source changed are re-rendered, and each is then brought
+up to date:
+
+   * a file the user never modified is replaced by the new rendering,
+   * a modified file gets a three-way merge (``git merge-file``) of the
+     user's version with the old and new renderings; conflicts are left
+     marked in the file, and
+   * a file the user deleted is left deleted.
+
+Files the template added are created if missing; files it dropped are left
+alone. Files whose template did not change are never touched, whatever the
+user did to them. The Makefile recipes pyjig provides (``pyjig.mk``, see
+:py:func:`pyjig.pyjig.install_fragment`), and the extension build command of
+projects that have one (``pyjig_build.py``, see
+:py:func:`pyjig.pyjig.install_build`), are brought up to date too. The
+upgraded files and manifest are staged in git unless ``-x`` is given.
+
+``id.txt`` is left out of the manifest: it holds the project's settings,
+which an upgrade keeps whatever the template says, and one still written as
+a python literal is rewritten as JSON (see :py:mod:`pyjig.metadata`).
+
+Projects created before pyjig recorded manifests can be upgraded with
+``--base REV``, naming the template revision they were generated from.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import argparse
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+from pyjig import git, metadata, pyjig
+from pyjig.toolchain import required, validate
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+LOG = logging.getLogger('pyjig')
+
+MANIFEST = 'pyjig.json'
+
+# Template used for each project type
+
+TEMPLATES = {'app': 'pyapp', 'pkg': 'pypkg'}
+
+
+def digest(data):
+    r"""Return the hex SHA-1 of bytes *data*."""
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def posix(path):
+    r"""Return relative *path* with ``/`` separators, as used in the
+    manifest."""
+
+    return path.replace(os.path.sep, '/')
+
+
+def source_hashes(template):
+    r"""Return the hash of each source file of *template*, keyed by its path
+    within the template. Renaming a source changes its hash."""
+
+    hashes = {}
+    for rel, _, _, _ in template.files:
+        hashes[rel] = digest(rel.encode('utf-8') + b'\0' + template.read(rel))
+    return hashes
+
+
+def commit(template):
+    r"""Return the template commit *template* was checked out at, see
+    :py:attr:`pyjig.engine.Template.rev`."""
+
+    return template.rev
+
+
+def answers(context):
+    r"""Return the answers in render *context* worth keeping."""
+
+    return dict((key, val) for key, val in context['cookiecutter'].items()
+                if key != '_template')
+
+
+def outputs(template, context):
+    r"""Return the ``(path, source)`` of the files *template* generates with
+    *context* that upgrades track: every one but ``id.txt``, the project's
+    settings, which pyjig rewrites itself (see :py:mod:`pyjig.metadata`)."""
+
+    return [(posix(out), rel) for out, rel in template.outputs(context)
+            if posix(out) != metadata.IDFILE]
+
+
+def build(pdir, name, template, context, contents=None):
+    r"""Return the manifest of project *pdir*, generated from template
+    *name* (loaded as *template*) with *context*. *contents* maps generated
+    paths (``/`` separated) to the content generated; by default files are read from
+    *pdir*."""
+
+    hashes = source_hashes(template)
+    files = {}
+    for out, rel in outputs(template, context):
+        if contents is not None:
+            data = contents.get(out)
+        else:
+            try:
+                with open(os.path.join(pdir, out), 'rb') as fin:
+                    data = fin.read()
+            except IOError:
+                data = None
+        if data is not None:
+            files[out] = {'template': hashes[rel], 'content': digest(data)}
+
+    return {'template': name, 'commit': commit(template),
+            'context': answers(context), 'files': files}
+
+
+def save(pdir, manifest):
+    r"""Write *manifest* to project *pdir*, unless it is unchanged. Returns
+    the manifest's path."""
+
+    fname = os.path.join(pdir, MANIFEST)
+    text = json.dumps(manifest, indent=1, sort_keys=True) + '\n'
+    pyjig.write_changed(fname, text.encode('utf-8'))
+    return fname
+
+
+def load(pdir):
+    r"""Return the manifest of project *pdir*, or ``None`` if it has none."""
+
+    try:
+        with open(os.path.join(pdir, MANIFEST)) as fin:
+            return json.load(fin)
+    except IOError:
+        return None
+    except ValueError:
+        raise RuntimeError('unable to parse %s' % os.path.join(pdir, MANIFEST))
+
+
+def record(pdir, name, template, context):
+    r"""Record the manifest of project *pdir*, just generated from template
+    *name*. Returns the manifest's path."""
+
+    return save(pdir, build(pdir, name, template, context))
+
+
+def merge(ours, base, theirs):
+    r"""Three-way merge of bytes *ours* and *theirs* from their common
+    *base*. Returns a tuple of the merged bytes and the number of
+    conflicts."""
+
+    tmpd = tempfile.mkdtemp()
+    try:
+        names = []
+        for label, data in (('ours', ours), ('base', base),
+                            ('theirs', theirs)):
+            names.append(os.path.join(tmpd, label))
+            with open(names[-1], 'wb') as fout:
+                fout.write(data)
+        proc = subprocess.Popen(
+            ['git', 'merge-file', '-p', '-L', 'yours', '-L', 'old template',
+             '-L', 'new template'] + names, stdout=subprocess.PIPE)
+        out = proc.communicate()[0]
+    finally:
+        for fname in os.listdir(tmpd):
+            os.unlink(os.path.join(tmpd, fname))
+        os.rmdir(tmpd)
+
+    if proc.returncode < 0 or proc.returncode > 127:
+        raise RuntimeError('git merge-file failed')
+    return out, proc.returncode
+
+
+def plan(pdir, manifest, template):
+    r"""Compare *manifest* of project *pdir* with the current *template*.
+    Returns a tuple of the render context and the list of ``(path, source,
+    recorded)`` files to upgrade, where *recorded* is the file's manifest
+    entry (``None`` for files the template added)."""
+
+    context = {'cookiecutter': dict(manifest['context'])}
+    context['cookiecutter']['_template'] = template.path
+
+    hashes = source_hashes(template)
+    changes = []
+    for path, rel in outputs(template, context):
+        recorded = manifest['files'].get(path)
+        if recorded is None or recorded['template'] != hashes[rel]:
+            changes.append((path, rel, recorded))
+    return context, changes
+
+
+def apply_upgrade(pdir, manifest, old, new, dry_run=False):
+    r"""Upgrade project *pdir*, whose *manifest* records generation from
+    template *old*, to template *new* (both loaded templates). Returns a
+    tuple of the new manifest and a list of ``(path, action)`` tuples, where
+    *action* is one of ``added``, ``updated``, ``merged``, ``conflict`` or
+    ``deleted``."""
+
+    # pylint: disable=too-many-locals
+
+    context, changes = plan(pdir, manifest, new)
+    theirs_all = dict((posix(out), data) for out, data, _ in new.render(
+        context, set(rel for _, rel, _ in changes))[1])
+    modes = dict((rel, mode) for rel, _, _, mode in new.files)
+
+    # The old renderings are the merge base of modified files
+
+    old_context = {'cookiecutter': dict(manifest['context'])}
+    old_context['cookiecutter']['_template'] = old.path
+    old_sources = dict((posix(out), rel)
+                       for out, rel in old.outputs(old_context))
+    wanted = set(old_sources[path] for path, _, recorded in changes
+                 if recorded and path in old_sources)
+    bases = dict((posix(out), data) for out, data, _ in
+                 old.render(old_context, wanted)[1])
+
+    actions = []
+    for path, rel, recorded in changes:
+        theirs = theirs_all[path]
+        tgt = os.path.join(pdir, path)
+        try:
+            with open(tgt, 'rb') as fin:
+                ours = fin.read()
+        except IOError:
+            ours = None
+
+        if ours is None:
+            if recorded:
+                actions.append((path, 'deleted'))
+                continue
+            action, data = 'added', theirs
+        elif recorded is None or ours == theirs:
+            continue
+        elif digest(ours) == recorded['content']:
+            action, data = 'updated', theirs
+        else:
+            data, conflicts = merge(ours, bases.get(path, b''), theirs)
+            if data == ours:
+                continue
+            action = 'conflict' if conflicts else 'merged'
+
+        actions.append((path, action))
+        if not dry_run:
+            parent = os.path.dirname(tgt)
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            with open(tgt, 'wb') as fout:
+                fout.write(data)
+            if action == 'added':
+                os.chmod(tgt, modes[rel] & 0o7777)
+
+    # Record what the new template generates rather than the merged
+    # results, so user changes are still recognized next time
+
+    hashes = source_hashes(new)
+    files = {}
+    for path, rel in outputs(new, context):
+        if path in theirs_all:
+            files[path] = {'template': hashes[rel],
+                           'content': digest(theirs_all[path])}
+        else:
+            files[path] = manifest['files'][path]
+
+    result = {'template': manifest['template'], 'commit': commit(new),
+              'context': manifest['context'], 'files': files}
+    return result, actions
+
+
+def baseline(pdir, name, rev):
+    r"""Return a manifest for project *pdir*, created without one from
+    revision *rev* of template *name*. The project's ``id.txt`` supplies the
+    answers and the files are assumed to be as that revision generated
+    them, modified or not."""
+
+    template = pyjig.load_template(name, rev)
+    context = {'cookiecutter': dict(metadata.load(pdir).context)}
+    context['cookiecutter']['_template'] = template.path
+    contents = dict((posix(out), data) for out, data, _ in
+                    template.render(context)[1] if data is not None)
+    return build(pdir, name, template, context, contents)
+
+
+def upgrade(argv=None):
+    r"""``pyjig upgrade``: bring the project containing the current directory
+    up to date with its template. Returns -1 on error or if any file was left
+    with merge conflicts."""
+
+    # pylint: disable=too-many-return-statements
+
+    parser = argparse.ArgumentParser(
+        prog='pyjig upgrade',
+        description='Bring a project up to date with its template.')
+    parser.add_argument(
+        '-n', '--dry-run',
+        action='store_true', default=False,
+        help='Report what would change without changing anything.')
+    parser.add_argument(
+        '-x', '--excludegit',
+        action='store_true', default=False,
+        help='Do not stage the upgraded files in git.')
+    parser.add_argument(
+        '--rev',
+        help='Upgrade to template revision REV (default latest or pinned).')
+    parser.add_argument(
+        '--base', metavar='REV',
+        help='Template revision a project without %s was created from.'
+        % MANIFEST)
+    parser.add_argument(
+        '--offline',
+        action='store_true', default=False,
+        help='Use cached templates only, never access the network.')
+    parser.add_argument(
+        '--remote',
+        action='store_true', default=False,
+        help='Use the template repos (gh:...) rather than the templates '
+             'embedded in pyjig.')
+    args = parser.parse_args(argv)
+
+    pdir = metadata.find_root()
+    if not pdir:
+        LOG.error('>>> Not in a pyjig project.')
+        return -1
+
+    stage = not (args.excludegit or args.dry_run) and git.find_git_dir(pdir)
+    try:
+        validate(required())
+        if pyjig.CACHE is None:
+            pyjig.CACHE = pyjig.TemplateCache(offline=args.offline,
+                                              remote=args.remote)
+
+        manifest = load(pdir)
+        if manifest is None:
+            if not args.base:
+                LOG.error('>>> %s has no %s, give the template revision it '
+                          'was created from with --base', pdir, MANIFEST)
+                return -1
+            name = TEMPLATES[metadata.load(pdir).project_type]
+            manifest = baseline(pdir, name, args.base)
+
+        old = pyjig.load_template(manifest['template'], manifest['commit'])
+        new = pyjig.load_template(manifest['template'], args.rev)
+        result, actions = apply_upgrade(pdir, manifest, old, new,
+                                        args.dry_run)
+    except (RuntimeError, KeyError, subprocess.CalledProcessError) as exc:
+        LOG.error('>>> %s', exc)
+        return -1
+
+    for path, action in actions:
+        LOG.info('>>> %-8s %s', action, path)
+    if not actions:
+        LOG.info('>>> %s is up to date with %s@%s', pdir,
+                 manifest['template'], result['commit'][:10])
+
+    if not args.dry_run:
+        written = [os.path.join(pdir, path) for path, action in actions
+                   if action != 'deleted']
+        for fname in pyjig.install_fragment(pdir) + \
+                pyjig.install_build(pdir, create=False):
+            LOG.info('>>> %-8s %s', 'updated', os.path.relpath(fname, pdir))
+            written.append(fname)
+        if metadata.migrate(pdir):
+            written.append(os.path.join(pdir, metadata.IDFILE))
+        written.append(save(pdir, result))
+        if stage:
+            git.stage(pdir, written)
+
+    conflicts = [path for path, action in actions if action == 'conflict']
+    if conflicts:
+        LOG.error('>>> Resolve the conflicts in %s', ', '.join(conflicts))
+        return -1
+    return 0
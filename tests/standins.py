@@ -0,0 +1,100 @@
+r"""Local stand-ins for the pyjig template repos.
+
+``tests/templates`` holds small copies of the four ``cookiecutter-*``
+templates so unittests can run without reaching github."""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from pyjig import pyjig
+from pyjig.cache import TemplateCache
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'templates')
+
+# Pyjig's per-user state, kept in each test's temp dir rather than ~/.pyjig,
+# and settings of the user running the tests that would change the results
+
+STATE = (('PYJIG_STORE', 'store'), ('PYJIG_TOOLCHAIN', 'toolchain.json'),
+         ('PYJIG_LINT_CACHE', 'lint'), ('PYJIG_TEST_CACHE', 'testcache'),
+         ('PYJIG_DOCS_CACHE', 'docs'))
+UNSET = ('PYJIG_BUNDLES', 'PYJIG_SOCKET', 'PYJIG_STORE_HARDLINK')
+
+
+def git(repo, *args):
+    r"""Run git *args* in *repo* and return its output."""
+
+    return subprocess.check_output(('git', '-C', repo) + args)
+
+
+def template_repos(dest):
+    r"""Create a git repo in *dest* for each stand-in template and return a
+    dictionary of ``file://`` urls suitable for :py:class:`TemplateCache`."""
+
+    urls = {}
+    for name in ('pyapp', 'pypkg', 'pysource', 'pyext'):
+        repo = os.path.join(dest, 'cookiecutter-' + name)
+        shutil.copytree(os.path.join(TEMPLATES, 'cookiecutter-' + name), repo)
+        git(repo, 'init', '-q')
+        git(repo, 'add', '.')
+        git(repo, '-c', 'user.name=pyjig', '-c', 'user.email=pyjig@localhost',
+            'commit', '-q', '-m', 'Initial check in.')
+        urls[name] = 'file://' + repo
+    return urls
+
+
+def isolate(dest):
+    r"""Point pyjig's per-user state at directory *dest* and drop the
+    :py:data:`UNSET` settings. Returns the environment to :py:func:`restore`
+    afterwards."""
+
+    saved = dict((var, os.environ.get(var))
+                 for var in [var for var, _ in STATE] + list(UNSET))
+    for var, fname in STATE:
+        os.environ[var] = os.path.join(dest, fname)
+    for var in UNSET:
+        os.environ.pop(var, None)
+    return saved
+
+
+def restore(saved):
+    r"""Restore the environment *saved* by :py:func:`isolate`."""
+
+    for var, value in saved.items():
+        if value is None:
+            os.environ.pop(var, None)
+        else:
+            os.environ[var] = value
+
+
+def template_cache(dest, **kwargs):
+    r"""Return a :py:class:`TemplateCache` in *dest* serving the stand-in
+    templates, never the bundles embedded in pyjig."""
+
+    kwargs.setdefault('bundles', ())
+    return TemplateCache(os.path.join(dest, 'cache'),
+                         urls=template_repos(dest), **kwargs)
+
+
+class Standins:
+    r"""Mixin for test cases using the stand-in templates. ``setUp`` creates
+    the temp dir ``self.tmpd``, makes ``pyjig.CACHE`` a
+    :py:func:`template_cache` in it and :py:func:`isolate`\ s pyjig's state
+    in it; ``tearDown`` restores both and removes the temp dir. Test cases extending either call this one's
+    first (``setUp``) or last (``tearDown``)."""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir and point pyjig at the stand-in templates"""
+        self.tmpd = tempfile.mkdtemp()
+        self.environ = isolate(self.tmpd)
+        self.saved = pyjig.CACHE
+        pyjig.CACHE = template_cache(self.tmpd)
+
+    def tearDown(self):
+        r"""restore pyjig's template cache and remove the temp dir"""
+        pyjig.CACHE = self.saved
+        restore(self.environ)
+        shutil.rmtree(self.tmpd, ignore_errors=True)
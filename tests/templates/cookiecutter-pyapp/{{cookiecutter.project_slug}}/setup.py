@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+r"""{{ cookiecutter.project_name }} distutils
+
+{{ cookiecutter.copyright }}"""
+import glob
+import os
+
+from setuptools import setup
+
+setup(
+    name = '{{ cookiecutter.project_slug }}',
+    version = '{{ cookiecutter.release }}',
+    package_dir = {'': 'src'},
+    py_modules = [os.path.splitext(os.path.basename(p))[0]
+                  for p in glob.glob('src/*.py') if not p.endswith('__init__.py')],
+    test_suite = 'tests',
+    description = '{{ cookiecutter.project_short_description }}',
+    author = '{{ cookiecutter.author }}',
+    author_email = '{{ cookiecutter.email }}',
+    )
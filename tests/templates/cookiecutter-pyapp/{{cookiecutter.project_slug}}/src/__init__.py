@@ -0,0 +1 @@
+r"""{{ cookiecutter.project_name }} - {{ cookiecutter.project_short_description }}"""
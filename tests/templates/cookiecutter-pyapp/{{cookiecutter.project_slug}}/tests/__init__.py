@@ -0,0 +1,6 @@
+r"""Unittest initialization for {{ cookiecutter.project_name }}"""
+import os
+import sys
+PTH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+if PTH not in sys.path:
+    sys.path.insert(0, PTH)
@@ -0,0 +1,14 @@
+#!/usr/bin/env {{ cookiecutter.python }}
+# vim: set fileencoding=utf-8
+r"""Unittests for {{ cookiecutter.module }} extension"""
+import unittest
+
+MODULE = '{{ cookiecutter.module }}'
+
+
+class ModuleTest(unittest.TestCase):
+    r"""{{ cookiecutter.module }} unittest test case"""
+
+    def test_module(self):
+        r"""module is named"""
+        self.assertTrue(MODULE)
@@ -0,0 +1,30 @@
+/*
+This module needs to be manually added to your setup.py. Consider
+adding the following lines:
+
+    from setuptools import Extension
+
+    module = Extension('{{ cookiecutter.project }}.{{ cookiecutter.module }}',
+                sources = ['src/{{ cookiecutter.module }}_module.cpp'],
+                )
+
+    setup(...
+        ext_modules = [ module ],
+        )
+*/
+#include <Python.h>
+
+static PyMethodDef {{ cookiecutter.module }}_methods[] = {
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef {{ cookiecutter.module }}_def = {
+    PyModuleDef_HEAD_INIT, "{{ cookiecutter.module }}",
+    "{{ cookiecutter.module_short_description }}", -1,
+    {{ cookiecutter.module }}_methods
+};
+
+PyMODINIT_FUNC PyInit_{{ cookiecutter.module }}(void)
+{
+    return PyModule_Create(&{{ cookiecutter.module }}_def);
+}
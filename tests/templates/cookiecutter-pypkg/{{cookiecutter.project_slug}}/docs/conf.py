@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+r"""Sphinx configuration for {{ cookiecutter.project_name }}"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+extensions = ['sphinx.ext.autodoc', 'sphinx.ext.viewcode']
+source_suffix = '.rst'
+master_doc = 'index'
+project = u'{{ cookiecutter.project_name }}'
+copyright = u'{{ cookiecutter.copyright }}'
+author = u'{{ cookiecutter.author }}'
+version = '{{ cookiecutter.version }}'
+release = '{{ cookiecutter.release }}'
+exclude_patterns = ['_build']
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# vim: set fileencoding=utf-8
+r"""{{ cookiecutter.project_name }} distutils
+
+{{ cookiecutter.copyright }}"""
+from setuptools import setup
+
+setup(
+    name = '{{ cookiecutter.project_slug }}',
+    version = '{{ cookiecutter.release }}',
+    packages = ['{{ cookiecutter.project_slug }}'],
+    package_dir = {'{{ cookiecutter.project_slug }}': 'src'},
+    test_suite = 'tests',
+    description = '{{ cookiecutter.project_short_description }}',
+    author = '{{ cookiecutter.author }}',
+    author_email = '{{ cookiecutter.email }}',
+    )
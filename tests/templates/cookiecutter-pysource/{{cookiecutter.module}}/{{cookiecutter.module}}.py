@@ -0,0 +1,18 @@
+#!/usr/bin/env {{ cookiecutter.python }}
+# vim: set fileencoding=utf-8
+r""":mod:`{{ cookiecutter.module }}` - {{ cookiecutter.module_short_description }}
+
+.. module:: {{ cookiecutter.module }}
+   :synopsis: {{ cookiecutter.module_short_description }}
+.. moduleauthor:: {{ cookiecutter.author }} <{{ cookiecutter.email }}>
+
+..
+   {{ cookiecutter.copyright }}"""
+import logging
+
+__version__ = '{{ cookiecutter.release }}'
+__author__ = '{{ cookiecutter.author }}'
+__email__ = '{{ cookiecutter.email }}'
+__copyright__ = '{{ cookiecutter.copyright }}'
+
+LOG = logging.getLogger('{{ cookiecutter.module }}')
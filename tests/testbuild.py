@@ -0,0 +1,187 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testbuild` - unittests for extension builds
+####################################################
+
+.. module:: testbuild
+   :synopsis: unittests for pyjig.pyjig.register_extensions and pyjig.pyjig_build
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for wiring extension modules into ``setup.py`` and building them
+with the ``build_ext`` command pyjig installs.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import glob
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+from pyjig import pyjig
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testbuild')
+
+SETUP = '''\
+from setuptools import setup
+
+setup(
+    name = 'mypkg',
+    ext_modules = [
+        Extension('mypkg.old', sources = ['src/old.c']),
+        ],
+    )
+'''
+
+SETUP_INLINE = '''\
+from setuptools import setup
+
+setup(
+    name = 'mypkg',
+    ext_modules=[Extension('mypkg.old', sources = ['src/old.c'])],
+    )
+'''
+
+
+class Testbuild(Standins, unittest.TestCase):
+    r"""extension build unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir holding a package project"""
+        Standins.setUp(self)
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'mypkg'])
+        self.proj = pyjig.Pyjig(args, cwd=self.tmpd)
+        self.proj.create_project(no_input=True)
+
+    def add(self, *modules):
+        r"""add extension *modules* to the project"""
+        args = pyjig.init_parser().parse_args(['-x', '--ext'] + list(modules))
+        pyjig.Pyjig(args, cwd=self.proj.pdir).add_project_extension(
+            no_input=True)
+
+    def test_register(self):
+        r"""new extensions are added to setup.py, once"""
+
+        self.add('e1', 'e1.cpp', 'e2', 'e1')
+        setup = os.path.join(self.proj.pdir, 'setup.py')
+        with open(setup) as fin:
+            text = fin.read()
+        compile(text, setup, 'exec')
+        for module in ('e1', 'e2'):
+            self.assertEqual(text.count(
+                "Extension('mypkg.%s', sources = ['src/%s_module.cpp']),"
+                % (module, module)), 1)
+        self.assertEqual(text.count("cmdclass = {'build_ext': BuildExt}"), 1)
+        self.assertTrue(os.path.isfile(
+            os.path.join(self.proj.pdir, pyjig.BUILD_FRAGMENT)))
+
+        self.add('e1')
+        self.assertEqual(pyjig.register_extensions(
+            self.proj.pdir, 'mypkg', [('e2', 'src/e2_module.cpp')]), [])
+        with open(setup) as fin:
+            self.assertEqual(fin.read(), text)
+
+        # Existing ext_modules lists are extended in place
+
+        with open(setup, 'w') as fout:
+            fout.write(SETUP)
+        pyjig.register_extensions(self.proj.pdir, 'mypkg',
+                                  [('e3', 'src/e3.c')])
+        with open(setup) as fin:
+            lines = fin.read().splitlines()
+        self.assertEqual(lines[0], 'from setuptools import setup')
+        self.assertEqual(lines[1], 'from setuptools import Extension')
+        self.assertEqual(lines.count('    ext_modules = ['), 1)
+        self.assertIn("        Extension('mypkg.e3', sources = ['src/e3.c']),",
+                      lines)
+        self.assertEqual(pyjig.register_extensions(
+            self.proj.pdir, 'mypkg', [('old', 'src/old_module.cpp')]), [])
+
+        # BuildExt joins an existing cmdclass dictionary, or the developer is
+        # asked to add it
+
+        cmdclass = "    cmdclass = {'sdist': Sdist},\n    )\n"
+        with open(setup, 'w') as fout:
+            fout.write(SETUP.replace('    )\n', cmdclass))
+        pyjig.register_extensions(self.proj.pdir, 'mypkg',
+                                  [('e3', 'src/e3.c')])
+        with open(setup) as fin:
+            text = fin.read()
+        compile(text, setup, 'exec')
+        self.assertIn("    cmdclass = {'build_ext': BuildExt, 'sdist': Sdist},",
+                      text)
+        self.assertIn('    from pyjig_build import BuildExt', text)
+
+        cmdclass = '    cmdclass = versioneer.get_cmdclass(),\n    )\n'
+        with open(setup, 'w') as fout:
+            fout.write(SETUP.replace('    )\n', cmdclass))
+        with self.assertLogs('pyjig', logging.WARNING) as logs:
+            pyjig.register_extensions(self.proj.pdir, 'mypkg',
+                                      [('e3', 'src/e3.c')])
+        self.assertIn('to the cmdclass of', logs.output[0])
+        with open(setup) as fin:
+            text = fin.read()
+        self.assertIn("Extension('mypkg.e3', sources = ['src/e3.c'])", text)
+        self.assertNotIn('BuildExt', text)
+
+        # Any other ext_modules is left for the developer to extend
+
+        for text in (SETUP_INLINE,
+                     SETUP.replace('ext_modules = [', 'ext_modules = EXTS + [')):
+            with open(setup, 'w') as fout:
+                fout.write(text)
+            compile(text, setup, 'exec')
+            self.assertEqual(pyjig.register_extensions(
+                self.proj.pdir, 'mypkg', [('e4', 'src/e4.c')]), [])
+            with open(setup) as fin:
+                self.assertEqual(fin.read(), text)
+
+    def test_build(self):
+        r"""extensions are compiled through the compiler launcher"""
+
+        if not shutil.which('cc'):
+            self.skipTest('no C compiler')
+
+        self.add('e1', 'e2')
+
+        # A launcher recording each compile, standing in for ccache
+
+        log = os.path.join(self.tmpd, 'launched')
+        launcher = os.path.join(self.tmpd, 'launcher')
+        with open(launcher, 'w') as fout:
+            fout.write('#!/bin/sh\necho "$@" >> %s\nexec "$@"\n' % log)
+        os.chmod(launcher, 0o755)
+
+        env = dict(os.environ, PYJIG_CCACHE=launcher, PYJIG_BUILD_JOBS='2')
+        subprocess.check_call(
+            [sys.executable, 'setup.py', '-q', 'build_ext', '--inplace'],
+            cwd=self.proj.pdir, env=env, stdout=subprocess.DEVNULL)
+
+        for module in ('e1', 'e2'):
+            self.assertTrue(glob.glob(os.path.join(
+                self.proj.pdir, 'src', module + '.*.so')), module)
+        with open(log) as fin:
+            self.assertEqual(len(fin.read().splitlines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
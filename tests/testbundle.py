@@ -0,0 +1,135 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testbundle` - unittests for pyjig.bundle
+#################################################
+
+.. module:: testbundle
+   :synopsis: unittests for pyjig.bundle
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for building, verifying and rendering from template bundles.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import unittest
+
+from pyjig import bundle, engine, pyjig
+from pyjig.cache import TemplateCache
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testbundle')
+
+
+class Testbundle(Standins, unittest.TestCase):
+    r"""pyjig.bundle unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir and bundles of the stand-in templates"""
+        Standins.setUp(self)
+        self.cache = pyjig.CACHE
+        self.bdir = os.path.join(self.tmpd, 'bundles')
+        for name in bundle.NAMES:
+            rev = self.cache.resolve(name)
+            bundle.build(self.cache.checkout(name, rev),
+                         os.path.join(self.bdir, name + bundle.SUFFIX),
+                         name, rev)
+
+    def test_render(self):
+        r"""a bundle renders exactly as its template checkout does"""
+
+        for name in ('pysource', 'pyext', 'pypkg'):
+            checkout = engine.Template(self.cache.checkout(name))
+            packed = engine.Template(
+                os.path.join(self.bdir, name + bundle.SUFFIX))
+            self.assertEqual(packed.rev, checkout.rev)
+            self.assertEqual(packed.files, checkout.files)
+            self.assertEqual(packed.dirs, checkout.dirs)
+
+            context = checkout.context({'module': 'm1', 'project_name': 'p1'},
+                                       no_input=True)
+            self.assertEqual(packed.render(context), checkout.render(context))
+
+    def test_project(self):
+        r"""projects and modules are created from bundles without git"""
+
+        saved = pyjig.CACHE
+        pyjig.CACHE = TemplateCache(
+            os.path.join(self.tmpd, 'empty'), bundles=[self.bdir],
+            urls=dict((name, 'file:///nonexistent') for name in bundle.NAMES))
+        try:
+            args = pyjig.init_parser().parse_args(['-x', '--pkg', 'packed'])
+            proj = pyjig.Pyjig(args, cwd=self.tmpd)
+            proj.create_project(no_input=True)
+            tgtdir = os.path.join(proj.pdir, 'src')
+            pyjig.add_pysources(['s1'], tgtdir, no_input=True,
+                                extra={'project_type': 'pkg'})
+            pyjig.add_pyextensions(['e1'], tgtdir, no_input=True,
+                                   extra={'project_type': 'pkg'})
+        finally:
+            pyjig.CACHE = saved
+
+        for fname in ('src/s1.py', 'tests/test_s1.py', 'docs/e1.rst',
+                      'src/e1_module.cpp', 'setup.py'):
+            self.assertTrue(os.path.isfile(os.path.join(proj.pdir, fname)),
+                            fname)
+        with open(os.path.join(proj.pdir, 'pyjig.json')) as fin:
+            self.assertEqual(json.load(fin)['commit'],
+                             self.cache.resolve('pypkg'))
+
+    def test_embedded(self):
+        r"""embedded bundles are used by default, the repos on request"""
+
+        urls = dict((name, 'file:///nonexistent') for name in bundle.NAMES)
+        root = os.path.join(self.tmpd, 'empty')
+
+        saved = bundle.EMBEDDED
+        bundle.EMBEDDED = os.path.join(self.tmpd, 'embedded')
+        try:
+            self.assertEqual(len(bundle.embed(bundle.EMBEDDED, self.cache)), 4)
+            tdir = TemplateCache(root, urls=urls).checkout('pysource')
+            self.assertEqual(os.path.dirname(tdir), bundle.EMBEDDED)
+            self.assertRaises(RuntimeError, TemplateCache(
+                root, urls=urls, remote=True).checkout, 'pysource')
+        finally:
+            bundle.EMBEDDED = saved
+
+    def test_corrupt(self):
+        r"""bundles are verified against their hashes"""
+
+        fname = os.path.join(self.bdir, 'pysource' + bundle.SUFFIX)
+        bundle.Bundle(fname).verify()
+
+        with open(fname, 'rb') as fin:
+            data = bytearray(fin.read())
+        data[-1] ^= 0xff
+        with open(fname, 'wb') as fout:
+            fout.write(data)
+        self.assertRaises(RuntimeError, bundle.Bundle(fname).verify)
+
+        data[bundle.HEADER.size + 2] ^= 0xff
+        with open(fname, 'wb') as fout:
+            fout.write(data)
+        self.assertRaises(RuntimeError, bundle.Bundle, fname)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testcache` - unittests for pyjig.cache
+###############################################
+
+.. module:: testcache
+   :synopsis: unittests for pyjig.cache
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the template cache, served from a local git repo.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from pyjig import cache
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testcache')
+
+
+def commit(repo, fname, text):
+    r"""Write *text* to *fname* in *repo*, commit and return the commit id"""
+
+    with open(os.path.join(repo, fname), 'wt') as fout:
+        fout.write(text)
+
+    def run(*args):
+        return subprocess.check_output(('git', '-C', repo) + args)
+
+    run('add', '.')
+    run('-c', 'user.name=pyjig', '-c', 'user.email=pyjig@localhost',
+        'commit', '-q', '-m', text)
+    return run('rev-parse', 'HEAD').decode('utf-8').strip()
+
+
+class Testcache(unittest.TestCase):
+    r"""pyjig.cache unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create a template repo and an empty cache"""
+        self.tmpd = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmpd, 'cookiecutter-pysource')
+        os.mkdir(self.repo)
+        subprocess.check_call(['git', 'init', '-q', self.repo])
+        self.rev1 = commit(self.repo, 'cookiecutter.json', '{"v": "1"}')
+        self.urls = {'pysource': 'file://' + self.repo}
+        self.root = os.path.join(self.tmpd, 'cache')
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def read(self, tdir):
+        r"""return the template's cookiecutter.json"""
+        return open(os.path.join(tdir, 'cookiecutter.json')).read()
+
+    def test_parse_pins(self):
+        r"""test parse_pins()"""
+        self.assertEqual(cache.parse_pins(['pyext=v1.0', 'pyapp=abc']),
+                         {'pyext': 'v1.0', 'pyapp': 'abc'})
+        self.assertRaises(ValueError, cache.parse_pins, ['pyext'])
+
+    def test_checkout(self):
+        r"""checkouts are keyed by commit and re-used"""
+
+        tcache = cache.TemplateCache(self.root, urls=self.urls)
+        tdir = tcache.checkout('pysource')
+        self.assertEqual(os.path.basename(tdir), self.rev1)
+        self.assertEqual(self.read(tdir), '{"v": "1"}')
+        self.assertEqual(tcache.checkout('pysource'), tdir)
+
+    def test_offline(self):
+        r"""offline mode never needs the remote"""
+
+        tcache = cache.TemplateCache(self.root, offline=True, urls=self.urls)
+        self.assertRaises(RuntimeError, tcache.checkout, 'pysource')
+
+        cache.TemplateCache(self.root, urls=self.urls).checkout('pysource')
+        shutil.rmtree(self.repo)
+
+        tdir = tcache.checkout('pysource')
+        self.assertEqual(self.read(tdir), '{"v": "1"}')
+
+        pinned = cache.TemplateCache(self.root, pins={'pysource': self.rev1},
+                                     urls=self.urls)
+        self.assertEqual(pinned.checkout('pysource'), tdir)
+
+    def test_unreachable(self):
+        r"""git failures reaching the remote are reported as errors"""
+
+        tcache = cache.TemplateCache(self.root, urls=self.urls)
+        tcache.checkout('pysource')
+        shutil.rmtree(self.repo)
+        self.assertRaisesRegex(RuntimeError, 'unable to fetch template',
+                               tcache.resolve, 'pysource', 'nosuch')
+
+        tcache = cache.TemplateCache(os.path.join(self.tmpd, 'empty'),
+                                     urls=self.urls)
+        self.assertRaisesRegex(RuntimeError, 'unable to fetch template',
+                               tcache.checkout, 'pysource')
+
+    def test_pin_and_refresh(self):
+        r"""pinned revisions stay put, refresh picks up new commits"""
+
+        cache.TemplateCache(self.root, urls=self.urls).checkout('pysource')
+        rev2 = commit(self.repo, 'cookiecutter.json', '{"v": "2"}')
+
+        # Still fresh, so the new commit is not seen
+
+        tdir = cache.TemplateCache(self.root, urls=self.urls).checkout('pysource')
+        self.assertEqual(self.read(tdir), '{"v": "1"}')
+
+        tcache = cache.TemplateCache(self.root, refresh=True, urls=self.urls)
+        tdir = tcache.checkout('pysource')
+        self.assertEqual(os.path.basename(tdir), rev2)
+        self.assertEqual(self.read(tdir), '{"v": "2"}')
+
+        tcache = cache.TemplateCache(self.root, pins={'pysource': self.rev1[:10]},
+                                     urls=self.urls)
+        tdir = tcache.checkout('pysource')
+        self.assertEqual(os.path.basename(tdir), self.rev1)
+
+    def test_hex_branch(self):
+        r"""branches named like commit ids are still refreshed"""
+
+        subprocess.check_call(['git', '-C', self.repo, 'branch', 'deadbeef'])
+        tcache = cache.TemplateCache(self.root, urls=self.urls)
+        self.assertEqual(tcache.resolve('pysource', 'deadbeef'), self.rev1)
+
+        subprocess.check_call(['git', '-C', self.repo, 'checkout', '-q',
+                               'deadbeef'])
+        rev2 = commit(self.repo, 'cookiecutter.json', '{"v": "2"}')
+        self.assertFalse(tcache.is_commit('pysource', 'deadbeef'))
+        self.assertTrue(tcache.is_commit('pysource', self.rev1[:10]))
+
+        tcache = cache.TemplateCache(self.root, refresh=True, urls=self.urls)
+        self.assertEqual(tcache.resolve('pysource', 'deadbeef'), rev2)
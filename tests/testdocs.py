@@ -0,0 +1,120 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testdocs` - unittests for pyjig.docs
+#############################################
+
+.. module:: testdocs
+   :synopsis: unittests for pyjig.docs
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the documents ``pyjig docs`` finds affected by changes.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyjig import docs
+from pyjig.lint import ResultCache
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testdocs')
+
+FILES = {
+    'docs/conf.py': "project = 'demo'\n",
+    'docs/index.rst': '.. toctree::\n\n   a\n   b\n',
+    'docs/a.rst': '.. automodule:: demo.a\n   :members:\n',
+    'docs/b.rst': '.. autoclass:: b.Parser\n',
+    'src/a.py': 'LOG = None\n',
+    'src/b.py': 'class Parser:\n    pass\n',
+    'src/c.py': 'UNDOCUMENTED = True\n',
+    }
+
+
+class Testdocs(unittest.TestCase):
+    r"""pyjig.docs unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir holding a project's documentation sources"""
+        self.tmpd = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpd, 'demo')
+        for fname, text in FILES.items():
+            self.write(fname, text)
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def write(self, fname, text):
+        r"""write project file *fname*"""
+        fname = os.path.join(self.root, fname)
+        if not os.path.isdir(os.path.dirname(fname)):
+            os.makedirs(os.path.dirname(fname))
+        with open(fname, 'w') as fout:
+            fout.write(text)
+
+    def test_affected(self):
+        r"""documents are affected by their source and documented modules"""
+
+        old = docs.source_hashes(self.root)
+        self.assertEqual(sorted(old), sorted(FILES))
+        self.assertEqual(docs.affected(self.root, 'demo', {}, old)[1],
+                         ['docs/a.rst', 'docs/b.rst', 'docs/index.rst'])
+
+        self.write('src/a.py', 'LOG = 1\n')
+        self.write('src/b.py', 'class Parser:\n    x = 1\n')
+        changed, affected = docs.affected(
+            self.root, 'demo', old, docs.source_hashes(self.root))
+        self.assertEqual(changed, ['src/a.py', 'src/b.py'])
+        self.assertEqual(affected, ['docs/a.rst', 'docs/b.rst'])
+
+        self.write('src/c.py', 'UNDOCUMENTED = False\n')
+        self.write('docs/d.rst', 'New\n===\n')
+        new = docs.source_hashes(self.root)
+        self.assertEqual(docs.affected(self.root, 'demo', old, new)[1],
+                         ['docs/a.rst', 'docs/b.rst', 'docs/d.rst'])
+
+        self.write('docs/conf.py', "project = 'renamed'\n")
+        new = docs.source_hashes(self.root)
+        self.assertEqual(len(docs.affected(self.root, 'demo', old, new)[1]),
+                         4)
+
+    def test_uptodate(self):
+        r"""sphinx is not run when no document is affected"""
+
+        cache = ResultCache(os.path.join(self.tmpd, 'cache'))
+        cache.save(cache.key('docs', self.root, 'html'),
+                   docs.source_hashes(self.root))
+        self.write('docs/_build/html/index.html', '<html/>\n')
+
+        self.assertIsNone(docs.build_docs(self.root, 'demo', cache=cache))
+        self.write('src/c.py', 'UNDOCUMENTED = False\n')
+        self.assertIsNone(docs.build_docs(self.root, 'demo', cache=cache))
+
+        argv = docs.sphinx_command('sphinx-build', 'html', '/cache/demo',
+                                   'docs/_build/html', 4, fresh=True)
+        self.assertEqual(argv[argv.index('-d') + 1], '/cache/demo')
+        self.assertEqual(argv[argv.index('-j') + 1], '4')
+        self.assertIn('-E', argv)
+
+
+if __name__ == '__main__':
+    unittest.main()
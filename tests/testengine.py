@@ -0,0 +1,248 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testengine` - unittests for pyjig.engine
+#################################################
+
+.. module:: testengine
+   :synopsis: unittests for pyjig.engine
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the template engine and batch source generation, using the
+stand-in templates in ``tests/templates``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import subprocess
+import threading
+import unittest
+
+from pyjig import engine, pyjig
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testengine')
+
+
+class Testengine(Standins, unittest.TestCase):
+    r"""pyjig.engine unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def test_render(self):
+        r"""render pysource template in memory"""
+
+        template = engine.load(pyjig.template_dir('pysource'))
+        self.assertIs(template, engine.load(template.path))
+
+        context = template.context({'module': 'spam'}, no_input=True)
+        project, entries = template.render(context)
+        self.assertEqual(project, 'spam')
+
+        files = dict((path, data) for path, data, _ in entries)
+        self.assertEqual(sorted(files), ['spam.py', 'spam.rst', 'test_spam.py'])
+        self.assertIn(b'.. automodule:: spam', files['spam.rst'])
+
+    def test_add_pysources(self):
+        r"""add many sources to a project with one template load"""
+
+        for sub in ('src', 'docs', 'tests'):
+            os.mkdir(os.path.join(self.tmpd, sub))
+        src = os.path.join(self.tmpd, 'src')
+
+        modules = ['s%d' % i for i in range(20)]
+        pyjig.add_pysources(modules, src, no_input=True,
+                            extra={'project_type': 'pkg'})
+
+        for module in modules:
+            self.assertTrue(os.path.isfile(os.path.join(src, module + '.py')))
+            self.assertTrue(os.path.isfile(
+                os.path.join(self.tmpd, 'docs', module + '.rst')))
+            self.assertTrue(os.path.isfile(
+                os.path.join(self.tmpd, 'tests', 'test_' + module + '.py')))
+
+        # Existing targets are left alone
+
+        with open(os.path.join(src, 's0.py'), 'w') as fout:
+            fout.write('# mine\n')
+        pyjig.add_pysources(['s0'], src, no_input=True)
+        self.assertEqual(open(os.path.join(src, 's0.py')).read(), '# mine\n')
+
+        # and a re-run does no template work
+
+        saved, pyjig.CACHE = pyjig.CACHE, None
+        try:
+            self.assertEqual(pyjig.add_pysources(modules, src), [])
+        finally:
+            pyjig.CACHE = saved
+
+    def test_write_changed(self):
+        r"""identical content is not rewritten"""
+
+        tgt = os.path.join(self.tmpd, 'f.txt')
+        self.assertTrue(pyjig.write_changed(tgt, b'one\n'))
+        os.utime(tgt, (0, 0))
+        self.assertFalse(pyjig.write_changed(tgt, b'one\n'))
+        self.assertEqual(os.stat(tgt).st_mtime, 0)
+        self.assertTrue(pyjig.write_changed(tgt, b'two\n'))
+
+    def test_add_pysources_jobs(self):
+        r"""parallel generation matches serial generation"""
+
+        serial = os.path.join(self.tmpd, 'serial')
+        parallel = os.path.join(self.tmpd, 'parallel')
+        os.mkdir(serial)
+        os.mkdir(parallel)
+
+        modules = ['s%d' % i for i in range(8)] + ['s1.py', 's2']
+        pyjig.add_pysources(modules, serial, no_input=True)
+        pyjig.add_pysources(modules, parallel, no_input=True, jobs=4)
+
+        self.assertEqual(sorted(os.listdir(serial)), sorted(os.listdir(parallel)))
+        for fname in os.listdir(serial):
+            self.assertEqual(open(os.path.join(serial, fname)).read(),
+                             open(os.path.join(parallel, fname)).read())
+
+    def test_add_pyextensions(self):
+        r"""add extensions outside of a project"""
+
+        pyjig.add_pyextensions(['e1', 'e2.cpp'], self.tmpd, no_input=True)
+        self.assertIn('e1_module.cpp', os.listdir(self.tmpd))
+        self.assertIn('e2_module.cpp', os.listdir(self.tmpd))
+        self.assertNotIn('e1.rst', os.listdir(self.tmpd))
+
+    def test_threads(self):
+        r"""concurrent projects from threads, without changing directory"""
+
+        parser = pyjig.init_parser()
+        errors = []
+
+        def build(num):
+            r"""create a project and add sources to it"""
+            try:
+                proj = pyjig.Pyjig(parser.parse_args(['-x', '--pkg', 'p%d' % num]),
+                                   cwd=self.tmpd)
+                proj.create_project(no_input=True)
+                proj = pyjig.Pyjig(parser.parse_args(['-x', 'a', 'b']),
+                                   cwd=os.path.join(proj.pdir, 'docs'))
+                proj.add_project_sourcefile(no_input=True)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        def nochdir(path):
+            r"""fail on any attempt to change directory"""
+            raise AssertionError('chdir(%s)' % path)
+
+        chdir, os.chdir = os.chdir, nochdir
+        try:
+            threads = [threading.Thread(target=build, args=(num,))
+                       for num in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            os.chdir = chdir
+
+        self.assertEqual(errors, [])
+        for num in range(8):
+            pdir = os.path.join(self.tmpd, 'p%d' % num)
+            self.assertTrue(os.path.isfile(os.path.join(pdir, 'id.txt')))
+            self.assertTrue(os.path.isfile(os.path.join(pdir, 'src', 'a.py')))
+            self.assertTrue(os.path.isfile(
+                os.path.join(pdir, 'tests', 'test_b.py')))
+
+    def test_plan(self):
+        r"""plan a run without rendering or writing anything"""
+
+        parser = pyjig.init_parser()
+        proj = pyjig.Pyjig(parser.parse_args(['--pkg', 'planned', 'a']),
+                           cwd=self.tmpd)
+        entries = proj.plan()
+        self.assertFalse(os.path.exists(proj.pdir))
+        paths = [os.path.relpath(path, proj.pdir) for _, path, _ in entries]
+        for path in ('id.txt', 'pyjig.json', os.path.join('src', 'a.py'),
+                     os.path.join('docs', 'a.rst')):
+            self.assertIn(path, paths)
+        self.assertEqual(set(action for _, _, action in entries), {'create'})
+
+        proj = pyjig.Pyjig(parser.parse_args(['-x', '--pkg', 'planned']),
+                           cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        with open(os.path.join(proj.pdir, 'docs', 'a.rst'), 'w') as fout:
+            fout.write('mine\n')
+        with open(os.path.join(proj.pdir, 'src', 'b.py'), 'w') as fout:
+            fout.write('mine\n')
+
+        # --plan takes no file, sources after it are not mistaken for one
+
+        args = parser.parse_args(['--plan', 'a', 'b'])
+        self.assertEqual((args.plan, args.plan_file, args.source),
+                         (True, None, ['a', 'b']))
+
+        src = os.path.join(proj.pdir, 'src')
+        fname = os.path.join(self.tmpd, 'plan.json')
+        args = parser.parse_args(['--plan-file', fname, 'a', 'b'])
+        self.assertEqual(pyjig.execute(args, src), 0)
+        self.assertFalse(os.path.exists(os.path.join(src, 'a.py')))
+        with open(fname) as fin:
+            plan = json.load(fin)
+
+        actions = dict((os.path.relpath(item['path'], proj.pdir),
+                        item['action']) for item in plan['files'])
+        self.assertEqual(actions, {
+            os.path.join('src', 'a.py'): 'create',
+            os.path.join('docs', 'a.rst'): 'conflict',
+            os.path.join('tests', 'test_a.py'): 'create',
+            os.path.join('src', 'b.py'): 'skip'})
+        self.assertEqual(plan['counts'],
+                         {'create': 2, 'modify': 0, 'skip': 1, 'conflict': 1})
+
+        # New extensions are also built by the project
+
+        proj = pyjig.Pyjig(parser.parse_args(['--plan', '--ext', 'x1', 'x1']),
+                           cwd=src)
+        actions = dict((os.path.relpath(path, proj.pdir), action)
+                       for _, path, action in proj.plan())
+        self.assertEqual(actions['setup.py'], 'modify')
+        self.assertEqual(actions[pyjig.BUILD_FRAGMENT], 'create')
+        self.assertFalse(os.path.exists(os.path.join(proj.pdir,
+                                                     pyjig.BUILD_FRAGMENT)))
+
+    def test_stage(self):
+        r"""only the files pyjig writes are staged"""
+
+        parser = pyjig.init_parser()
+        proj = pyjig.Pyjig(parser.parse_args(['--pkg', 'staged']), cwd=self.tmpd)
+        proj.create_project(no_input=True)
+
+        with open(os.path.join(proj.pdir, 'notes.txt'), 'w') as fout:
+            fout.write('unrelated\n')
+
+        proj = pyjig.Pyjig(parser.parse_args(['a', 'b']),
+                           cwd=os.path.join(proj.pdir, 'src'))
+        proj.add_project_sourcefile(no_input=True)
+
+        staged = subprocess.check_output(
+            ['git', 'diff', '--cached', '--name-only'], cwd=proj.pdir)
+
+        # The stand-in id.txt is a legacy literal, left for pyjig upgrade
+
+        self.assertEqual(staged.decode('utf-8').split(),
+                         ['docs/a.rst', 'docs/b.rst', 'src/a.py',
+                          'src/b.py', 'tests/test_a.py', 'tests/test_b.py'])
@@ -0,0 +1,151 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testgit` - unittests for pyjig.git
+###########################################
+
+.. module:: testgit
+   :synopsis: unittests for pyjig.git
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the initial commit fast path, checked against what ``git add``
+and ``git commit`` would have done.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from pyjig import git
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testgit')
+
+GITIGNORE = '''\
+/src/*.py
+build/
+'''
+
+
+class Testgit(unittest.TestCase):
+    r"""pyjig.git unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir holding a project, with its own user config"""
+        self.tmpd = tempfile.mkdtemp()
+        self.sdir = os.path.join(self.tmpd, 'proj')
+        self.saved = os.environ.get('XDG_CONFIG_HOME')
+        os.environ['XDG_CONFIG_HOME'] = os.path.join(self.tmpd, 'config')
+
+        for fname in ('.gitignore', 'src/a.py', 'src/sub/b.py', 'build/c.o',
+                      'run.sh', 'x.log'):
+            path = os.path.join(self.sdir, fname)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as fout:
+                fout.write(GITIGNORE if fname == '.gitignore' else fname)
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        if self.saved is None:
+            os.environ.pop('XDG_CONFIG_HOME', None)
+        else:
+            os.environ['XDG_CONFIG_HOME'] = self.saved
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def git(self, *args):
+        r"""return the output of git *args* run in the project"""
+        return subprocess.check_output(('git',) + args, cwd=self.sdir) \
+            .decode('utf-8')
+
+    def test_initial_commit(self):
+        r"""files, modes and ignores match git add"""
+
+        # The user's default excludes file, read without core.excludesfile
+
+        os.makedirs(os.path.join(self.tmpd, 'config', 'git'))
+        with open(os.path.join(self.tmpd, 'config', 'git', 'ignore'),
+                  'w') as fout:
+            fout.write('*.log\n')
+
+        # Only the owner's execute bit makes a file executable
+
+        os.chmod(os.path.join(self.sdir, 'run.sh'), 0o744)
+        os.chmod(os.path.join(self.sdir, '.gitignore'), 0o655)
+
+        self.assertTrue(git.initial_commit(self.sdir))
+        self.assertEqual(self.git('ls-files').split(),
+                         ['.gitignore', 'run.sh', 'src/sub/b.py'])
+        modes = {}
+        for line in self.git('ls-files', '-s').splitlines():
+            info, path = line.split('\t')
+            modes[path] = info.split()[0]
+        self.assertEqual(modes, {'.gitignore': '100644', 'run.sh': '100755',
+                                 'src/sub/b.py': '100644'})
+        self.assertEqual(self.git('status', '--porcelain'), '')
+
+    def test_conversions(self):
+        r"""content conversions are left to git add"""
+
+        with open(os.path.join(self.sdir, '.gitattributes'), 'w') as fout:
+            fout.write('*.sh eol=crlf\n')
+        self.assertFalse(git.initial_commit(self.sdir))
+        self.assertEqual(self.git('ls-files'), '')
+
+        os.remove(os.path.join(self.sdir, '.gitattributes'))
+        self.git('config', 'core.eol', 'crlf')
+        self.assertFalse(git.initial_commit(self.sdir))
+
+        self.git('config', '--unset', 'core.eol')
+        self.assertTrue(git.initial_commit(self.sdir))
+
+    def test_stage(self):
+        r"""paths are staged literally and ignored files skipped"""
+
+        subprocess.check_call(['git', 'init', '-q'], cwd=self.sdir)
+        for fname in ('x*', 'xa'):
+            with open(os.path.join(self.sdir, fname), 'w') as fout:
+                fout.write(fname)
+
+        git.stage(self.sdir, [os.path.join(self.sdir, fname)
+                              for fname in ('x*', 'src/a.py', 'build/c.o')])
+        self.assertEqual(self.git('diff', '--cached', '--name-only').split(),
+                         ['x*'])
+        git.stage(self.sdir, [os.path.join(self.sdir, 'build', 'c.o')])
+
+    def test_hooks(self):
+        r"""commit hooks are left to git commit"""
+
+        hdir = os.path.join(self.tmpd, 'hooks')
+        os.mkdir(hdir)
+        hook = os.path.join(hdir, 'commit-msg')
+        with open(hook, 'w') as fout:
+            fout.write('#!/bin/sh\nexit 1\n')
+        os.chmod(hook, 0o755)
+
+        subprocess.check_call(['git', 'init', '-q'], cwd=self.sdir)
+        self.git('config', 'core.hooksPath', hdir)
+        self.assertFalse(git.initial_commit(self.sdir))
+        self.assertEqual(self.git('ls-files'), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testlint` - unittests for pyjig.lint
+#############################################
+
+.. module:: testlint
+   :synopsis: unittests for pyjig.lint
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the ``pyjig lint`` result cache and Makefile recipes.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import subprocess
+import unittest
+
+from pyjig import lint, pyjig
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testlint')
+
+# Pylint output with pyjig's prefix before the project's message template,
+# and the output reported
+
+# pylint:disable=line-too-long
+PYLINT = '''\
+************* Module src.a
+@pyjig@src/a.py@C@src/a.py:1[C0114(missing-module-docstring), ] Missing module docstring
+@pyjig@src/a.py@W@src/a.py:3[W0612(unused-variable), f] Unused variable 'x'
+************* Module src.b
+@pyjig@src/b.py@E@src/b.py:2[E0602(undefined-variable), ] Undefined variable 'y'
+'''
+REPORTED = '''\
+************* Module src.a
+src/a.py:1[C0114(missing-module-docstring), ] Missing module docstring
+src/a.py:3[W0612(unused-variable), f] Unused variable 'x'
+************* Module src.b
+src/b.py:2[E0602(undefined-variable), ] Undefined variable 'y'
+'''
+# pylint:enable=line-too-long
+
+FLAKE8 = '''\
+src/a.py:3:5: F841 local variable 'x' is assigned to but never used
+tests/test_a.py:1:1: F401 'os' imported but unused
+'''
+
+
+class Testlint(Standins, unittest.TestCase):
+    r"""pyjig.lint unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def test_split(self):
+        r"""batched output is split into per-file results"""
+
+        files = ['src/a.py', 'src/b.py', 'tests/test_a.py']
+        results = lint.split_pylint(PYLINT, files)
+        self.assertEqual(results['src/a.py'][0], 16 | 4)
+        self.assertTrue(results['src/a.py'][1].startswith(
+            '************* Module src.a\n'))
+        self.assertEqual(results['src/b.py'][0], 2)
+        self.assertEqual(results['tests/test_a.py'], [0, ''])
+        self.assertEqual(''.join(results[fname][1] for fname in files),
+                         REPORTED)
+
+        # Messages are formatted with the project's template
+
+        self.assertEqual(lint.msg_template(self.tmpd), lint.MSG_TEMPLATE)
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'lintfmt'])
+        proj = pyjig.Pyjig(args, cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        self.assertEqual(lint.msg_template(proj.pdir),
+                         '{path}:{line}[{msg_id}({symbol}), {obj}] {msg}')
+
+        results = lint.split_flake8(FLAKE8, files)
+        self.assertEqual(results['src/b.py'], [0, ''])
+        self.assertEqual(results['tests/test_a.py'][0], 1)
+        self.assertIn('F841', results['src/a.py'][1])
+
+    def test_cache(self):
+        r"""results are keyed on content, tool version and config"""
+
+        cache = lint.ResultCache(os.path.join(self.tmpd, 'cache'))
+        key = cache.key('pylint', '3.0', 'cfg', 'src/a.py', b'x = 1\n')
+        self.assertIsNone(cache.load(key))
+        cache.save(key, [4, 'warning\n'])
+        self.assertEqual(cache.load(key), [4, 'warning\n'])
+
+        for parts in (('pylint', '3.1', 'cfg', 'src/a.py', b'x = 1\n'),
+                      ('pylint', '3.0', 'new', 'src/a.py', b'x = 1\n'),
+                      ('pylint', '3.0', 'cfg', 'src/a.py', b'x = 2\n'),
+                      ('flake8', '3.0', 'cfg', 'src/a.py', b'x = 1\n')):
+            self.assertNotEqual(cache.key(*parts), key)
+
+        with open(os.path.join(self.tmpd, 'pylint.rc'), 'w') as fout:
+            fout.write('[MASTER]\n')
+        config = lint.config_digest(self.tmpd)
+        with open(os.path.join(self.tmpd, 'setup.cfg'), 'w') as fout:
+            fout.write('[flake8]\n')
+        self.assertNotEqual(lint.config_digest(self.tmpd), config)
+
+    def test_fragment(self):
+        r"""new projects get make lint and batched make comp"""
+
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'linted'])
+        proj = pyjig.Pyjig(args, cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        pyjig.add_pysources(['a', 'b'], os.path.join(proj.pdir, 'src'),
+                            no_input=True, extra={'project_type': 'pkg'})
+
+        self.assertTrue(os.path.isfile(os.path.join(proj.pdir, 'pyjig.mk')))
+        self.assertEqual(pyjig.install_fragment(proj.pdir), [])
+
+        out = subprocess.check_output(['make', '-n', 'lint', 'PYJIG=echo'],
+                                      cwd=proj.pdir)
+        self.assertIn(b'echo lint', out)
+
+        # make comp analyzes stale files in one batch, once under make -j
+
+        make = ['make', '-j4', 'comp', 'PYLINT=echo PYLINT', 'FLAKE=echo FLAKE']
+
+        out = subprocess.check_output(make, cwd=proj.pdir).decode('utf-8')
+        runs = [line.split() for line in out.splitlines()
+                if line.startswith('PYLINT')]
+        self.assertEqual(len(runs), 1)
+        self.assertIn('src/a.py', runs[0])
+        self.assertIn('tests/test_b.py', runs[0])
+
+        stamp = os.stat(os.path.join(proj.pdir, '.comp.pylint')).st_mtime
+        os.utime(os.path.join(proj.pdir, 'src', 'b.py'),
+                 (stamp + 10, stamp + 10))
+        out = subprocess.check_output(make, cwd=proj.pdir).decode('utf-8')
+        self.assertIn('FLAKE src/b.py\n', out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testmanifest` - unittests for pyjig.manifest
+#####################################################
+
+.. module:: testmanifest
+   :synopsis: unittests for pyjig.manifest
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for ``pyjig apply``, using the stand-in templates in
+``tests/templates``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import unittest
+
+from pyjig import manifest, pyjig
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testmanifest')
+
+
+class Testmanifest(Standins, unittest.TestCase):
+    r"""pyjig.manifest unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir and point pyjig at the stand-in templates"""
+        Standins.setUp(self)
+        self.fname = os.path.join(self.tmpd, 'manifest.json')
+
+    def write(self, data):
+        r"""write *data* as the JSON manifest"""
+        with open(self.fname, 'w') as fout:
+            json.dump(data, fout)
+
+    def test_load(self):
+        r"""defaults are applied and bad projects rejected"""
+
+        self.write({'directory': 'out', 'excludegit': True,
+                    'projects': [{'pkg': 'p1'},
+                                 {'app': 'a1', 'excludegit': False}]})
+        outdir, projects = manifest.load(self.fname)
+        self.assertEqual(outdir, os.path.join(self.tmpd, 'out'))
+        self.assertEqual([proj['excludegit'] for proj in projects],
+                         [True, False])
+        self.assertEqual(projects[0]['sources'], [])
+
+        for bad in ({'projects': [{'pkg': 'p1', 'app': 'a1'}]},
+                    {'projects': [{'pkg': 'p1', 'source': ['s1']}]},
+                    {'projects': [{'pkg': 'p1', 'sources': 's1'}]},
+                    {'projects': [{'pkg': 'p1', 'extensions': [1]}]},
+                    {'projects': [{'app': ['a1']}]},
+                    {'projects': ['p1']},
+                    {'directory': 1, 'projects': []},
+                    {'project': []}):
+            self.write(bad)
+            self.assertRaises(RuntimeError, manifest.load, self.fname)
+
+        # Every mistake is reported, not just the first
+
+        self.write({'projects': [{'pkg': 'p1', 'sources': 's1'},
+                                 {'pkg': 'p2'},
+                                 {'app': 'a1', 'excludegit': 'yes'}]})
+        with self.assertRaises(RuntimeError) as ctx:
+            manifest.load(self.fname)
+        self.assertEqual(len(str(ctx.exception).splitlines()), 2)
+        self.assertIn('project 1 sources', str(ctx.exception))
+        self.assertIn('project 3 excludegit', str(ctx.exception))
+
+    def test_apply(self):
+        r"""projects are built concurrently and failures reported"""
+
+        self.write({'directory': 'out', 'excludegit': True, 'projects': [
+            {'pkg': 'p1', 'sources': ['s1', 's2']},
+            {'app': 'a1', 'sources': ['main'], 'extensions': ['e1']},
+            {'pkg': 'p2'},
+            ]})
+
+        results = manifest.apply_manifest(self.fname, jobs=3)
+        self.assertEqual([(name, error) for name, _, error in results],
+                         [('p1', None), ('a1', None), ('p2', None)])
+
+        out = os.path.join(self.tmpd, 'out')
+        self.assertTrue(os.path.isfile(os.path.join(out, 'p1', 'src', 's2.py')))
+        self.assertTrue(os.path.isfile(
+            os.path.join(out, 'a1', 'src', 'e1_module.cpp')))
+
+        # A second run fails for every project, they already exist
+
+        results = manifest.apply_manifest(self.fname, jobs=3)
+        self.assertTrue(all(error for _, _, error in results))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testmetadata` - unittests for pyjig.metadata
+#####################################################
+
+.. module:: testmetadata
+   :synopsis: unittests for pyjig.metadata
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for loading, caching and migrating a project's ``id.txt``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import ast
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyjig import metadata
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testmetadata')
+
+LEGACY = r"""{u'author': u'Jim Carroll',
+ u'project_name': u'My App',
+ u'project_slug': u'My_App',
+ u'project_type': u'app',
+ u'year': u'2015'}
+"""
+
+
+class Testmetadata(unittest.TestCase):
+    r"""pyjig.metadata unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create a project root with a legacy id.txt"""
+        self.tmpd = tempfile.mkdtemp()
+        self.idfn = os.path.join(self.tmpd, 'id.txt')
+        with open(self.idfn, 'w') as fout:
+            fout.write(LEGACY)
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def test_load(self):
+        r"""load legacy id.txt once"""
+
+        meta = metadata.load(self.tmpd)
+        self.assertEqual(meta.project_type, 'app')
+        self.assertEqual(meta.project_slug, 'My_App')
+        self.assertEqual(meta.format, 'literal')
+        self.assertIs(metadata.load(self.tmpd), meta)
+
+        # Changes are picked up
+
+        with open(self.idfn, 'w') as fout:
+            fout.write(LEGACY.replace("u'app'", "u'pkg'"))
+        self.assertEqual(metadata.load(self.tmpd).project_type, 'pkg')
+
+    def test_migrate(self):
+        r"""legacy id.txt is rewritten as JSON readable by old releases"""
+
+        self.assertTrue(metadata.migrate(self.tmpd))
+        self.assertFalse(metadata.migrate(self.tmpd))
+
+        text = open(self.idfn).read()
+        self.assertEqual(json.loads(text), ast.literal_eval(LEGACY))
+        self.assertEqual(ast.literal_eval(text), ast.literal_eval(LEGACY))
+        self.assertEqual(metadata.load(self.tmpd).format, 'json')
+
+    def test_migrate_skips_booleans(self):
+        r"""values JSON spells differently are left as a python literal"""
+
+        with open(self.idfn, 'w') as fout:
+            fout.write(LEGACY.replace("u'year': u'2015'", "u'cpp': True"))
+        self.assertFalse(metadata.migrate(self.tmpd))
+        self.assertEqual(metadata.load(self.tmpd).format, 'literal')
+
+    def test_find_root(self):
+        r"""find the project root from a sub-directory"""
+
+        sub = os.path.join(self.tmpd, 'src', 'deep')
+        os.makedirs(sub)
+        self.assertEqual(metadata.find_root(sub), self.tmpd)
+        self.assertEqual(metadata.find_root(sub), self.tmpd)
+
+        # A project created later under a directory searched from is found
+
+        inner = os.path.join(sub, 'proj')
+        os.mkdir(inner)
+        self.assertEqual(metadata.find_root(inner), self.tmpd)
+        with open(os.path.join(inner, 'id.txt'), 'w') as fout:
+            fout.write(LEGACY)
+        self.assertEqual(metadata.find_root(inner), inner)
+
+        os.unlink(self.idfn)
+        self.assertNotEqual(metadata.find_root(sub), self.tmpd)
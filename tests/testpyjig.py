@@ -22,10 +22,12 @@ import os
 import re
 import shutil
 import subprocess
+import sys
 import tempfile
 import unittest
 
 from pyjig import pyjig
+from tests.standins import isolate, restore
 
 # ----------------------------------------------------------------------------
 # Module level initializations
@@ -38,6 +40,35 @@ __copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
 
 LOG = logging.getLogger('testpyjig')
 
+# Modules that must not be imported until a template is rendered
+
+HEAVY_MODULES = ('cookiecutter', 'jinja2', 'yaml', 'requests', 'pyjig.engine')
+
+
+def pyjig_env():
+    r"""Return an environment in which a child python imports this pyjig"""
+
+    paths = [os.path.dirname(os.path.dirname(pyjig.__file__))]
+    paths.extend(os.environ.get('PYTHONPATH', '').split(os.pathsep))
+    return dict(os.environ, PYTHONPATH=os.pathsep.join(paths))
+
+
+def loaded_modules(args, cwd):
+    r"""Return the modules a new interpreter has loaded after running
+    ``pyjig`` *args* in directory *cwd*"""
+
+    out = subprocess.check_output(
+        [sys.executable, '-c',
+         'import sys\n'
+         'from pyjig import pyjig\n'
+         'try:\n'
+         '    pyjig.main(sys.argv[1:])\n'
+         'except SystemExit:\n'
+         '    pass\n'
+         'print(" ".join(sorted(sys.modules)))\n'] + args,
+        cwd=cwd, env=pyjig_env(), stderr=subprocess.DEVNULL)
+    return out.decode('utf-8').splitlines()[-1].split()
+
 
 class Testpyjig(unittest.TestCase):
     r"""pyjig unittest test case"""
@@ -45,11 +76,13 @@ class Testpyjig(unittest.TestCase):
     # pylint: disable=invalid-name, global-statement
 
     def setUp(self):
-        r"""create temp dir for overrides"""
+        r"""create temp dir for overrides, holding pyjig's state"""
         self.tmpd = tempfile.mkdtemp()
+        self.environ = isolate(self.tmpd)
 
     def tearDown(self):
-        r"""remove the temp dir"""
+        r"""restore the environment and remove the temp dir"""
+        restore(self.environ)
         shutil.rmtree(self.tmpd, ignore_errors=True)
 
     def test_inpath(self):
@@ -58,6 +91,21 @@ class Testpyjig(unittest.TestCase):
         self.assertIsNotNone(pyjig.inpath('make'))
         self.assertIsNotNone(pyjig.inpath('git'))
 
+    def test_startup(self):
+        r"""--help, argument errors and no-op runs load no template engine.
+        Their time is measured by the startup benchmarks."""
+
+        with open(os.path.join(self.tmpd, 's1.py'), 'w') as fout:
+            fout.write('# mine\n')
+
+        for args in (['--help'], [], ['--app', 'a', '--pkg', 'b'],
+                     ['-x', '--quiet', 's1']):
+            loaded = loaded_modules(args, self.tmpd)
+            for module in HEAVY_MODULES:
+                self.assertNotIn(module, loaded, 'pyjig %s' % ' '.join(args))
+        with open(os.path.join(self.tmpd, 's1.py')) as fin:
+            self.assertEqual(fin.read(), '# mine\n')
+
     def test_git_init(self):
         r"""test git_init"""
 
@@ -69,6 +117,40 @@ class Testpyjig(unittest.TestCase):
         gdir = os.path.join(self.tmpd, '.git')
         self.assertTrue(os.path.isdir(gdir))
 
+    def test_git_init_commit(self):
+        r"""git_init commits the generated files, leaving a clean tree"""
+
+        files = {'.gitignore': '*.pyc\nbuild/\n', 'file.py': 'pass\n',
+                 'src/mod.py': 'pass\n', 'src/mod.pyc': 'junk',
+                 'build/out.txt': 'junk', 'run.sh': '#!/bin/sh\n'}
+        for fname, text in files.items():
+            tgt = os.path.join(self.tmpd, fname)
+            if not os.path.isdir(os.path.dirname(tgt)):
+                os.makedirs(os.path.dirname(tgt))
+            with open(tgt, 'wt') as fout:
+                fout.write(text)
+        os.chmod(os.path.join(self.tmpd, 'run.sh'), 0o755)
+
+        pyjig.git_init(self.tmpd)
+
+        def git(*args):
+            r"""return output of git *args* in the temp dir"""
+            return subprocess.check_output(('git',) + args, cwd=self.tmpd) \
+                .decode('utf-8')
+
+        self.assertEqual(git('status', '--porcelain'), '')
+        self.assertEqual(git('ls-files').split(),
+                         ['.gitignore', 'file.py', 'run.sh', 'src/mod.py'])
+        self.assertIn('100755', git('ls-files', '-s', 'run.sh'))
+        self.assertEqual(git('log', '--format=%s').strip(), 'Initial check in.')
+        git('fsck', '--strict')
+
+        # Nested folders of an existing repo are left alone
+
+        os.mkdir(os.path.join(self.tmpd, 'sub'))
+        pyjig.git_init(os.path.join(self.tmpd, 'sub'))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpd, 'sub', '.git')))
+
     def test_app_project(self):
         r"""create application project"""
 
@@ -277,19 +359,10 @@ class Testpyjig(unittest.TestCase):
             txt = open('docs/e1.rst').read()
             self.assertIn('.. automodule:: e1', txt)
 
-            # Build extension
+            # Build extension, added to setup.py by pyjig
 
-            setup = open('setup.py').readlines()
-            import_added = False
-            with open('setup.py', 'wt') as fout:
-                for line in setup:
-                    fout.write(line)
-                    if not import_added and re.match('^from setuptools ', line):
-                        fout.write("from setuptools import Extension\n")
-                        import_added = True
-                    if re.search('package_dir', line):
-                        fout.write("ext_modules=[Extension('mypkg.e1',\n"
-                                   "sources=['src/e1_module.cpp'])],\n")
+            self.assertIn("Extension('mypkg.e1', sources = "
+                          "['src/e1_module.cpp'])", open('setup.py').read())
 
             subprocess.check_call(['make', 'build'])
 
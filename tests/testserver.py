@@ -0,0 +1,166 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testserver` - unittests for pyjig.server
+#################################################
+
+.. module:: testserver
+   :synopsis: unittests for pyjig.server
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for ``pyjig serve`` and request forwarding, using the stand-in
+templates in ``tests/templates``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import socket
+import threading
+import unittest
+
+from pyjig import pyjig, server
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testserver')
+
+
+class Testserver(Standins, unittest.TestCase):
+    r"""pyjig.server unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""start a server on a socket in a temp dir"""
+        Standins.setUp(self)
+        self.sock = os.path.join(self.tmpd, 'pyjig.sock')
+        self.server = server.Server(self.sock)
+        self.server.bind()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        r"""stop the server and remove the temp dir"""
+        self.server.stop()
+        self.thread.join()
+        Standins.tearDown(self)
+
+    def test_run(self):
+        r"""requests run in the server, from the client's directory"""
+
+        self.assertEqual(server.request({'op': 'ping'}, self.sock),
+                         {'status': 0})
+
+        reply = server.request({'op': 'run', 'argv': ['-x', 's1', 's2'],
+                                'cwd': self.tmpd}, self.sock)
+        self.assertEqual(reply['status'], 0)
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpd, 's2.py')))
+
+        # Output of the request comes back with the reply
+
+        reply = server.request({'op': 'run', 'argv': ['--app', 'a', '--pkg', 'b'],
+                                'cwd': self.tmpd}, self.sock)
+        self.assertEqual(reply['log'],
+                         [[logging.ERROR, '>>> Cannot select both --app and --pkg']])
+
+        for argv in (['--offline', 's3'], ['--remote', 's3'], ['-d', 's3'],
+                     ['--trace', 'trace.json', 's3'], ['--bogus'], []):
+            reply = server.request({'op': 'run', 'argv': argv,
+                                    'cwd': self.tmpd}, self.sock)
+            self.assertEqual(reply['status'], -1)
+
+    def test_environ(self):
+        r"""requests run with the client's environment"""
+
+        saved = dict(os.environ)
+        env = {'PATH': os.path.join(self.tmpd, 'bin'),
+               'GIT_AUTHOR_NAME': 'Client', 'HOME': None}
+        environ = server.Environ()
+        with environ.applied(env):
+            with environ.applied(dict(env)):
+                self.assertEqual(os.environ['PATH'], env['PATH'])
+                self.assertEqual(os.environ['GIT_AUTHOR_NAME'], 'Client')
+                self.assertNotIn('HOME', os.environ)
+            self.assertEqual(os.environ['PATH'], env['PATH'])
+        self.assertEqual(dict(os.environ), saved)
+
+        # A request with another environment waits for those running
+
+        order = []
+
+        def other():
+            r"""run with a second environment"""
+            with environ.applied({'PATH': '/other'}):
+                order.append(os.environ['PATH'])
+
+        with environ.applied(env):
+            thread = threading.Thread(target=other)
+            thread.start()
+            thread.join(0.2)
+            order.append(os.environ['PATH'])
+        thread.join()
+        self.assertEqual(order, [env['PATH'], '/other'])
+        self.assertEqual(dict(os.environ), saved)
+
+        env['PATH'] = os.environ['PATH']
+        reply = server.request({'op': 'run', 'argv': ['-x', 'envs'],
+                                'cwd': self.tmpd, 'env': env}, self.sock)
+        self.assertEqual(reply['status'], 0)
+        self.assertEqual(dict(os.environ), saved)
+
+        # Variables a request does not send keep the server's values
+
+        reply = server.request({'op': 'run', 'argv': ['-x', 'envless'],
+                                'cwd': self.tmpd}, self.sock)
+        self.assertEqual(reply['status'], 0)
+
+        # Staging the new files in a project needs git from the PATH
+
+        parser = pyjig.init_parser()
+        proj = pyjig.Pyjig(parser.parse_args(['--pkg', 'envpkg']),
+                           cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        reply = server.request({'op': 'run', 'argv': ['envmod'],
+                                'cwd': os.path.join(proj.pdir, 'src'),
+                                'env': {'GIT_AUTHOR_NAME': 'Client'}},
+                               self.sock)
+        self.assertEqual(reply['status'], 0)
+        self.assertEqual(dict(os.environ), saved)
+
+    def test_forward(self):
+        r"""quiet runs are forwarded when PYJIG_SOCKET is set"""
+
+        os.environ['PYJIG_SOCKET'] = self.sock
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.tmpd)
+            self.assertEqual(server.forward(['-x', 'fwd']), 0)
+        finally:
+            os.chdir(cwd)
+            del os.environ['PYJIG_SOCKET']
+        self.assertTrue(os.path.isfile(os.path.join(self.tmpd, 'fwd.py')))
+
+        # Without a server the caller runs the request itself
+
+        self.assertIsNone(server.forward(['-x', 'fwd'],
+                                         os.path.join(self.tmpd, 'none')))
+
+    def test_bind(self):
+        r"""a second server cannot take over a live socket"""
+
+        self.assertRaises(RuntimeError, server.Server(self.sock).bind)
+        self.assertRaises(socket.error, server.request, {'op': 'ping'},
+                          os.path.join(self.tmpd, 'none'))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`teststore` - unittests for pyjig.store
+###############################################
+
+.. module:: teststore
+   :synopsis: unittests for pyjig.store
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for materializing static template files from the store.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from pyjig import engine, store
+from tests.standins import template_cache
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('teststore')
+
+
+class Teststore(unittest.TestCase):
+    r"""pyjig.store unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create temp dir"""
+        self.tmpd = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpd, 'store')
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def read(self, fname):
+        r"""return the contents of file *fname*"""
+        with open(fname, 'rb') as fin:
+            return fin.read()
+
+    def test_copy(self):
+        r"""materialized files are private copies of one store file"""
+
+        files = store.Store(self.root)
+        for name in ('a', 'b'):
+            tgt = os.path.join(self.tmpd, name)
+            method = files.materialize(b'static\n', tgt, 0o100755)
+            self.assertIn(method, ('reflink', 'copy_file_range', 'copy'))
+            self.assertEqual(self.read(tgt), b'static\n')
+            self.assertEqual(stat.S_IMODE(os.stat(tgt).st_mode), 0o755)
+
+        self.assertEqual(len(os.listdir(self.root)), 1)
+        with open(os.path.join(self.tmpd, 'a'), 'ab') as fout:
+            fout.write(b'edited\n')
+        self.assertEqual(self.read(os.path.join(self.tmpd, 'b')), b'static\n')
+
+    def test_hardlink(self):
+        r"""hard linked files share the store file"""
+
+        files = store.Store(self.root, hardlink=True)
+        tgt = os.path.join(self.tmpd, 'a')
+        self.assertEqual(files.materialize(b'static\n', tgt, 0o100644),
+                         'hardlink')
+        self.assertEqual(os.stat(tgt).st_ino,
+                         os.stat(files.put(b'static\n', 0o100644)).st_ino)
+        self.assertEqual(stat.S_IMODE(os.stat(tgt).st_mode), 0o444)
+
+    def test_generate(self):
+        r"""only the files without markup are materialized from the store"""
+
+        template = engine.Template(template_cache(self.tmpd).checkout('pypkg'))
+        context = template.context({'project_name': 'p1'}, no_input=True)
+        files = store.Store(self.root)
+        pdir, written = template.generate(
+            context, os.path.join(self.tmpd, 'out'), files)
+
+        self.assertEqual(sum(files.counts.values()), 5)
+        for fname in ('pylint.rc', 'docs/make.bat'):
+            self.assertEqual(
+                self.read(os.path.join(pdir, fname)),
+                template.read(fname.replace('/', os.path.sep)))
+        self.assertIn(os.path.join(pdir, 'setup.py'), written)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testtestrun` - unittests for pyjig.testrun
+###################################################
+
+.. module:: testtestrun
+   :synopsis: unittests for pyjig.testrun
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the ``pyjig test`` parallel runner and its result cache.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import sys
+import unittest
+
+from pyjig import pyjig, testrun
+from pyjig.lint import ResultCache
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testtestrun')
+
+TEST_A = '''\
+import unittest
+from timed import a
+
+
+class ATest(unittest.TestCase):
+    def test_a(self):
+        self.assertEqual(a.LOG.name, 'a')
+'''
+
+FAILING = '''\
+import unittest
+
+
+class FailTest(unittest.TestCase):
+    def test_fail(self):
+        self.fail('failed on purpose')
+'''
+
+
+class Testtestrun(Standins, unittest.TestCase):
+    r"""pyjig.testrun unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def test_balance(self):
+        r"""modules are dealt longest first to the least loaded worker"""
+
+        durations = {'a': 8.0, 'b': 5.0, 'c': 4.0, 'd': 3.0}
+        bins = testrun.balance(['a', 'b', 'c', 'd'], durations, 2)
+        self.assertEqual(sorted(bins), [['a', 'd'], ['b', 'c']])
+
+        # Modules never timed count as the average, one worker per module
+
+        bins = testrun.balance(['a', 'b', 'new'], {'a': 1.0, 'b': 3.0}, 8)
+        self.assertEqual(sorted(bins), [['a'], ['b'], ['new']])
+
+    def test_run(self):
+        r"""passing modules are cached until a module they import changes"""
+
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'timed'])
+        proj = pyjig.Pyjig(args, cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        pyjig.add_pysources(['a', 'b'], os.path.join(proj.pdir, 'src'),
+                            no_input=True, extra={'project_type': 'pkg'})
+
+        with open(os.path.join(proj.pdir, 'tests', 'test_a.py'), 'w') as fout:
+            fout.write(TEST_A)
+
+        cache = ResultCache(os.path.join(self.tmpd, 'cache'))
+
+        def run():
+            r"""run the project's tests, return {module: status}"""
+            results = testrun.run_tests(proj.pdir, 'timed', jobs=2,
+                                        cache=cache)
+            return dict((result['module'],
+                         'cached' if result['cached'] else result['ok'])
+                        for result in results)
+
+        self.assertEqual(run(), {'tests.test_a': True, 'tests.test_b': True})
+        self.assertEqual(run(), {'tests.test_a': 'cached',
+                                 'tests.test_b': 'cached'})
+
+        with open(os.path.join(proj.pdir, 'src', 'a.py'), 'a') as fout:
+            fout.write('\nCHANGED = True\n')
+        self.assertEqual(run(), {'tests.test_a': True,
+                                 'tests.test_b': 'cached'})
+
+        # Failing modules are reported, and run again next time
+
+        with open(os.path.join(proj.pdir, 'tests', 'test_b.py'), 'w') as fout:
+            fout.write(FAILING)
+        for _ in range(2):
+            self.assertEqual(run(), {'tests.test_a': 'cached',
+                                     'tests.test_b': False})
+
+        # Interpreters named without a path are found in PATH, and share
+        # the results of the same interpreter named in full
+
+        name = os.path.basename(sys.executable)
+        saved = os.environ['PATH']
+        os.environ['PATH'] = os.path.dirname(sys.executable) + os.pathsep + \
+            saved
+        try:
+            self.assertEqual(testrun.interpreter(name),
+                             testrun.interpreter(sys.executable))
+            results = testrun.run_tests(proj.pdir, 'timed', ['tests.test_a'],
+                                        python=name, cache=cache)
+            self.assertTrue(results[0]['cached'])
+        finally:
+            os.environ['PATH'] = saved
+        self.assertRaises(RuntimeError, testrun.interpreter, 'no-such-python')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testtimings` - unittests for pyjig.timings
+###################################################
+
+.. module:: testtimings
+   :synopsis: unittests for pyjig.timings
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the phase timers behind ``pyjig --timings``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import subprocess
+import sys
+import unittest
+
+from pyjig import pyjig, timings
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testtimings')
+
+
+class Testtimings(Standins, unittest.TestCase):
+    r"""pyjig.timings unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def tearDown(self):
+        r"""stop timing and remove the temp dir"""
+        timings.reset()
+        Standins.tearDown(self)
+
+    def test_disabled(self):
+        r"""nothing is recorded unless timing is enabled"""
+
+        with timings.phase('outer'):
+            pass
+        self.assertEqual(timings.results(), [])
+
+    def test_phases(self):
+        r"""nested phases, subprocess counts and JSON output"""
+
+        timings.enable()
+        with timings.phase('outer'):
+            for _ in range(2):
+                with timings.phase('inner'):
+                    subprocess.check_call([sys.executable, '-c', 'pass'])
+        with timings.phase('after'):
+            pass
+
+        phases = timings.results()
+        self.assertEqual([item['phase'] for item in phases],
+                         ['outer', 'outer/inner', 'after'])
+        self.assertEqual(phases[1]['calls'], 2)
+        self.assertGreaterEqual(phases[0]['wall'], phases[1]['wall'])
+        if hasattr(sys, 'addaudithook'):
+            self.assertEqual(phases[0]['subprocesses'], 2)
+            self.assertEqual(phases[2]['subprocesses'], 0)
+
+        fname = os.path.join(self.tmpd, 'timings.json')
+        timings.report(fname)
+        with open(fname) as fin:
+            self.assertEqual(json.load(fin)['phases'], phases)
+
+    def test_pyjig(self):
+        r"""pyjig operations are broken down into phases"""
+
+        timings.enable()
+        pyjig.add_pysources(['s1', 's2'], self.tmpd, no_input=True)
+
+        phases = [item['phase'] for item in timings.results()]
+        for name in ('add_pysources', 'add_pysources/load_template',
+                     'add_pysources/load_template/checkout',
+                     'add_pysources/load_template/parse',
+                     'add_pysources/prompt', 'add_pysources/render',
+                     'add_pysources/install'):
+            self.assertIn(name, phases)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testtoolchain` - unittests for pyjig.toolchain
+#######################################################
+
+.. module:: testtoolchain
+   :synopsis: unittests for pyjig.toolchain
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for toolchain validation and its on-disk cache.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import time
+import unittest
+
+from pyjig import toolchain
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testtoolchain')
+
+
+class Testtoolchain(unittest.TestCase):
+    r"""pyjig.toolchain unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create a private PATH and cache file"""
+        self.tmpd = tempfile.mkdtemp()
+        self.bindirs = [os.path.join(self.tmpd, 'bin1'),
+                        os.path.join(self.tmpd, 'bin2')]
+        for bindir in self.bindirs:
+            os.mkdir(bindir)
+        self.cachefile = os.path.join(self.tmpd, 'toolchain.json')
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = os.pathsep.join(self.bindirs)
+
+    def tearDown(self):
+        r"""restore PATH and remove the temp dir"""
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.tmpd, ignore_errors=True)
+
+    def tool(self, bindir, exe):
+        r"""create executable *exe* in *bindir*"""
+        fname = os.path.join(bindir, exe)
+        with open(fname, 'w') as fout:
+            fout.write('#!/bin/sh\necho %s 1.0\n' % exe)
+        os.chmod(fname, stat.S_IRWXU)
+
+        # Make sure the directory mtime visibly changes
+
+        when = time.time() + 10
+        os.utime(bindir, (when, when))
+        return fname
+
+    def test_required(self):
+        r"""only the tools an operation needs are validated"""
+        self.assertEqual(toolchain.required(create=False, git=False), ())
+        self.assertEqual(toolchain.required(create=False), ('git',))
+        self.assertIn('pylint', toolchain.required(create=True, git=False))
+        self.assertNotIn('cookiecutter', toolchain.required(create=True))
+
+    def test_find_cached(self):
+        r"""tools are cached until PATH contents change"""
+
+        git = self.tool(self.bindirs[1], 'git')
+        self.assertEqual(toolchain.find(['git'], self.cachefile), {'git': git})
+        self.assertTrue(os.path.isfile(self.cachefile))
+        self.assertEqual(toolchain.load_cache(self.cachefile), {'git': git})
+
+        # A new git earlier in PATH invalidates the cache
+
+        git = self.tool(self.bindirs[0], 'git')
+        self.assertEqual(toolchain.load_cache(self.cachefile), {})
+        self.assertEqual(toolchain.find(['git'], self.cachefile), {'git': git})
+
+        # As does a different PATH
+
+        os.environ['PATH'] = self.bindirs[1]
+        self.assertEqual(toolchain.load_cache(self.cachefile), {})
+
+    def test_validate(self):
+        r"""missing tools raise RuntimeError"""
+
+        self.tool(self.bindirs[0], 'git')
+        toolchain.validate(['git'], self.cachefile)
+        self.assertRaises(RuntimeError, toolchain.validate, ['git', 'make'],
+                          self.cachefile)
+        self.tool(self.bindirs[1], 'make')
+        toolchain.validate(['git', 'make'], self.cachefile)
+
+    def test_version(self):
+        r"""versions are probed with --version"""
+
+        git = self.tool(self.bindirs[0], 'git')
+        self.assertEqual(toolchain.version(git), 'git 1.0')
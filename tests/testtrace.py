@@ -0,0 +1,98 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testtrace` - unittests for pyjig.trace
+###############################################
+
+.. module:: testtrace
+   :synopsis: unittests for pyjig.trace
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for the trace spans written by ``pyjig --trace``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import sys
+import unittest
+
+from pyjig import pyjig, trace
+from tests.standins import Standins
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testtrace')
+
+
+class Testtrace(Standins, unittest.TestCase):
+    r"""pyjig.trace unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def tearDown(self):
+        r"""stop tracing and remove the temp dir"""
+        trace.reset()
+        Standins.tearDown(self)
+
+    def test_disabled(self):
+        r"""nothing is recorded unless tracing is enabled"""
+
+        self.assertIs(trace.span('noop'), trace.span('other'))
+        with trace.span('noop'):
+            trace.instant('noop')
+        self.assertEqual(trace.EVENTS, [])
+
+    def test_spans(self):
+        r"""spans nest in time and are written as trace-event JSON"""
+
+        trace.enable()
+        with trace.span('outer', key='value'):
+            with trace.span('inner'):
+                pass
+        self.assertRaises(ValueError, self.fail_in_span)
+
+        inner, outer, failed = trace.EVENTS
+        self.assertEqual(outer['args'], {'key': 'value'})
+        self.assertLessEqual(outer['ts'], inner['ts'])
+        self.assertGreaterEqual(outer['ts'] + outer['dur'],
+                                inner['ts'] + inner['dur'])
+        self.assertIn('ValueError', failed['args']['error'])
+
+        fname = os.path.join(self.tmpd, 'trace.json')
+        trace.write(fname)
+        with open(fname) as fin:
+            data = json.load(fin)
+        self.assertEqual(data['traceEvents'][0]['ph'], 'M')
+        self.assertEqual(data['traceEvents'][1:], trace.EVENTS)
+
+    @staticmethod
+    def fail_in_span():
+        r"""raise inside a span"""
+        with trace.span('failed'):
+            raise ValueError('boom')
+
+    def test_pyjig(self):
+        r"""pyjig operations record their sub-steps"""
+
+        trace.enable()
+        pyjig.add_pysources(['s1'], self.tmpd, no_input=True)
+
+        names = [event['name'] for event in trace.EVENTS]
+        for name in ('add_pysources', 'load_template', 'clone', 'archive',
+                     'render', 'install'):
+            self.assertIn(name, names)
+        if hasattr(sys, 'addaudithook'):
+            self.assertIn('subprocess', names)
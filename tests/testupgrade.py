@@ -0,0 +1,175 @@
+#!/usr/bin/env python2.7
+# vim: set fileencoding=utf-8
+# pylint:disable=line-too-long
+r""":mod:`testupgrade` - unittests for pyjig.upgrade
+###################################################
+
+.. module:: testupgrade
+   :synopsis: unittests for pyjig.upgrade
+.. moduleauthor:: JimC <jim@carroll.com>
+
+Unittests for ``pyjig upgrade``.
+
+..
+   Copyright(c), 2015, Carroll-Net, Inc., All Rights Reserved."""
+# pylint:enable=line-too-long
+# ----------------------------------------------------------------------------
+# Standard library imports
+# ----------------------------------------------------------------------------
+import json
+import logging
+import os
+import unittest
+
+from pyjig import pyjig, upgrade
+from tests.standins import Standins, git
+
+# ----------------------------------------------------------------------------
+# Module level initializations
+# ----------------------------------------------------------------------------
+__version__    = '1.0.1'
+__author__     = 'JimC'
+__email__      = 'jim@carroll.com'
+__status__     = 'Testing'
+__copyright__  = 'Copyright(c) 2015, Carroll-Net, Inc., All Rights Reserved.'
+
+LOG = logging.getLogger('testupgrade')
+
+
+class Testupgrade(Standins, unittest.TestCase):
+    r"""pyjig.upgrade unittest test case"""
+
+    # pylint: disable=invalid-name
+
+    def setUp(self):
+        r"""create a package project from the stand-in templates"""
+        Standins.setUp(self)
+        self.cwd = os.getcwd()
+        self.repo = pyjig.CACHE.urls['pypkg'][len('file://'):]
+
+        args = pyjig.init_parser().parse_args(['-x', '--pkg', 'up'])
+        proj = pyjig.Pyjig(args, cwd=self.tmpd)
+        proj.create_project(no_input=True)
+        self.pdir = proj.pdir
+        os.chdir(self.pdir)
+
+    def tearDown(self):
+        r"""remove the temp dir"""
+        os.chdir(self.cwd)
+        Standins.tearDown(self)
+
+    def edit(self, root, fname, old, new):
+        r"""replace *old* with *new* in file *fname* under *root*"""
+        path = os.path.join(root, fname)
+        with open(path) as fin:
+            text = fin.read()
+        self.assertIn(old, text)
+        with open(path, 'w') as fout:
+            fout.write(text.replace(old, new, 1))
+
+    def read(self, fname):
+        r"""return the project's file *fname*"""
+        with open(os.path.join(self.pdir, fname)) as fin:
+            return fin.read()
+
+    def template_commit(self, edits, added=None):
+        r"""commit *edits* ``(file, old, new)`` and *added* ``(file, text)``
+        to the stand-in pypkg template, returning the new commit id"""
+        root = os.path.join(self.repo, '{{cookiecutter.project_slug}}')
+        for fname, old, new in edits:
+            self.edit(root, fname, old, new)
+        for fname, text in added or ():
+            with open(os.path.join(root, fname), 'w') as fout:
+                fout.write(text)
+        git(self.repo, 'add', '.')
+        git(self.repo, '-c', 'user.name=pyjig', '-c',
+            'user.email=pyjig@localhost', 'commit', '-q', '-m',
+            'Template change.')
+        return git(self.repo, 'rev-parse', 'HEAD').decode('utf-8').strip()
+
+    def test_manifest(self):
+        r"""new projects record their template and generated files"""
+
+        manifest = upgrade.load(self.pdir)
+        self.assertEqual(manifest['template'], 'pypkg')
+        self.assertEqual(manifest['context']['project_name'], 'up')
+        self.assertEqual(
+            manifest['files']['setup.cfg']['content'],
+            upgrade.digest(self.read('setup.cfg').encode('utf-8')))
+        self.assertIn('docs/conf.py', manifest['files'])
+        self.assertNotIn('id.txt', manifest['files'])
+
+    def test_upgrade(self):
+        r"""changed files are updated or merged, user edits kept"""
+
+        self.edit(self.pdir, 'Makefile', 'OSTYPE := Windows',
+                  'OSTYPE := Windows # mine')
+        self.edit(self.pdir, 'setup.cfg', '[', '# mine\n[')
+        sha = self.template_commit(
+            [('Makefile', '# Define system macros', '# Define macros'),
+             ('pylint.rc', '[MASTER]', '[MASTER]\n# upgraded'),
+             ('setup.cfg', '[', '# new\n[')],
+            [('NEWS.rst', 'News\n====\n')])
+        os.unlink(os.path.join(self.pdir, 'setup.cfg'))
+
+        self.assertEqual(upgrade.upgrade(['-x', '--rev', sha]), 0)
+        makefile = self.read('Makefile')
+        self.assertIn('# Define macros', makefile)
+        self.assertIn('OSTYPE := Windows # mine', makefile)
+        self.assertIn('# upgraded', self.read('pylint.rc'))
+        self.assertEqual(self.read('NEWS.rst'), 'News\n====\n')
+        self.assertFalse(os.path.exists(os.path.join(self.pdir, 'setup.cfg')))
+        self.assertEqual(upgrade.load(self.pdir)['commit'], sha)
+
+        # Up to date now, and files the template did not change are never
+        # touched
+
+        with open(os.path.join(self.pdir, 'pylint.rc'), 'w') as fout:
+            fout.write('mine\n')
+        self.assertEqual(upgrade.upgrade(['-x', '--rev', sha]), 0)
+        self.assertEqual(self.read('pylint.rc'), 'mine\n')
+
+    def test_idfile(self):
+        r"""id.txt is migrated to JSON, never merged with the template"""
+
+        sha = self.template_commit(
+            [('id.txt', "'year'", "'license': 'MIT',\n 'year'")])
+        self.assertEqual(upgrade.upgrade(['-x', '--rev', sha]), 0)
+
+        settings = json.loads(self.read('id.txt'))
+        self.assertEqual(settings['project_name'], 'up')
+        self.assertNotIn('license', settings)
+        self.assertNotIn('id.txt', upgrade.load(self.pdir)['files'])
+
+    def test_conflict(self):
+        r"""conflicting edits are marked and reported"""
+
+        self.edit(self.pdir, 'Makefile', '# Define system macros',
+                  '# Define my macros')
+        sha = self.template_commit(
+            [('Makefile', '# Define system macros', '# Define macros')])
+
+        with open(os.path.join(self.pdir, upgrade.MANIFEST)) as fin:
+            before = json.load(fin)
+        self.assertEqual(upgrade.upgrade(['-x', '-n', '--rev', sha]), -1)
+        self.assertEqual(upgrade.load(self.pdir), before)
+
+        self.assertEqual(upgrade.upgrade(['-x', '--rev', sha]), -1)
+        self.assertIn('<<<<<<< yours', self.read('Makefile'))
+
+    def test_base(self):
+        r"""projects without a manifest are upgraded from --base"""
+
+        base = pyjig.CACHE.resolve('pypkg')
+        os.unlink(os.path.join(self.pdir, upgrade.MANIFEST))
+        sha = self.template_commit(
+            [('pylint.rc', '[MASTER]', '[MASTER]\n# upgraded')])
+
+        self.assertEqual(upgrade.upgrade(['-x', '--rev', sha]), -1)
+        self.assertEqual(upgrade.upgrade(['-x', '--base', base, '--rev', sha]),
+                         0)
+        self.assertIn('# upgraded', self.read('pylint.rc'))
+
+
+if __name__ == '__main__':
+    unittest.main()